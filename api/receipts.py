@@ -1,17 +1,166 @@
 from http.server import BaseHTTPRequestHandler
+import base64
+import hashlib
 import json
-import io
-import cgi
+import os
+import sqlite3
+import threading
 import uuid
 from datetime import datetime
-from urllib.parse import urlparse
+from email.message import Message
+from email.parser import HeaderParser
+from urllib.parse import urlparse, parse_qs
 
 ALLOWED_ORIGIN = "*"  # Restrict as needed
 
-# In-memory store (ephemeral per cold start)
-STORE = {
-    "receipts": {}
-}
+# Storage: Postgres when a URL is set (Vercel Postgres sets POSTGRES_URL), else a SQLite file.
+# Only /tmp is writable on Vercel, so there the SQLite default lasts as long as the instance;
+# set a Postgres URL to keep receipts across cold starts and share them between instances.
+EDGE_DATABASE_URL = os.getenv("EDGE_DATABASE_URL") or os.getenv("POSTGRES_URL") or ""
+EDGE_SQLITE_PATH = os.getenv("EDGE_SQLITE_PATH", "/tmp/complicopilot-edge.sqlite3")
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Uploads are parsed as they stream in; a file is hashed and measured, never buffered whole
+MAX_UPLOAD_BYTES = int(os.getenv("EDGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+MAX_FIELD_BYTES = 64 * 1024
+MAX_PART_HEADER_BYTES = 16 * 1024
+
+
+class ReceiptStore:
+    """Receipts as JSON documents keyed by id, listed newest first with keyset cursors."""
+
+    placeholder = "?"
+    schema = (
+        "CREATE TABLE IF NOT EXISTS edge_receipts (id TEXT PRIMARY KEY, created_at TEXT NOT NULL, item TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_edge_receipts_created_at_id ON edge_receipts (created_at, id)",
+    )
+
+    def __init__(self):
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def connect(self):
+        raise NotImplementedError
+
+    def _execute(self, sql: str, params: tuple = (), fetch: bool = False):
+        sql = sql.replace("?", self.placeholder)
+        with self._lock:
+            conn = self.connect()
+            try:
+                if not self._ready:
+                    cur = conn.cursor()
+                    for statement in self.schema:
+                        cur.execute(statement)
+                    self._ready = True
+                cur = conn.cursor()
+                cur.execute(sql, params)
+                rows = cur.fetchall() if fetch else None
+                conn.commit()
+                return rows
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    # e.g. the server dropped the connection; don't let this hide the original error
+                    self.discard(conn)
+                raise
+            finally:
+                self.done(conn)
+
+    def done(self, conn) -> None:
+        conn.close()
+
+    def discard(self, conn) -> None:
+        """Forget a connection that can no longer be used, so the next call opens a new one."""
+
+    def put(self, item: dict) -> None:
+        self._execute(
+            "INSERT INTO edge_receipts (id, created_at, item) VALUES (?, ?, ?)",
+            (item["id"], item["created_at"], json.dumps(item)),
+        )
+
+    def get(self, rid: str):
+        rows = self._execute("SELECT item FROM edge_receipts WHERE id = ?", (rid,), fetch=True)
+        return json.loads(rows[0][0]) if rows else None
+
+    def list(self, limit: int, cursor=None):
+        """Up to `limit` receipts older than `cursor` ((created_at, id) of the previous page's last item)."""
+        if cursor:
+            created_at, rid = cursor
+            rows = self._execute(
+                "SELECT item FROM edge_receipts WHERE created_at < ? OR (created_at = ? AND id < ?) "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (created_at, created_at, rid, limit), fetch=True,
+            )
+        else:
+            rows = self._execute(
+                "SELECT item FROM edge_receipts ORDER BY created_at DESC, id DESC LIMIT ?", (limit,), fetch=True,
+            )
+        return [json.loads(row[0]) for row in rows]
+
+
+class SQLiteReceiptStore(ReceiptStore):
+    def __init__(self, path: str = EDGE_SQLITE_PATH):
+        super().__init__()
+        self.path = path
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+
+class PostgresReceiptStore(ReceiptStore):
+    placeholder = "%s"
+
+    def __init__(self, url: str = EDGE_DATABASE_URL):
+        super().__init__()
+        self.url = url
+        self._conn = None
+
+    def connect(self):
+        # One connection per instance, reopened if the server dropped it
+        if self._conn is None or self._conn.closed:
+            import psycopg2
+
+            self._conn = psycopg2.connect(self.url)
+        return self._conn
+
+    def done(self, conn) -> None:
+        pass
+
+    def discard(self, conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+
+_store = None
+
+
+def get_store() -> ReceiptStore:
+    global _store
+    if _store is None:
+        _store = PostgresReceiptStore() if EDGE_DATABASE_URL else SQLiteReceiptStore()
+    return _store
+
+
+def encode_cursor(item: dict) -> str:
+    raw = json.dumps([item["created_at"], item["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(value: str):
+    """(created_at, id) from an encoded cursor; raises ValueError if it is malformed."""
+    try:
+        created_at, rid = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(rid, str):
+        raise ValueError("Invalid cursor")
+    return created_at, rid
 
 
 def _write_json(handler: BaseHTTPRequestHandler, status: int, payload: dict):
@@ -25,30 +174,132 @@ def _write_json(handler: BaseHTTPRequestHandler, status: int, payload: dict):
     handler.wfile.write(body)
 
 
+class MultipartError(Exception):
+    """A request body that can't be accepted; `status` is the HTTP status to answer with."""
+
+    def __init__(self, code: str, message: str, status: int):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+
+class _Body:
+    """Reads a request body of `length` bytes from rfile, one chunk at a time."""
+
+    def __init__(self, rfile, length: int):
+        self.rfile = rfile
+        self.remaining = length
+
+    def read(self) -> bytes:
+        if not self.remaining:
+            return b""
+        chunk = self.rfile.read(min(CHUNK_SIZE, self.remaining))
+        if not chunk:
+            raise MultipartError("incomplete_body", "Request body ended early", 400)
+        self.remaining -= len(chunk)
+        return chunk
+
+
+def _content_type(value: str):
+    msg = Message()
+    msg['Content-Type'] = value
+    return msg.get_content_type(), msg.get_param('boundary')
+
+
 def _parse_multipart(handler: BaseHTTPRequestHandler):
-    ctype, pdict = cgi.parse_header(handler.headers.get('Content-Type', ''))
+    """
+    Stream a multipart/form-data body from rfile. File parts are hashed and
+    counted as they arrive, not kept: at most one chunk of a file is in memory.
+    Returns (files, fields), or (None, {}) for other content types; files map
+    to filename, type, size and sha256. Raises MultipartError.
+    """
+    ctype, boundary = _content_type(handler.headers.get('Content-Type', ''))
     if ctype != 'multipart/form-data':
         return None, {}
-    # Ensure boundary is bytes
-    if 'boundary' in pdict:
-        pdict['boundary'] = pdict['boundary'].encode('utf-8')
-    length = int(handler.headers.get('Content-Length', '0'))
-    data = handler.rfile.read(length)
-    fp = io.BytesIO(data)
-    form = cgi.FieldStorage(fp=fp, headers=handler.headers, environ={'REQUEST_METHOD': 'POST'}, keep_blank_values=True)
+    if not boundary:
+        raise MultipartError("malformed_multipart", "Missing multipart boundary", 400)
+    try:
+        length = int(handler.headers.get('Content-Length', ''))
+    except ValueError:
+        raise MultipartError("length_required", "Content-Length is required", 411)
+    if length > MAX_UPLOAD_BYTES:
+        raise MultipartError("payload_too_large", f"Request body over {MAX_UPLOAD_BYTES} bytes", 413)
+
+    body = _Body(handler.rfile, length)
+    buf = bytearray()
+
+    def fill() -> None:
+        chunk = body.read()
+        if not chunk:
+            raise MultipartError("malformed_multipart", "Unterminated multipart body", 400)
+        buf.extend(chunk)
+
+    # Skip the preamble up to the first boundary; later ones are preceded by CRLF
+    delimiter = b"--" + boundary.encode('latin-1')
+    while (i := buf.find(delimiter)) < 0:
+        del buf[:max(0, len(buf) - len(delimiter))]
+        fill()
+    del buf[:i + len(delimiter)]
+    delimiter = b"\r\n" + delimiter
+
     files = {}
     fields = {}
-    for key in form.keys():
-        item = form[key]
-        if getattr(item, 'filename', None):
-            files[key] = {
-                'filename': item.filename,
-                'content': item.file.read(),
-                'type': item.type or 'application/octet-stream'
+    while True:
+        while len(buf) < 2:
+            fill()
+        if buf[:2] == b"--":  # closing boundary; the epilogue is ignored
+            return files, fields
+        if buf[:2] != b"\r\n":
+            raise MultipartError("malformed_multipart", "Malformed multipart boundary", 400)
+        del buf[:2]
+
+        while (i := buf.find(b"\r\n\r\n")) < 0:
+            if len(buf) > MAX_PART_HEADER_BYTES:
+                raise MultipartError("malformed_multipart", "Multipart headers too large", 400)
+            fill()
+        # Browsers send non-ASCII filenames as raw UTF-8, which the bytes parser would mangle
+        headers = HeaderParser().parsestr(bytes(buf[:i + 4]).decode('utf-8', errors='replace'))
+        del buf[:i + 4]
+        name = headers.get_param('name', header='content-disposition')
+        filename = headers.get_filename()
+        if filename:
+            digest = hashlib.sha256()
+            size = 0
+        else:
+            value = bytearray()
+
+        def emit(data: bytes) -> None:
+            nonlocal size
+            if filename:
+                digest.update(data)
+                size += len(data)
+            else:
+                if len(value) + len(data) > MAX_FIELD_BYTES:
+                    raise MultipartError("field_too_large", f"Field '{name}' over {MAX_FIELD_BYTES} bytes", 413)
+                value.extend(data)
+
+        # Everything before the next delimiter belongs to this part; hold back a possible partial delimiter
+        while (i := buf.find(delimiter)) < 0:
+            keep = len(delimiter) - 1
+            if len(buf) > keep:
+                emit(bytes(buf[:-keep]))
+                del buf[:-keep]
+            fill()
+        emit(bytes(buf[:i]))
+        del buf[:i + len(delimiter)]
+
+        if not name:
+            continue
+        if filename:
+            files[name] = {
+                'filename': filename,
+                'type': headers.get_content_type() if headers.get('Content-Type') else 'application/octet-stream',
+                'size': size,
+                'sha256': digest.hexdigest(),
             }
         else:
-            fields[key] = item.value
-    return files, fields
+            fields[name] = value.decode('utf-8', errors='replace')
 
 
 class handler(BaseHTTPRequestHandler):  # Vercel Python entrypoint
@@ -63,14 +314,28 @@ class handler(BaseHTTPRequestHandler):  # Vercel Python entrypoint
         parsed = urlparse(self.path)
         parts = [p for p in parsed.path.split('/') if p]
         # Routes: /api/receipts or /api/receipts/{id}
-        if len(parts) >= 2 and parts[-2] == 'receipts':
+        if parts and 'receipts' in parts[-2:]:
             if parts[-1] == 'receipts':
-                # List
-                receipts = list(STORE['receipts'].values())
-                return _write_json(self, 200, {"items": receipts, "count": len(receipts)})
+                # List: ?limit=N (default 20, max 100) and ?cursor= from the previous page's next_cursor
+                query = parse_qs(parsed.query)
+                try:
+                    limit = int(query.get('limit', [DEFAULT_PAGE_SIZE])[0])
+                    if not 1 <= limit <= MAX_PAGE_SIZE:
+                        raise ValueError
+                except ValueError:
+                    return _write_json(self, 400, {"error": {"code": "invalid_limit", "message": f"limit must be 1-{MAX_PAGE_SIZE}"}})
+                try:
+                    cursor = decode_cursor(query['cursor'][0]) if query.get('cursor') else None
+                except ValueError:
+                    return _write_json(self, 400, {"error": {"code": "invalid_cursor", "message": "Invalid cursor"}})
+                # One extra row tells us whether there is a next page
+                receipts = get_store().list(limit + 1, cursor)
+                next_cursor = encode_cursor(receipts[limit - 1]) if len(receipts) > limit else None
+                receipts = receipts[:limit]
+                return _write_json(self, 200, {"items": receipts, "count": len(receipts), "next_cursor": next_cursor})
             else:
                 rid = parts[-1]
-                item = STORE['receipts'].get(rid)
+                item = get_store().get(rid)
                 if not item:
                     return _write_json(self, 404, {"error": {"code": "not_found", "message": "Receipt not found"}})
                 return _write_json(self, 200, item)
@@ -82,7 +347,10 @@ class handler(BaseHTTPRequestHandler):  # Vercel Python entrypoint
         if not (len(parts) >= 2 and parts[-1] == 'receipts'):
             return _write_json(self, 404, {"error": {"code": "not_found", "message": "Route not found"}})
 
-        files, fields = _parse_multipart(self)
+        try:
+            files, fields = _parse_multipart(self)
+        except MultipartError as e:
+            return _write_json(self, e.status, {"error": {"code": e.code, "message": e.message}})
         if files is None:
             return _write_json(self, 415, {"error": {"code": "unsupported_media_type", "message": "Expected multipart/form-data"}})
         upload = files.get('file')
@@ -90,7 +358,7 @@ class handler(BaseHTTPRequestHandler):  # Vercel Python entrypoint
             return _write_json(self, 400, {"error": {"code": "missing_file", "message": "Field 'file' is required"}})
 
         rid = str(uuid.uuid4())
-        now = datetime.utcnow().isoformat() + 'Z'
+        now = datetime.utcnow().isoformat(timespec='microseconds') + 'Z'  # fixed width, so it sorts as text
         item = {
             "id": rid,
             "vendor": fields.get('vendor', 'Unknown Vendor'),
@@ -104,9 +372,10 @@ class handler(BaseHTTPRequestHandler):  # Vercel Python entrypoint
             "file": {
                 "name": upload['filename'],
                 "type": upload['type'],
-                "size": len(upload['content'])
+                "size": upload['size'],
+                "sha256": upload['sha256']
             },
             "created_at": now
         }
-        STORE['receipts'][rid] = item
+        get_store().put(item)
         return _write_json(self, 201, item)
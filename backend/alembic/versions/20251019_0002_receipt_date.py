@@ -0,0 +1,81 @@
+"""typed receipt_date column
+
+Revision ID: 20251019_0002
+Revises: 20250823_0001
+Create Date: 2025-10-19 00:00:00.000000
+
+"""
+import re
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '20251019_0002'
+down_revision: Union[str, None] = '20250823_0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of ParserService.normalize_date as of this revision, so later parser changes don't alter the migration
+_DATE_FORMATS = [
+    "%Y-%m-%d", "%Y/%m/%d",
+    "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y",
+    "%m/%d/%Y", "%m-%d-%Y",
+    "%d-%m-%y", "%d/%m/%y", "%m/%d/%y",
+    "%d %b %Y", "%d %B %Y", "%b %d %Y", "%B %d %Y", "%d-%b-%Y", "%d %b %y",
+]
+CHUNK_SIZE = 500
+
+receipts = sa.table(
+    "receipts",
+    sa.column("id", sa.String),
+    sa.column("date", sa.String),
+    sa.column("receipt_date", sa.Date),
+)
+
+
+def _normalize_date(date_str):
+    if not date_str:
+        return None
+    cleaned = re.sub(r"\s+", " ", date_str.strip().replace(",", " ")).strip()
+    cleaned = re.split(r"[T ](?=\d{1,2}:\d{2})", cleaned)[0]
+    for fmt in _DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(cleaned, fmt).date()
+        except ValueError:
+            continue
+        if 1900 <= parsed.year <= 2100:
+            return parsed
+    return None
+
+
+def _backfill_receipt_dates(conn) -> None:
+    last_id = None
+    while True:
+        stmt = sa.select(receipts.c.id, receipts.c.date).order_by(receipts.c.id).limit(CHUNK_SIZE)
+        if last_id is not None:
+            stmt = stmt.where(receipts.c.id > last_id)
+        rows = conn.execute(stmt).all()
+        if not rows:
+            return
+        params = [{"b_id": r.id, "b_date": d} for r in rows if (d := _normalize_date(r.date)) is not None]
+        if params:
+            conn.execute(
+                receipts.update().where(receipts.c.id == sa.bindparam("b_id")).values(receipt_date=sa.bindparam("b_date")),
+                params,
+            )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    op.add_column('receipts', sa.Column('receipt_date', sa.Date(), nullable=True))
+    op.create_index('ix_receipts_receipt_date', 'receipts', ['receipt_date'])
+    # Later fixes can be applied with `python -m services.backfill receipt_date`
+    _backfill_receipt_dates(op.get_bind())
+
+
+def downgrade() -> None:
+    op.drop_index('ix_receipts_receipt_date', table_name='receipts')
+    op.drop_column('receipts', 'receipt_date')
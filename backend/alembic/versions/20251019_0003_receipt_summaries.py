@@ -0,0 +1,84 @@
+"""receipt_summaries rollup table
+
+Revision ID: 20251019_0003
+Revises: 20251019_0002
+Create Date: 2025-10-19 00:00:00.000000
+
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '20251019_0003'
+down_revision: Union[str, None] = '20251019_0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHUNK_SIZE = 500
+
+receipts = sa.table(
+    "receipts",
+    sa.column("id", sa.String),
+    sa.column("vendor", sa.String),
+    sa.column("category", sa.String),
+    sa.column("gstin", sa.String),
+    sa.column("receipt_date", sa.Date),
+    sa.column("amount", sa.Float),
+    sa.column("tax_amount", sa.Float),
+)
+
+
+def _rebuild_summaries(conn, summaries: sa.Table) -> None:
+    """Rollups per (dimension, key), as services.summaries computed them at this revision."""
+    totals = defaultdict(lambda: [0, 0.0, 0.0])
+    last_id = None
+    while True:
+        stmt = sa.select(*receipts.c).order_by(receipts.c.id).limit(CHUNK_SIZE)
+        if last_id is not None:
+            stmt = stmt.where(receipts.c.id > last_id)
+        rows = conn.execute(stmt).all()
+        if not rows:
+            break
+        for r in rows:
+            keys = {
+                "vendor": (r.vendor or "").strip() or "unknown",
+                "category": (r.category or "").strip() or "uncategorized",
+                "month": r.receipt_date.strftime("%Y-%m") if r.receipt_date else "unknown",
+                "gstin": (r.gstin or "").strip() or "unknown",
+            }
+            for dimension, key in keys.items():
+                entry = totals[(dimension, key)]
+                entry[0] += 1
+                entry[1] += float(r.amount or 0)
+                entry[2] += float(r.tax_amount or 0)
+        last_id = rows[-1].id
+    now = datetime.utcnow()
+    values = [
+        {"dimension": d, "key": k, "receipt_count": c, "total_amount": a, "total_tax": x, "updated_at": now}
+        for (d, k), (c, a, x) in totals.items()
+    ]
+    if values:
+        conn.execute(summaries.insert(), values)
+
+
+def upgrade() -> None:
+    summaries = op.create_table(
+        'receipt_summaries',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('receipt_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_amount', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('total_tax', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint('dimension', 'key', name='uq_receipt_summaries_dimension_key'),
+    )
+    _rebuild_summaries(op.get_bind(), summaries)
+
+
+def downgrade() -> None:
+    op.drop_table('receipt_summaries')
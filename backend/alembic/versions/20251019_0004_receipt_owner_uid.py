@@ -0,0 +1,131 @@
+"""scope receipts (and their rollups) by owner_uid
+
+Revision ID: 20251019_0004
+Revises: 20251019_0003
+Create Date: 2025-10-19 00:00:00.000000
+
+"""
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '20251019_0004'
+down_revision: Union[str, None] = '20251019_0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHUNK_SIZE = 500
+
+receipts = sa.table(
+    "receipts",
+    sa.column("id", sa.String),
+    sa.column("owner_uid", sa.String),
+    sa.column("extracted", sa.JSON),
+    sa.column("vendor", sa.String),
+    sa.column("category", sa.String),
+    sa.column("gstin", sa.String),
+    sa.column("receipt_date", sa.Date),
+    sa.column("amount", sa.Float),
+    sa.column("tax_amount", sa.Float),
+)
+
+
+def _chunks(conn, columns, *where):
+    last_id = None
+    while True:
+        stmt = sa.select(receipts.c.id, *columns).where(*where).order_by(receipts.c.id).limit(CHUNK_SIZE)
+        if last_id is not None:
+            stmt = stmt.where(receipts.c.id > last_id)
+        rows = conn.execute(stmt).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def _backfill_receipt_owners(conn) -> None:
+    """Owner from extracted["owner_uid"], else LEGACY_RECEIPT_OWNER_UID; rows with neither stay NULL."""
+    default_owner = os.getenv("LEGACY_RECEIPT_OWNER_UID")
+    for rows in _chunks(conn, [receipts.c.extracted], receipts.c.owner_uid.is_(None)):
+        params = []
+        for r in rows:
+            extracted = r.extracted if isinstance(r.extracted, dict) else {}
+            owner = extracted.get("owner_uid") or default_owner
+            if owner:
+                params.append({"b_id": r.id, "b_owner": owner})
+        if params:
+            conn.execute(
+                receipts.update().where(receipts.c.id == sa.bindparam("b_id")).values(owner_uid=sa.bindparam("b_owner")),
+                params,
+            )
+
+
+def _rebuild_summaries(conn, summaries: sa.Table) -> None:
+    """Rollups per (owner_uid, dimension, key), as services.summaries computed them at this revision."""
+    totals = defaultdict(lambda: [0, 0.0, 0.0])
+    columns = [receipts.c[name] for name in ("owner_uid", "vendor", "category", "gstin", "receipt_date", "amount", "tax_amount")]
+    for rows in _chunks(conn, columns):
+        for r in rows:
+            keys = {
+                "vendor": (r.vendor or "").strip() or "unknown",
+                "category": (r.category or "").strip() or "uncategorized",
+                "month": r.receipt_date.strftime("%Y-%m") if r.receipt_date else "unknown",
+                "gstin": (r.gstin or "").strip() or "unknown",
+            }
+            for dimension, key in keys.items():
+                entry = totals[(r.owner_uid or "", dimension, key)]
+                entry[0] += 1
+                entry[1] += float(r.amount or 0)
+                entry[2] += float(r.tax_amount or 0)
+    now = datetime.utcnow()
+    values = [
+        {"owner_uid": o, "dimension": d, "key": k, "receipt_count": c, "total_amount": a, "total_tax": x, "updated_at": now}
+        for (o, d, k), (c, a, x) in totals.items()
+    ]
+    if values:
+        conn.execute(summaries.insert(), values)
+
+
+def upgrade() -> None:
+    op.add_column('receipts', sa.Column('owner_uid', sa.String(), nullable=True))
+    op.create_index('ix_receipts_owner_uid_created_at', 'receipts', ['owner_uid', 'created_at'])
+    # Set LEGACY_RECEIPT_OWNER_UID to hand pre-existing receipts to one account
+    _backfill_receipt_owners(op.get_bind())
+
+    # Rollups are derived data: recreate keyed by owner and rebuild from receipts
+    op.drop_table('receipt_summaries')
+    summaries = op.create_table(
+        'receipt_summaries',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('owner_uid', sa.String(), nullable=False, server_default=''),
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('receipt_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_amount', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('total_tax', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint('owner_uid', 'dimension', 'key', name='uq_receipt_summaries_owner_dimension_key'),
+    )
+    _rebuild_summaries(op.get_bind(), summaries)
+
+
+def downgrade() -> None:
+    op.drop_table('receipt_summaries')
+    op.create_table(
+        'receipt_summaries',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('receipt_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_amount', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('total_tax', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint('dimension', 'key', name='uq_receipt_summaries_dimension_key'),
+    )
+    op.drop_index('ix_receipts_owner_uid_created_at', table_name='receipts')
+    op.drop_column('receipts', 'owner_uid')
@@ -0,0 +1,44 @@
+"""content-addressed blobs with reference counts
+
+Revision ID: 20251019_0005
+Revises: 20251019_0004
+Create Date: 2025-10-19 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '20251019_0005'
+down_revision: Union[str, None] = '20251019_0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blobs',
+        sa.Column('sha256', sa.String(), primary_key=True),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('mime_type', sa.String(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('ocr_text', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    with op.batch_alter_table('receipts') as batch:
+        batch.add_column(sa.Column('blob_sha256', sa.String(), nullable=True))
+        batch.create_foreign_key('fk_receipts_blob_sha256', 'blobs', ['blob_sha256'], ['sha256'])
+        batch.create_index('ix_receipts_blob_sha256', ['blob_sha256'])
+    # Existing files are moved into the blob store by `python -m services.backfill blobs`
+    # (file I/O is kept out of the migration).
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('receipts') as batch:
+        batch.drop_index('ix_receipts_blob_sha256')
+        batch.drop_constraint('fk_receipts_blob_sha256', type_='foreignkey')
+        batch.drop_column('blob_sha256')
+    op.drop_table('blobs')
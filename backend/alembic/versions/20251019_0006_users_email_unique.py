@@ -0,0 +1,63 @@
+"""users table with a unique index on email
+
+Revision ID: 20251019_0006
+Revises: 20251019_0005
+Create Date: 2025-10-19 00:00:00.000000
+
+Until now `users` only existed through Base.metadata.create_all, so a
+database built from migrations had no table, and one built by hand might
+lack the unique index that signup relies on to reject duplicate emails.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '20251019_0006'
+down_revision: Union[str, None] = '20251019_0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_unique_email(inspector) -> bool:
+    for index in inspector.get_indexes('users'):
+        if index['column_names'] == ['email'] and index['unique']:
+            return True
+    return any(c['column_names'] == ['email'] for c in inspector.get_unique_constraints('users'))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'users' not in inspector.get_table_names():
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('email', sa.String(), nullable=False),
+            sa.Column('hashed_password', sa.String(), nullable=False),
+            sa.Column('full_name', sa.String(), nullable=True),
+            sa.Column('is_active', sa.Integer(), nullable=True),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+        return
+
+    if _has_unique_email(inspector):
+        return
+    duplicates = bind.execute(sa.text(
+        "SELECT email FROM users GROUP BY email HAVING COUNT(*) > 1 LIMIT 5"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f"users.email has duplicates (e.g. {', '.join(duplicates)}); merge them before upgrading"
+        )
+    if 'ix_users_email' in {i['name'] for i in inspector.get_indexes('users')}:
+        op.drop_index('ix_users_email', table_name='users')
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+
+def downgrade() -> None:
+    # The table may predate this migration (create_all), so keep it and its data
+    pass
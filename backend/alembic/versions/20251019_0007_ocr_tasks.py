@@ -0,0 +1,61 @@
+"""ocr task queue and worker heartbeats
+
+Revision ID: 20251019_0007
+Revises: 20251019_0006
+Create Date: 2025-10-19 00:00:00.000000
+
+Tables behind the distributed OCR worker mode (services/ocr_queue.py):
+`ocr_tasks` is the queue that `python -m services.ocr_worker` processes claim
+from, `ocr_workers` their heartbeats.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '20251019_0007'
+down_revision: Union[str, None] = '20251019_0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ocr_tasks',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('receipt_id', sa.String(), sa.ForeignKey('receipts.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('blob_sha256', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('status', sa.String(), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3'),
+        sa.Column('worker_id', sa.String(), nullable=True),
+        sa.Column('available_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_ocr_tasks_status_priority_id', 'ocr_tasks', ['status', 'priority', 'id'])
+    op.create_index('ix_ocr_tasks_status_lease_expires_at', 'ocr_tasks', ['status', 'lease_expires_at'])
+    op.create_index('ix_ocr_tasks_receipt_id', 'ocr_tasks', ['receipt_id'])
+    op.create_table(
+        'ocr_workers',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('hostname', sa.String(), nullable=False),
+        sa.Column('pid', sa.Integer(), nullable=False),
+        sa.Column('tasks_done', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('started_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ocr_workers')
+    op.drop_index('ix_ocr_tasks_receipt_id', table_name='ocr_tasks')
+    op.drop_index('ix_ocr_tasks_status_lease_expires_at', table_name='ocr_tasks')
+    op.drop_index('ix_ocr_tasks_status_priority_id', table_name='ocr_tasks')
+    op.drop_table('ocr_tasks')
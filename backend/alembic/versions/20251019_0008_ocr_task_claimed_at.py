@@ -0,0 +1,31 @@
+"""ocr task claim time
+
+Revision ID: 20251019_0008
+Revises: 20251019_0007
+Create Date: 2025-10-19 00:00:00.000000
+
+`ocr_tasks.claimed_at` records when the current attempt was claimed, so
+heartbeats can stop extending a lease OCR_TASK_MAX_RUNTIME after it
+(updated_at moves on every heartbeat).
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '20251019_0008'
+down_revision: Union[str, None] = '20251019_0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('ocr_tasks', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+    # Tasks running during the upgrade get their cap counted from now
+    op.execute(sa.text("UPDATE ocr_tasks SET claimed_at = CURRENT_TIMESTAMP WHERE status = 'running'"))
+
+
+def downgrade() -> None:
+    op.drop_column('ocr_tasks', 'claimed_at')
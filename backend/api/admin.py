@@ -0,0 +1,57 @@
+"""
+Admin-only diagnostics.
+
+Profiling is opt-in per deployment (PROFILING_ENABLED) and per caller
+(ADMIN_UIDS or an `admin` custom claim, see api/auth.get_admin_user).
+"""
+
+import asyncio
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from api.auth import get_admin_user
+from services import profiler
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+
+router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
+
+
+@router.get("/profile")
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, le=profiler.PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(profiler.PROFILE_INTERVAL_MS, ge=1, le=500),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+    admin=Depends(get_admin_user),
+) -> Response:
+    """
+    Sample this worker's stacks for `seconds` and return the profile.
+
+    The event loop keeps serving requests while the profile is taken, so the
+    result shows the worker under its real load.
+
+    Returns:
+        Collapsed stacks (text) or a speedscope JSON file; sampling stats in X-Profile-* headers
+    """
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    sampler = profiler.SamplingProfiler(interval=interval_ms / 1000)
+    try:
+        sampler.start()
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+
+    body, media_type = profiler.render(sampler, format)
+    stats = sampler.stats()
+    extension = "speedscope.json" if format == "speedscope" else "collapsed.txt"
+    return Response(content=body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="profile-{os.getpid()}.{extension}"',
+        "X-Profile-Samples": str(stats["samples"]),
+        "X-Profile-Interval-Ms": str(stats["interval_ms"]),
+        "X-Profile-Overhead": str(stats["overhead"]),
+    })
@@ -1,20 +1,33 @@
 from fastapi import Request, Response, APIRouter, Depends, HTTPException, status
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordBearer
+import os
+import time
 import requests
 from .google_oauth_settings import GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REDIRECT_URI, FRONTEND_REDIRECT_URI
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from models import schemas, entities
-from database.session import get_db
+from database.session import get_db, get_async_db
 from services.firebase_admin import verify_firebase_token
+from services.passwords import HashingBusy, PasswordHasher
+from services.token_verifier import TTLCache
 
 SECRET_KEY = "your-secret-key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(pwd_context)
+
+# Active users resolved by get_current_user, keyed by token subject. Deactivating a user
+# (is_active=0) locks them out once their cache entry expires, i.e. within USER_CACHE_TTL
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+user_cache = TTLCache(maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")))
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -93,24 +106,43 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in attempts in progress, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 # Signup endpoint
 @router.post("/signup", response_model=schemas.UserOut)
-def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(entities.User).filter(entities.User.email == user.email).first()
-    if db_user:
+async def signup(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(select(entities.User.id).where(entities.User.email == user.email))
+    if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except HashingBusy:
+        raise hashing_busy()
     new_user = entities.User(email=user.email, hashed_password=hashed_password, full_name=user.full_name)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent signup; the unique index on users.email decides
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email already registered")
+    await db.refresh(new_user)
     return new_user
 
 # Signin endpoint
 @router.post("/signin")
-def signin(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(entities.User).filter(entities.User.email == user.email).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def signin(user: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(entities.User).where(entities.User.email == user.email))
+    try:
+        valid = await password_hasher.verify(user.password, db_user.hashed_password if db_user else None)
+    except HashingBusy:
+        raise hashing_busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     access_token = create_access_token({"sub": db_user.email})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -132,9 +164,13 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(entities.User).filter(entities.User.email == email).first()
+    user = user_cache.get(email)
     if user is None:
-        raise credentials_exception
+        user = db.query(entities.User).filter(entities.User.email == email).first()
+        if user is None or not user.is_active:
+            raise credentials_exception
+        db.expunge(user)
+        user_cache.set(email, user, time.time() + USER_CACHE_TTL)
     return user
 
 def get_current_firebase_user(request: Request):
@@ -147,17 +183,15 @@ def get_current_firebase_user(request: Request):
         raise HTTPException(status_code=401, detail="Invalid Firebase token")
     return decoded
 
+# Firebase uids allowed to use admin endpoints (besides tokens with an `admin` custom claim)
+ADMIN_UIDS = {uid.strip() for uid in os.getenv("ADMIN_UIDS", "").split(",") if uid.strip()}
+
+def get_admin_user(current_user=Depends(get_current_firebase_user)):
+    if current_user.get("admin") is True or current_user.get("uid") in ADMIN_UIDS:
+        return current_user
+    raise HTTPException(status_code=403, detail="Admin access required")
+
 # Protected endpoint
 @router.get("/users/me", response_model=schemas.UserOut)
 def read_users_me(current_user: entities.User = Depends(get_current_user)):
     return current_user
-
-from fastapi import APIRouter, Depends, Request
-from .auth import get_current_firebase_user
-
-router = APIRouter()
-
-@router.post("/api/v1/receipts/")
-def upload_receipt(request: Request, user=Depends(get_current_firebase_user)):
-    # user is the decoded Firebase user info
-    ...
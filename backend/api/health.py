@@ -1,7 +1,10 @@
 from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
 from typing import Dict, Any
 from datetime import datetime, timezone
 
+from services import health
+
 router = APIRouter(
     prefix="/api/v1/health",
     tags=["health"],
@@ -21,4 +24,18 @@ def get_health() -> Dict[str, Any]:
         "endpoint": "/api/v1/health",
         "version": "0.1.0",
         "time": datetime.now(timezone.utc).isoformat(),
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/ready")
+async def get_readiness() -> JSONResponse:
+    """
+    Readiness probe for load balancers: DB ping and pool saturation, Tesseract
+    availability, OCR backlog and free upload space. Cached briefly.
+
+    Returns:
+        200 with the probe results when ready, 503 with the same body when not
+    """
+    result = await health.readiness()
+    code = status.HTTP_200_OK if result["status"] == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(result, status_code=code)
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException, Response
+
+from services import metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics() -> Response:
+    """
+    Prometheus scrape endpoint.
+
+    Returns:
+        Metrics in the Prometheus text format; 404 when METRICS_ENABLED is off
+    """
+    body = metrics.render()
+    if body is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=body, media_type=metrics.CONTENT_TYPE)
@@ -2,30 +2,34 @@
 # from services.ocr import OCRService
 # svc = OCRService()
 # text = svc.extract_text_from_image(receipt_image_path_or_bytes)
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status, Query, Body, Form
-from fastapi.responses import FileResponse
+import os
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status, Query, Body, Form, Header, Response
+from fastapi.responses import FileResponse, ORJSONResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from api.auth import get_current_firebase_user
-from typing import Dict, List, Any, Optional
-from sqlalchemy.orm import Session
+from api.serialization import resolve_fields, serialize_receipt, receipt_etag, etag_matches
+from typing import AsyncIterator, Dict, List, Any, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_, and_
-from database.session import get_db
-from models.entities import Receipt
-from services.ocr import ocr_service
+from sqlalchemy.orm import selectinload, load_only
+from database.session import get_async_db
+from models.entities import Receipt, Blob
+from services.registry import registry
 from services.parser import ParserService
-import uuid
-import io
-import shutil
-from pathlib import Path
+from services import summaries, blobstore, derivatives, metrics, ocr_queue
+from services.admission import AdmissionRejected, admission
+from services.scheduler import Priority, ocr_scheduler
+from services.storage import IMAGE_MIME, MAX_SIZE_BYTES, UploadRejected, stream_upload
+from datetime import date
 
 router = APIRouter(
     prefix="/api/v1/receipts",
     tags=["receipts"],
+    default_response_class=ORJSONResponse,
 )
 
-# Define a directory to save uploads
-UPLOADS_DIR = Path("uploads")
-UPLOADS_DIR.mkdir(exist_ok=True)
-
 # Error model for consistent error responses
 def error_response(code: str, message: str, details: Any = None) -> Dict[str, Any]:
     response = {"error": {"code": code, "message": message}}
@@ -34,190 +38,366 @@ def error_response(code: str, message: str, details: Any = None) -> Dict[str, An
     return response
 
 
+def owner_uid(current_user: Dict[str, Any]) -> str:
+    """Firebase uid of the caller; every receipt query is scoped to it."""
+    return current_user["uid"]
+
+
+async def get_owned_receipt(db: AsyncSession, id: str, current_user: Dict[str, Any], *options: Any) -> Receipt:
+    """Load a receipt owned by the caller, or 404 (other users' receipts are indistinguishable from missing ones)."""
+    stmt = select(Receipt).where(Receipt.id == id, Receipt.owner_uid == owner_uid(current_user)).options(*options)
+    obj = (await db.execute(stmt)).scalar_one_or_none()
+    if not obj:
+        raise HTTPException(status_code=404, detail=error_response("NOT_FOUND", f"Receipt with ID {id} not found"))
+    return obj
+
+
+def upload_error(exc: UploadRejected) -> HTTPException:
+    return HTTPException(status_code=exc.status_code, detail=error_response(exc.code, exc.message))
+
+
+@asynccontextmanager
+async def ocr_admission(current_user: Dict[str, Any], bulk: bool = False, images: int = 1) -> AsyncIterator[None]:
+    """Hold an OCR admission ticket for the block; refusals become 429/503 with Retry-After."""
+    try:
+        ticket = await admission.acquire(owner_uid(current_user), bulk=bulk, cost=images)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code, detail=error_response(e.code, e.message),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    try:
+        yield
+    finally:
+        admission.release(ticket)
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def create_receipt(
+    response: Response,
+    file: UploadFile = File(...),
+    ocr_deadline: Optional[float] = Header(None, alias="X-OCR-Deadline"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_firebase_user)
+) -> Dict[str, Any]:
+    """
+    Upload a single receipt image, run OCR and parser, and store it as a draft for review.
+    Returns 429/503 with Retry-After when OCR admission control refuses the request.
+    With OCR_BROKER on, OCR is queued for the worker fleet instead: the receipt is stored
+    with status "processing" and returned with 202, and a worker fills it in.
+
+    Args:
+        ocr_deadline: X-OCR-Deadline header, seconds the caller will wait for OCR; a tight
+            deadline gets the faster single-pipeline OCR (default OCR_DEADLINE_INTERACTIVE)
+    """
+    async with ocr_admission(current_user):
+        try:
+            upload = await stream_upload(file, max_size=MAX_SIZE_BYTES, allowed=IMAGE_MIME)
+        except UploadRejected as e:
+            raise upload_error(e)
+
+        blob = await blobstore.acquire(db, upload.sha256, upload.size, upload.mime_type)
+        metrics.cache_access("ocr_text", bool(blob.ocr_text))
+        if blob.ocr_text:
+            text = blob.ocr_text  # identical image seen before
+        elif ocr_queue.OCR_BROKER:
+            text = None  # an OCR worker reads the stored blob
+        else:
+            # OCR decodes the in-memory bytes; no need to read the stored file back
+            text = await ocr_scheduler.run(upload.content, Priority.INTERACTIVE, owner_uid(current_user), ocr_deadline)
+            blob.ocr_text = text or None
+    parser = ParserService()
+    parsed = parser.parse(text) if text is not None else {}
+
+    obj = Receipt(
+        owner_uid=owner_uid(current_user),
+        filename=upload.filename,
+        mime_type=upload.mime_type,
+        blob_sha256=upload.sha256,
+        extracted={"sha256": upload.sha256, "size": upload.size, "path": upload.path},
+        **ocr_queue.parsed_fields(parsed, parser),
+    )
+    if text is None:
+        obj.status = ocr_queue.PROCESSING
+        obj.extracted["ocr_status"] = ocr_queue.QUEUED
+    else:
+        obj.extracted.update(ocr_text=text, parsed=parsed)
+    db.add(obj)
+    await db.flush()
+    await summaries.apply_change(db, None, summaries.snapshot(obj))
+    if text is None:
+        await ocr_queue.enqueue(db, obj, ocr_queue.UPLOAD, Priority.INTERACTIVE)
+        response.status_code = status.HTTP_202_ACCEPTED
+    await db.commit()
+    await db.refresh(obj)
+    if upload.deduplicated:
+        # A worker that gets there first fails the attempt and retries after OCR_TASK_RETRY_DELAY
+        await run_in_threadpool(blobstore.ensure_stored, upload.sha256, upload.content)
+    derivatives.schedule(upload.sha256, upload.content)
+    return serialize_receipt(obj)
+
+
 # New endpoint for multiple file upload and batch processing
 @router.post("/batch", status_code=status.HTTP_201_CREATED)
 async def create_receipts_batch(
     files: List[UploadFile] = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_firebase_user)
 ) -> Any:
     """
     Upload multiple receipt images, run OCR and parser, and return batch results as downloadable file.
+    Batches are bulk work for admission control: they yield to single uploads and count
+    every image against the caller's rate limit (429/503 with Retry-After when refused).
+    The CSV is the response, so batches are OCR'd here even with OCR_BROKER on.
     """
-    allowed_types = {"image/png", "image/jpeg", "image/jpg"}
-    max_size = 10 * 1024 * 1024  # 10 MB per file
     parser = ParserService()
     batch_results = []
-    file_paths = []
+    uploads = []
     errors = []
 
-    for file in files:
-        if not file or not file.filename:
-            errors.append({"filename": None, "error": "No file uploaded"})
-            continue
-        if file.content_type not in allowed_types:
-            errors.append({"filename": file.filename, "error": f"File type {file.content_type} not allowed"})
-            continue
-        try:
-            file.file.seek(0, io.SEEK_END)
-            size = file.file.tell()
-            file.file.seek(0)
-        except Exception:
-            size = 0
-        if size > max_size:
-            errors.append({"filename": file.filename, "error": "File too large"})
-            continue
-        file_path = UPLOADS_DIR / f"{uuid.uuid4()}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        file_paths.append(str(file_path))
-
-    # Batch OCR processing
-    from services.ocr import ocr_service
-    extracted_texts = ocr_service.extract_texts_from_images(file_paths)
-
-    for idx, text in enumerate(extracted_texts):
+    async with ocr_admission(current_user, bulk=True, images=len(files)):
+        for file in files:
+            if not file or not file.filename:
+                errors.append({"filename": None, "error": "No file uploaded"})
+                continue
+            try:
+                uploads.append(await stream_upload(file, max_size=MAX_SIZE_BYTES, allowed=IMAGE_MIME))
+            except UploadRejected as e:
+                errors.append({"filename": file.filename, "error": e.message})
+
+        # Batch exports don't create receipts, so the blobs are registered without references
+        blobs = [await blobstore.acquire(db, u.sha256, u.size, u.mime_type, refs=0) for u in uploads]
+        pending = list({u.sha256: u for u, b in zip(uploads, blobs) if not b.ocr_text}.values())
+        for blob in blobs:
+            metrics.cache_access("ocr_text", bool(blob.ocr_text))
+
+        # Batch OCR processing, straight from the uploaded bytes (cached text is reused)
+        fresh = await ocr_scheduler.run_many([u.content for u in pending], Priority.BULK, owner_uid(current_user))
+    fresh_by_sha = dict(zip((u.sha256 for u in pending), fresh))
+    for blob in blobs:
+        if not blob.ocr_text:
+            blob.ocr_text = fresh_by_sha[blob.sha256] or None
+    await db.commit()
+    extracted_texts = [b.ocr_text or fresh_by_sha.get(b.sha256, "") for b in blobs]
+
+    for upload, text in zip(uploads, extracted_texts):
         try:
             parsed = parser.parse(text)
         except Exception as e:
             parsed = {"error": str(e)}
         batch_results.append({
-            "filename": files[idx].filename,
+            "filename": upload.filename,
             "ocr_text": text,
             "parsed": parsed
         })
 
     # Generate CSV file from batch results
-    from services.compliance import generate_csv_from_batch
-    csv_path = generate_csv_from_batch(batch_results)
-    return FileResponse(csv_path, filename="receipts_batch.csv", media_type="text/csv")
+    csv_path = registry.get("compliance").generate_csv_from_batch(batch_results)
+    # The export is only needed for this response; the retention sweeper catches any left behind
+    return FileResponse(
+        csv_path, filename="receipts_batch.csv", media_type="text/csv",
+        background=BackgroundTask(os.unlink, csv_path),
+    )
 
 @router.get("/")
 async def list_receipts(
     q: Optional[str] = None,
     gstin: Optional[str] = None,
     status: Optional[str] = None,
+    date_from: Optional[date] = Query(None, description="Inclusive, YYYY-MM-DD"),
+    date_to: Optional[date] = Query(None, description="Inclusive, YYYY-MM-DD"),
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    view: str = Query("summary", pattern="^(summary|full)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated projection, e.g. id,vendor,amount"),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_firebase_user)
 ) -> Dict[str, Any]:
     """List receipts with optional filtering and pagination."""
-    conditions = []
+    selected = resolve_fields(view, fields)
+    conditions = [Receipt.owner_uid == owner_uid(current_user)]
     if gstin:
         conditions.append(Receipt.gstin == gstin)
     if status:
         conditions.append(Receipt.status == status)
+    if date_from:
+        conditions.append(Receipt.receipt_date >= date_from)
+    if date_to:
+        conditions.append(Receipt.receipt_date <= date_to)
     if q:
         like = f"%{q}%"
         conditions.append(or_(Receipt.vendor.ilike(like), Receipt.category.ilike(like)))
 
-    where_clause = and_(*conditions) if conditions else None
+    where_clause = and_(*conditions)
 
     # Total count
-    total = db.scalar(select(func.count()).select_from(Receipt).where(where_clause)) if where_clause else db.scalar(select(func.count()).select_from(Receipt))
+    total = await db.scalar(select(func.count()).select_from(Receipt).where(where_clause))
 
     # Page query
-    stmt = select(Receipt).where(where_clause) if where_clause else select(Receipt)
+    stmt = select(Receipt).where(where_clause)
     stmt = stmt.order_by(Receipt.created_at.desc()).offset((page - 1) * size).limit(size)
-    rows = db.execute(stmt).scalars().all()
-
-    def to_dict(obj: Receipt) -> Dict[str, Any]:
-        return {
-            "id": obj.id,
-            "vendor": obj.vendor,
-            "date": obj.date,
-            "amount": obj.amount,
-            "currency": obj.currency,
-            "category": obj.category,
-            "gstin": obj.gstin,
-            "tax_amount": obj.tax_amount,
-            "status": obj.status,
-            "filename": obj.filename,
-            "mime_type": obj.mime_type,
-            "extracted": obj.extracted or {},
-            "created_at": obj.created_at.isoformat() if obj.created_at else None,
-            "updated_at": obj.updated_at.isoformat() if obj.updated_at else None,
-        }
+    # Only pull the projected columns (skips the extracted JSON blob for summary rows)
+    stmt = stmt.options(load_only(*[getattr(Receipt, f) for f in selected]))
+    rows = (await db.execute(stmt)).scalars().all()
 
     return {
-        "items": [to_dict(r) for r in rows],
+        "items": [serialize_receipt(r, selected) for r in rows],
         "total": int(total or 0),
         "page": page,
         "size": size,
     }
 
-@router.get("/{id}")
-async def get_receipt(
-    id: str,
-    db: Session = Depends(get_db),
+@router.get("/summary")
+async def get_receipts_summary(
+    dimension: Optional[str] = Query(None, pattern="^(vendor|category|month|gstin)$"),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_firebase_user)
 ) -> Dict[str, Any]:
-    """Get details for a specific receipt by ID."""
-    obj = db.get(Receipt, id)
-    if not obj:
-        raise HTTPException(status_code=404, detail=error_response("NOT_FOUND", f"Receipt with ID {id} not found"))
+    """Spend totals per vendor, category, month and GSTIN, served from the rollup table."""
+    dimensions = [dimension] if dimension else list(summaries.DIMENSIONS)
     return {
-        "id": obj.id,
-        "vendor": obj.vendor,
-        "date": obj.date,
-        "amount": obj.amount,
-        "currency": obj.currency,
-        "category": obj.category,
-        "gstin": obj.gstin,
-        "tax_amount": obj.tax_amount,
-        "status": obj.status,
-        "filename": obj.filename,
-        "mime_type": obj.mime_type,
-        "extracted": obj.extracted or {},
-        "created_at": obj.created_at.isoformat() if obj.created_at else None,
-        "updated_at": obj.updated_at.isoformat() if obj.updated_at else None,
+        "totals": await summaries.fetch_totals(db, owner_uid(current_user)),
+        "summaries": await summaries.fetch_summaries(db, owner_uid(current_user), dimensions, limit),
     }
 
+@router.get("/{id}")
+async def get_receipt(
+    id: str,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma-separated projection, e.g. id,vendor,amount"),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_firebase_user)
+) -> Any:
+    """Get details for a specific receipt by ID. Honours If-None-Match with a 304."""
+    selected = resolve_fields("full", fields)
+    obj = await get_owned_receipt(db, id, current_user)
+    etag = receipt_etag(obj, selected)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return serialize_receipt(obj, selected)
+
 @router.patch("/{id}")
 async def update_receipt(
     id: str,
+    response: Response,
     payload: Dict[str, Any] = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_firebase_user)
 ) -> Dict[str, Any]:
     """Update a receipt with user-verified information."""
-    obj = db.get(Receipt, id)
-    if not obj:
-        raise HTTPException(status_code=404, detail=error_response("NOT_FOUND", f"Receipt with ID {id} not found"))
+    obj = await get_owned_receipt(db, id, current_user)
 
     allowed = {"vendor", "date", "amount", "currency", "category", "gstin", "tax_amount", "status"}
+    before = summaries.snapshot(obj)
     for k, v in payload.items():
         if k in allowed:
             setattr(obj, k, v)
 
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await summaries.apply_change(db, before, summaries.snapshot(obj))
+    await db.commit()
+    await db.refresh(obj)
 
-    return {
-        "id": obj.id,
-        "vendor": obj.vendor,
-        "date": obj.date,
-        "amount": obj.amount,
-        "currency": obj.currency,
-        "category": obj.category,
-        "gstin": obj.gstin,
-        "tax_amount": obj.tax_amount,
-        "status": obj.status,
-        "filename": obj.filename,
-        "mime_type": obj.mime_type,
-        "extracted": obj.extracted or {},
-        "created_at": obj.created_at.isoformat() if obj.created_at else None,
-        "updated_at": obj.updated_at.isoformat() if obj.updated_at else None,
-    }
+    response.headers["ETag"] = receipt_etag(obj, resolve_fields("full"))
+    return serialize_receipt(obj)
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_receipt(id: str, db: Session = Depends(get_db), current_user=Depends(get_current_firebase_user)) -> None:
+async def delete_receipt(id: str, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_firebase_user)) -> None:
     """Delete a receipt by ID."""
-    obj = db.get(Receipt, id)
-    if not obj:
-        raise HTTPException(status_code=404, detail=error_response("NOT_FOUND", f"Receipt with ID {id} not found"))
-    db.delete(obj)
-    db.commit()
+    # Load issues up front: the delete-orphan cascade can't lazy-load under asyncio
+    obj = await get_owned_receipt(db, id, current_user, selectinload(Receipt.issues))
+    await db.delete(obj)
+    await blobstore.release(db, obj.blob_sha256)
+    await summaries.apply_change(db, summaries.snapshot(obj), None)
+    await db.commit()
     return None
+
+
+# Blobs are content-addressed, so anything served from them never changes
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+async def _blob_response(obj: Receipt, name: Optional[str], if_none_match: Optional[str]) -> Response:
+    if not obj.blob_sha256:
+        raise HTTPException(status_code=404, detail=error_response("NOT_FOUND", "Receipt has no stored image"))
+    etag = f'"{obj.blob_sha256}{"." + name if name else ""}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    backend = blobstore.get_blob_backend()
+    if name:
+        data = await run_in_threadpool(derivatives.get_or_create, obj.blob_sha256, name, backend)
+        media_type = derivatives.MEDIA_TYPES[name]
+    else:
+        data = await run_in_threadpool(backend.read, obj.blob_sha256)
+        media_type = obj.mime_type or "application/octet-stream"
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+@router.get("/{id}/image")
+async def get_receipt_image(
+    id: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_firebase_user)
+) -> Response:
+    """The original uploaded image."""
+    obj = await get_owned_receipt(db, id, current_user)
+    return await _blob_response(obj, None, if_none_match)
+
+
+@router.get("/{id}/thumbnail")
+async def get_receipt_thumbnail(
+    id: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_firebase_user)
+) -> Response:
+    """Compressed preview for lists and the dashboard."""
+    obj = await get_owned_receipt(db, id, current_user)
+    return await _blob_response(obj, derivatives.THUMB, if_none_match)
+
+
+@router.post("/{id}/reprocess")
+async def reprocess_receipt(
+    id: str,
+    response: Response,
+    background: bool = Query(False, description="Bulk reprocessing: runs only when interactive OCR is idle"),
+    ocr_deadline: Optional[float] = Header(None, alias="X-OCR-Deadline"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_firebase_user)
+) -> Dict[str, Any]:
+    """
+    Re-run OCR and parsing from the stored OCR-ready image. Refreshes `extracted`
+    only; user-verified fields are left alone. With OCR_BROKER on, the work is queued
+    (202, `extracted.ocr_status` is "queued") unless a task for the receipt already is.
+
+    Args:
+        background: schedule at background priority, with no deadline (overnight jobs)
+        ocr_deadline: X-OCR-Deadline header, as for uploads (not used with OCR_BROKER)
+    """
+    obj = await get_owned_receipt(db, id, current_user)
+    if not obj.blob_sha256:
+        raise HTTPException(status_code=404, detail=error_response("NOT_FOUND", "Receipt has no stored image"))
+    priority = Priority.BACKGROUND if background else Priority.INTERACTIVE
+    if ocr_queue.OCR_BROKER:
+        if await ocr_queue.pending_for(db, obj.id) is None:
+            await ocr_queue.enqueue(db, obj, ocr_queue.REPROCESS, priority)
+            obj.extracted = {**(obj.extracted or {}), "ocr_status": ocr_queue.QUEUED}
+            await db.commit()
+            await db.refresh(obj)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return serialize_receipt(obj)
+    async with ocr_admission(current_user, bulk=background):
+        gray = await run_in_threadpool(derivatives.load_ocr_ready, obj.blob_sha256)
+        text = await ocr_scheduler.run(gray, priority, owner_uid(current_user), ocr_deadline)
+    blob = await db.get(Blob, obj.blob_sha256)
+    if blob is not None and text:
+        blob.ocr_text = text
+    obj.extracted = {**(obj.extracted or {}), "ocr_text": text, "parsed": ParserService().parse(text)}
+    await db.commit()
+    await db.refresh(obj)
+    return serialize_receipt(obj)
@@ -0,0 +1,77 @@
+"""
+Shared receipt serialization for the API routes.
+
+Routes pick a view ("summary" for list rows, "full" for detail) and may narrow
+it further with a `?fields=a,b,c` projection. Responses are rendered with
+ORJSONResponse (see the receipts router's default_response_class).
+"""
+
+import zlib
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+
+from models.entities import Receipt
+
+SUMMARY_FIELDS = (
+    "id", "vendor", "date", "receipt_date", "amount", "currency", "category",
+    "gstin", "tax_amount", "status", "created_at", "updated_at",
+)
+FULL_FIELDS = SUMMARY_FIELDS + ("filename", "mime_type", "extracted")
+VIEWS = {"summary": SUMMARY_FIELDS, "full": FULL_FIELDS}
+
+
+def _iso(value: Optional[date]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+# Per-field getters; anything not listed here is read straight off the entity
+_GETTERS: Dict[str, Callable[[Receipt], Any]] = {
+    "receipt_date": lambda r: _iso(r.receipt_date),
+    "extracted": lambda r: r.extracted or {},
+    "created_at": lambda r: _iso(r.created_at),
+    "updated_at": lambda r: _iso(r.updated_at),
+}
+
+
+def resolve_fields(view: str = "full", fields: Optional[str] = None) -> List[str]:
+    """
+    Work out which fields to emit for a view and optional comma-separated projection.
+    `id` is always included. Unknown field names are a 400.
+    """
+    allowed = VIEWS[view]
+    if not fields:
+        return list(allowed)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in FULL_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail={"error": {
+            "code": "INVALID_FIELDS",
+            "message": f"Unknown fields: {', '.join(unknown)}",
+            "details": {"allowed": list(FULL_FIELDS)},
+        }})
+    return ["id"] + [f for f in requested if f != "id"]
+
+
+def serialize_receipt(obj: Receipt, fields: Iterable[str] = FULL_FIELDS) -> Dict[str, Any]:
+    """Render a Receipt as a plain dict containing only `fields`."""
+    out: Dict[str, Any] = {}
+    for name in fields:
+        getter = _GETTERS.get(name)
+        out[name] = getter(obj) if getter else getattr(obj, name)
+    return out
+
+
+def receipt_etag(obj: Receipt, fields: Iterable[str]) -> str:
+    """Weak ETag from the row version (updated_at) and the projection requested."""
+    version = obj.updated_at.timestamp() if obj.updated_at else 0
+    projection = format(zlib.crc32(",".join(fields).encode()), "x")
+    return f'W/"{obj.id}-{version:.6f}-{projection}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {c.strip() for c in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
@@ -0,0 +1,156 @@
+"""
+Firebase token verification benchmark.
+
+A local stand-in for Google's certificate endpoint serves a self-signed key
+(optionally with an artificial delay), and tokens are minted with that key.
+It measures:
+- the first request with and without background key prefetch (the fetch
+  either lands on the request or not)
+- uncached verification (RS256 signature + claims) per distinct token
+- cached verification of a repeated token
+
+    python -m benchmarks.auth_bench --tokens 500 --key-server-delay 0.2 --output auth.json
+"""
+
+import argparse
+import datetime as dt
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from jose import jwt
+
+from services.token_verifier import CertificateStore, FirebaseTokenDecoder, TokenVerifier, fetch_certificates
+
+PROJECT_ID = "complicopilot-bench"
+
+
+def make_signing_key() -> Tuple[bytes, str]:
+    """RSA private key (PEM) and a matching self-signed certificate (PEM), like Google publishes."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.local")])
+    now = dt.datetime.now(dt.timezone.utc)
+    cert = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - dt.timedelta(days=1)).not_valid_after(now + dt.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return private_pem, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def mint_token(private_pem: bytes, kid: str, uid: str, project_id: str = PROJECT_ID, ttl: int = 3600, **claims: Any) -> str:
+    now = int(time.time())
+    payload = {
+        "iss": f"https://securetoken.google.com/{project_id}", "aud": project_id, "sub": uid,
+        "iat": now, "auth_time": now, "exp": now + ttl, **claims,
+    }
+    return jwt.encode(payload, private_pem, algorithm="RS256", headers={"kid": kid})
+
+
+class KeyServer:
+    """Serves {kid: cert} with Cache-Control like the real endpoint, after `delay` seconds."""
+
+    def __init__(self, certs: Dict[str, str], delay: float = 0.0, max_age: int = 3600):
+        body = json.dumps(certs).encode()
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", f"public, max-age={max_age}")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/certs"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+
+
+def _stats(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_us": round(statistics.median(ordered) * 1e6, 1),
+        "p95_us": round(ordered[int(0.95 * (len(ordered) - 1))] * 1e6, 1),
+        "mean_us": round(statistics.fmean(ordered) * 1e6, 1),
+        "n": len(ordered),
+    }
+
+
+def _timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def run_benchmark(tokens: int = 200, key_server_delay: float = 0.1) -> Dict[str, Any]:
+    private_pem, cert_pem = make_signing_key()
+    server = KeyServer({"k1": cert_pem}, delay=key_server_delay)
+    fetch = lambda: fetch_certificates(server.url)  # noqa: E731
+    minted = [mint_token(private_pem, "k1", f"user-{i}") for i in range(tokens)]
+    try:
+        # First request when keys are fetched on demand vs. prefetched in the background
+        lazy = CertificateStore(fetch)
+        lazy_verifier = TokenVerifier(FirebaseTokenDecoder(PROJECT_ID, lazy))
+        first_lazy = _timed(lambda: (lazy.refresh(), lazy_verifier.verify(minted[0])))
+
+        store = CertificateStore(fetch)
+        store.start()
+        deadline = time.time() + 10 + key_server_delay
+        while not store.loaded and time.time() < deadline:
+            time.sleep(0.01)
+        verifier = TokenVerifier(FirebaseTokenDecoder(PROJECT_ID, store))
+        first_prefetched = _timed(verifier.verify, minted[0])
+
+        uncached = [_timed(verifier.verify, t) for t in minted[1:]]
+        cached = [_timed(verifier.verify, minted[1]) for _ in range(len(minted))]
+        store.stop()
+    finally:
+        server.close()
+
+    return {
+        "key_server_delay_ms": key_server_delay * 1000,
+        "first_request_ms": {
+            "fetch_on_request": round(first_lazy * 1000, 2),
+            "prefetched": round(first_prefetched * 1000, 2),
+        },
+        "verify_uncached": _stats(uncached),
+        "verify_cached": _stats(cached),
+        "key_fetches": server.requests,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Benchmark Firebase token verification")
+    arg_parser.add_argument("--tokens", type=int, default=200, help="distinct tokens to verify")
+    arg_parser.add_argument("--key-server-delay", type=float, default=0.1, help="seconds the key server takes to answer")
+    arg_parser.add_argument("--output", help="write results JSON here")
+    args = arg_parser.parse_args(argv)
+
+    rendered = json.dumps(run_benchmark(args.tokens, args.key_server_delay), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered)
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Reproducible synthetic receipt corpus for the OCR benchmarks.
+
+Each sample is a receipt rendered with PIL from a seeded random generator,
+then degraded with a known skew, sensor noise, blur and capture resolution.
+The ground truth (vendor, date, total) is kept alongside the image, so the
+same seed always yields byte-identical images and the same expected fields.
+"""
+
+import io
+import json
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+DEFAULT_SEED = 1234
+
+VENDORS = [
+    "SuperMart Grocery", "Chai Point Cafe", "Sharma Electronics", "Green Leaf Restaurant",
+    "City Medical Store", "Metro Cash and Carry", "Blue Tokai Coffee", "Om Sai Hardware",
+]
+ITEMS = ["Milk", "Bread", "Eggs", "Rice 5kg", "Tea", "Coffee", "Paneer", "Soap", "Batteries", "Notebook"]
+
+# Degradation ranges sampled per receipt
+SKEW_DEGREES = (-6.0, 6.0)
+NOISE_SIGMA = (0.0, 18.0)
+BLUR_RADIUS = (0.0, 1.6)
+SCALES = (0.6, 1.0, 1.5, 2.5)  # relative capture resolution; 1.0 renders ~600px wide
+
+
+@dataclass
+class Sample:
+    id: str
+    content: bytes = field(repr=False)
+    truth: Dict[str, str]
+    params: Dict[str, float]
+    text: str = field(repr=False, default="")
+
+    def manifest(self) -> Dict:
+        return {"id": self.id, "truth": self.truth, "params": self.params}
+
+
+def _receipt_lines(rng: random.Random) -> Tuple[List[str], Dict[str, str]]:
+    vendor = rng.choice(VENDORS)
+    day, month, year = rng.randint(1, 28), rng.randint(1, 12), rng.randint(2022, 2025)
+    receipt_date = f"{day:02d}/{month:02d}/{year}"
+    items = [(rng.choice(ITEMS), rng.randint(1, 4), rng.randint(10, 900) + rng.choice((0, 0.5, 0.25))) for _ in range(rng.randint(2, 6))]
+    subtotal = sum(qty * price for _, qty, price in items)
+    tax = round(subtotal * 0.18, 2)
+    total = f"{subtotal + tax:.2f}"
+    lines = [
+        vendor,
+        f"{rng.randint(1, 999)} MG Road, Bengaluru",
+        f"Date: {receipt_date}",
+        "",
+        *[f"{qty} x {name:<12} {qty * price:>9.2f}" for name, qty, price in items],
+        "",
+        f"GST 18%          {tax:>9.2f}",
+        f"TOTAL            {total:>9}",
+        "Thank you, visit again",
+    ]
+    return lines, {"vendor": vendor, "date": receipt_date, "total": total}
+
+
+def render_receipt(lines: List[str], scale: float = 1.0) -> Image.Image:
+    """Render receipt lines as clean black-on-white text at the given resolution scale."""
+    font_size = max(8, round(22 * scale))
+    font = ImageFont.load_default(size=font_size)
+    line_height = round(font_size * 1.4)
+    margin = round(30 * scale)
+    width = round(600 * scale)
+    img = Image.new("L", (width, 2 * margin + line_height * len(lines)), 255)
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(lines):
+        draw.text((margin, margin + i * line_height), line, fill=0, font=font)
+    return img
+
+
+def degrade(img: Image.Image, skew: float, noise: float, blur: float, rng: np.random.Generator) -> Image.Image:
+    """Apply rotation, blur and Gaussian sensor noise, in that order."""
+    if skew:
+        img = img.rotate(skew, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if blur:
+        img = img.filter(ImageFilter.GaussianBlur(blur))
+    if noise:
+        arr = np.asarray(img, dtype=np.float32) + rng.normal(0.0, noise, (img.height, img.width))
+        img = Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8))
+    return img
+
+
+def generate_corpus(size: int = 24, seed: int = DEFAULT_SEED) -> List[Sample]:
+    """
+    Build `size` receipts. Scales cycle through SCALES so every resolution is
+    represented; the other degradations are drawn from their ranges.
+    """
+    rng = random.Random(seed)
+    noise_rng = np.random.default_rng(seed)
+    samples = []
+    for i in range(size):
+        lines, truth = _receipt_lines(rng)
+        params = {
+            "skew": round(rng.uniform(*SKEW_DEGREES), 2),
+            "noise": round(rng.uniform(*NOISE_SIGMA), 2),
+            "blur": round(rng.uniform(*BLUR_RADIUS), 2),
+            "scale": SCALES[i % len(SCALES)],
+        }
+        img = degrade(render_receipt(lines, params["scale"]), params["skew"], params["noise"], params["blur"], noise_rng)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=90)
+        samples.append(Sample(id=f"r{i:03d}", content=buf.getvalue(), truth=truth, params=params, text="\n".join(lines)))
+    return samples
+
+
+def write_corpus(samples: List[Sample], out_dir: str) -> Path:
+    """Write images plus a manifest.json with the ground truth; returns the manifest path."""
+    root = Path(out_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    for sample in samples:
+        (root / f"{sample.id}.jpg").write_bytes(sample.content)
+    manifest = root / "manifest.json"
+    manifest.write_text(json.dumps([s.manifest() for s in samples], indent=2))
+    return manifest
+
+
+def load_corpus(manifest_path: str) -> List[Sample]:
+    """Read a corpus written by write_corpus()."""
+    manifest = Path(manifest_path)
+    entries = json.loads(manifest.read_text())
+    return [
+        Sample(id=e["id"], content=(manifest.parent / f"{e['id']}.jpg").read_bytes(), truth=e["truth"], params=e["params"])
+        for e in entries
+    ]
+
+
+def corpus_for(manifest_path: Optional[str], size: int, seed: int) -> List[Sample]:
+    """A saved corpus if a manifest is given, otherwise a freshly generated one."""
+    return load_corpus(manifest_path) if manifest_path else generate_corpus(size, seed)
+
@@ -0,0 +1,110 @@
+"""
+Cold-start benchmark.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and
+reports the total import time, the slowest modules by cumulative and self
+time, and which heavy modules (OpenCV, numpy, pytesseract, pandas,
+firebase_admin) got imported although the registry should load them lazily.
+With --serve it also starts the app under uvicorn and measures the time until
+the first health check answers.
+
+    python -m benchmarks.import_bench --top 20 --output imports.json
+    python -m benchmarks.import_bench --module services.ocr
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+HEAVY_MODULES = ("cv2", "numpy", "pytesseract", "pandas", "PIL", "firebase_admin")
+
+
+class ImportRecord(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportRecord]:
+    """Parse `-X importtime` lines ("import time:  self [us] | cumulative | module")."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        records.append(ImportRecord(stripped, int(fields[0]), int(fields[1]), (len(name) - len(stripped)) // 2))
+    return records
+
+
+def measure_imports(module: str = "main") -> List[ImportRecord]:
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_dir, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def summarize(records: List[ImportRecord], top: int = 15) -> Dict[str, Any]:
+    top_level = [r for r in records if r.depth == 0]
+    loaded = {r.module for r in records}
+    return {
+        "total_ms": round(sum(r.cumulative_us for r in top_level) / 1000, 1),
+        "modules": len(records),
+        "heavy_modules_loaded": [m for m in HEAVY_MODULES if m in loaded],
+        "top_cumulative_ms": {
+            r.module: round(r.cumulative_us / 1000, 1)
+            for r in sorted(records, key=lambda r: r.cumulative_us, reverse=True)[:top]
+        },
+        "top_self_ms": {
+            r.module: round(r.self_us / 1000, 1)
+            for r in sorted(records, key=lambda r: r.self_us, reverse=True)[:top]
+        },
+    }
+
+
+def time_to_first_health() -> float:
+    """Seconds from launching uvicorn to the first 200 from /api/v1/health/."""
+    from benchmarks.load_test import start_server
+
+    start = time.perf_counter()
+    proc, _url = start_server()
+    elapsed = time.perf_counter() - start
+    proc.terminate()
+    proc.wait()
+    return elapsed
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Measure backend import time and cold start")
+    arg_parser.add_argument("--module", default="main", help="module to import")
+    arg_parser.add_argument("--top", type=int, default=15, help="how many of the slowest modules to list")
+    arg_parser.add_argument("--serve", action="store_true", help="also time uvicorn start to first health response")
+    arg_parser.add_argument("--output", help="write results JSON here")
+    args = arg_parser.parse_args(argv)
+
+    results = summarize(measure_imports(args.module), args.top)
+    results["module"] = args.module
+    if args.serve:
+        results["first_health_ms"] = round(time_to_first_health() * 1000, 1)
+
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered)
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Load test for the receipts API.
+
+Starts the app (main:app) under uvicorn against a throwaway SQLite database,
+with Firebase verification stubbed by DEVELOPMENT_MODE, then drives a weighted
+mix of upload, batch, list, get and patch requests from concurrent clients
+and reports p50/p95/p99 latency, throughput and errors per endpoint:
+
+    python -m benchmarks.load_test --duration 30 --concurrency 16 --output load.json
+    python -m benchmarks.load_test --url http://staging:8000 --mix list=5,get=5,patch=1
+
+Upload images come from the synthetic receipt corpus (benchmarks.corpus).
+Run it before a release and compare the JSON with the previous release's.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from benchmarks.corpus import generate_corpus
+
+API = "/api/v1/receipts"
+DEFAULT_MIX = {"upload": 1.0, "batch": 0.1, "list": 4.0, "get": 4.0, "patch": 1.0}
+AUTH_HEADERS = {"Authorization": "Bearer load-test"}  # any token passes in DEVELOPMENT_MODE
+
+
+def parse_mix(spec: Optional[str]) -> Dict[str, float]:
+    """Parse "upload=1,list=4" into weights; unknown operations are an error."""
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(ordered: Sequence[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, images: List[bytes], mix: Dict[str, float], seed: int = 0):
+        self.client = client
+        self.images = images
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.rng = random.Random(seed)
+        self.receipt_ids: List[str] = []
+        self.latencies: Dict[str, List[float]] = {op: [] for op in self.ops}
+        self.errors: Dict[str, Dict[str, int]] = {op: {} for op in self.ops}
+
+    def _image(self) -> bytes:
+        return self.rng.choice(self.images)
+
+    async def upload(self) -> httpx.Response:
+        res = await self.client.post(f"{API}/", files={"file": ("receipt.jpg", self._image(), "image/jpeg")})
+        if res.status_code == 201:
+            self.receipt_ids.append(res.json()["id"])
+        return res
+
+    async def batch(self) -> httpx.Response:
+        files = [("files", (f"r{i}.jpg", self._image(), "image/jpeg")) for i in range(3)]
+        return await self.client.post(f"{API}/batch", files=files)
+
+    async def list(self) -> httpx.Response:
+        return await self.client.get(f"{API}/", params={"view": "summary", "size": 20})
+
+    async def get(self) -> httpx.Response:
+        return await self.client.get(f"{API}/{self.rng.choice(self.receipt_ids)}")
+
+    async def patch(self) -> httpx.Response:
+        payload = {"category": self.rng.choice(["travel", "food", "office"]), "status": "processed"}
+        return await self.client.patch(f"{API}/{self.rng.choice(self.receipt_ids)}", json=payload)
+
+    async def _record(self, op: str) -> None:
+        if op in ("get", "patch") and not self.receipt_ids:
+            # Nothing to read or edit yet: upload instead, and count it as one
+            op = "upload"
+        start = time.perf_counter()
+        try:
+            res = await getattr(self, op)()
+            outcome = None if res.status_code < 400 else str(res.status_code)
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        self.latencies.setdefault(op, []).append(time.perf_counter() - start)
+        if outcome:
+            errors = self.errors.setdefault(op, {})
+            errors[outcome] = errors.get(outcome, 0) + 1
+
+    async def _user(self, deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            await self._record(self.rng.choices(self.ops, self.weights)[0])
+
+    async def run(self, duration: float, concurrency: int, warmup_uploads: int = 4) -> Dict[str, Any]:
+        for _ in range(warmup_uploads):
+            await self.upload()
+        start = time.perf_counter()
+        await asyncio.gather(*(self._user(start + duration) for _ in range(concurrency)))
+        return self.report(time.perf_counter() - start, concurrency)
+
+    def report(self, elapsed: float, concurrency: int) -> Dict[str, Any]:
+        endpoints = {}
+        for op, values in self.latencies.items():
+            ordered = sorted(values)
+            endpoints[op] = {
+                "requests": len(ordered),
+                "rps": round(len(ordered) / elapsed, 2),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+                "errors": self.errors.get(op, {}),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "elapsed": round(elapsed, 2),
+            "concurrency": concurrency,
+            "requests": total,
+            "rps": round(total / elapsed, 2),
+            "errors": sum(sum(e["errors"].values()) for e in endpoints.values()),
+            "endpoints": endpoints,
+        }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int = 1) -> Tuple[subprocess.Popen, str]:
+    """Run main:app under uvicorn with a fresh SQLite DB and upload dir; returns (process, base URL)."""
+    workdir = tempfile.mkdtemp(prefix="complicopilot-load-")
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{workdir}/load.db",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        EXPORT_DIR=f"{workdir}/exports",
+        DEVELOPMENT_MODE="true",
+        # Every client is the same dev user; per-user OCR limits would cap the whole test
+        OCR_USER_CONCURRENCY="1000",
+        OCR_USER_RATE="1000000",
+        OCR_USER_BURST="1000000",
+    )
+    env.pop("GOOGLE_APPLICATION_CREDENTIALS", None)
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=backend_dir, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/api/v1/health/").status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("Server did not become healthy within 60s")
+
+
+async def _run(url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    images = [s.content for s in generate_corpus(args.images, seed=args.seed)]
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, headers=AUTH_HEADERS, timeout=args.timeout, limits=limits) as client:
+        return await LoadTest(client, images, parse_mix(args.mix), seed=args.seed).run(args.duration, args.concurrency)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Load-test the receipts API")
+    arg_parser.add_argument("--url", help="target an already-running server instead of starting one")
+    arg_parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    arg_parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    arg_parser.add_argument("--mix", help=f"operation weights, default {','.join(f'{k}={v:g}' for k, v in DEFAULT_MIX.items())}")
+    arg_parser.add_argument("--server-workers", type=int, default=1, help="uvicorn workers when starting the app")
+    arg_parser.add_argument("--images", type=int, default=8, help="distinct synthetic receipts to upload")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--timeout", type=float, default=60)
+    arg_parser.add_argument("--output", help="write the report JSON here")
+    args = arg_parser.parse_args(argv)
+
+    proc = None
+    url = args.url
+    if not url:
+        proc, url = start_server(args.server_workers)
+    try:
+        report = asyncio.run(_run(url, args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered)
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+OCR pipeline benchmark.
+
+Measures, over a synthetic corpus (benchmarks.corpus):
+- per-stage latency: decode, resize, each preprocess pipeline, deskew,
+  Tesseract and parse (p50 / p95 / mean, in milliseconds)
+- end-to-end throughput (receipts/second) at several worker-process counts
+- field-level accuracy of the parsed vendor, date and total
+
+Results are written as JSON (with the git commit, library versions and
+corpus parameters) so runs can be compared between commits:
+
+    python -m benchmarks.ocr_bench --size 24 --workers 1,2,4 --output results.json
+    python -m benchmarks.ocr_bench --compare baseline.json --output results.json
+
+Without a Tesseract binary the OCR stages are skipped and only the image
+stages and parse are timed (pass --no-tesseract to force this).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import cv2
+import pytesseract
+
+from benchmarks.corpus import DEFAULT_SEED, Sample, corpus_for
+from services.ocr import (
+    OCRService, _deskew, _load_for_ocr, _preprocess_pipeline_binarize, _preprocess_pipeline_clahe,
+    _preprocess_pipeline_otsu, _resize_max,
+)
+from services.parser import ParserService
+
+PREPROCESSORS = {
+    "binarize": _preprocess_pipeline_binarize,
+    "otsu": _preprocess_pipeline_otsu,
+    "clahe": _preprocess_pipeline_clahe,
+}
+FIELDS = ("vendor", "date", "total")
+
+_parser = ParserService()
+
+
+def tesseract_version() -> Optional[str]:
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return None
+
+
+def _timed(timings: Dict[str, List[float]], stage: str, fn: Callable, *args) -> Any:
+    start = time.perf_counter()
+    result = fn(*args)
+    timings.setdefault(stage, []).append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def time_stages(sample: Sample, timings: Dict[str, List[float]], use_tesseract: bool, config: str = "--oem 3 --psm 6") -> None:
+    """Run each stage of OCRService's pipeline once on a sample, appending per-stage milliseconds."""
+    gray = _timed(timings, "decode", _load_for_ocr, sample.content)
+    gray = _timed(timings, "resize", _resize_max, gray)
+    text = sample.text
+    for name, preprocess in PREPROCESSORS.items():
+        processed = _timed(timings, f"preprocess.{name}", preprocess, gray)
+        deskewed = _timed(timings, "deskew", _deskew, processed)
+        if use_tesseract:
+            text = _timed(timings, "tesseract", pytesseract.image_to_string, deskewed, "eng", config)
+    _timed(timings, "parse", _parser.parse, text)
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "p50": round(statistics.median(ordered), 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        "mean": round(statistics.fmean(ordered), 3),
+        "n": len(ordered),
+    }
+
+
+def field_matches(parsed: Dict[str, Optional[str]], truth: Dict[str, str]) -> Dict[str, bool]:
+    """Compare parsed fields with ground truth after the same normalization the API applies."""
+    return {
+        "vendor": (parsed.get("vendor") or "").strip().lower() == truth["vendor"].lower(),
+        "date": _parser.normalize_date(parsed.get("date")) == _parser.normalize_date(truth["date"]),
+        "total": _parser.normalize_amount(parsed.get("total")) == _parser.normalize_amount(truth["total"]),
+    }
+
+
+_worker_ocr: Optional[OCRService] = None
+
+
+def _process(content: bytes, use_tesseract: bool) -> Dict[str, Optional[str]]:
+    """End-to-end work for one receipt, as the upload route does it (runs in worker processes)."""
+    global _worker_ocr
+    if not use_tesseract:
+        gray = _resize_max(_load_for_ocr(content))
+        for preprocess in PREPROCESSORS.values():
+            _deskew(preprocess(gray))
+        return {}
+    if _worker_ocr is None:
+        _worker_ocr = OCRService()
+    return _parser.parse(_worker_ocr.extract_text_from_image(content))
+
+
+def measure_throughput(samples: List[Sample], workers: int, use_tesseract: bool) -> Dict[str, float]:
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Warm the pool so process start-up isn't counted
+        list(pool.map(_process, [samples[0].content] * workers, [use_tesseract] * workers))
+        start = time.perf_counter()
+        results = list(pool.map(_process, [s.content for s in samples], [use_tesseract] * len(samples)))
+        elapsed = time.perf_counter() - start
+    return {"receipts_per_second": round(len(samples) / elapsed, 3), "seconds": round(elapsed, 3), "results": results}
+
+
+def run_benchmark(
+    samples: List[Sample],
+    worker_counts: Sequence[int] = (1, 2, 4),
+    use_tesseract: Optional[bool] = None,
+    repeat: int = 1,
+) -> Dict[str, Any]:
+    """
+    Benchmark the OCR pipeline on `samples`.
+
+    Returns:
+        JSON-serializable dict with meta, stages, throughput and accuracy
+    """
+    version = tesseract_version()
+    if use_tesseract is None:
+        use_tesseract = version is not None
+
+    timings: Dict[str, List[float]] = {}
+    for _ in range(repeat):
+        for sample in samples:
+            time_stages(sample, timings, use_tesseract)
+
+    throughput: Dict[str, Dict[str, float]] = {}
+    accuracy: Optional[Dict[str, Any]] = None
+    for workers in worker_counts:
+        run = measure_throughput(samples, workers, use_tesseract)
+        parsed = run.pop("results")
+        throughput[str(workers)] = run
+        if use_tesseract and accuracy is None:
+            matches = [field_matches(p, s.truth) for p, s in zip(parsed, samples)]
+            accuracy = {f: round(sum(m[f] for m in matches) / len(matches), 4) for f in FIELDS}
+            accuracy["all_fields"] = round(sum(all(m.values()) for m in matches) / len(matches), 4)
+            accuracy["by_scale"] = _accuracy_by(samples, matches, "scale")
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "tesseract": version if use_tesseract else None,
+            "cpu_count": os.cpu_count(),
+            "corpus_size": len(samples),
+            "repeat": repeat,
+        },
+        "stages": {stage: summarize(values) for stage, values in sorted(timings.items())},
+        "throughput": throughput,
+        "accuracy": accuracy,
+    }
+
+
+def _accuracy_by(samples: List[Sample], matches: List[Dict[str, bool]], param: str) -> Dict[str, float]:
+    groups: Dict[str, List[bool]] = {}
+    for sample, match in zip(samples, matches):
+        groups.setdefault(str(sample.params[param]), []).append(all(match.values()))
+    return {k: round(sum(v) / len(v), 4) for k, v in sorted(groups.items())}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Human-readable deltas between two result files (positive % = slower / more throughput)."""
+    lines = [f"baseline {baseline['meta'].get('commit')} -> current {current['meta'].get('commit')}"]
+    for stage, stats in current["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before and before["p50"]:
+            lines.append(f"  {stage:<22} p50 {before['p50']:>9.2f} -> {stats['p50']:>9.2f} ms ({(stats['p50'] / before['p50'] - 1) * 100:+.1f}%)")
+    for workers, run in current["throughput"].items():
+        before = baseline["throughput"].get(workers)
+        if before:
+            lines.append(f"  throughput x{workers:<12} {before['receipts_per_second']:>9.2f} -> {run['receipts_per_second']:>9.2f} /s")
+    if baseline.get("accuracy") and current.get("accuracy"):
+        for f in FIELDS + ("all_fields",):
+            lines.append(f"  accuracy {f:<13} {baseline['accuracy'][f]:>9.2%} -> {current['accuracy'][f]:>9.2%}")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Benchmark the OCR pipeline on a synthetic receipt corpus")
+    arg_parser.add_argument("--size", type=int, default=24, help="receipts to generate")
+    arg_parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    arg_parser.add_argument("--corpus", help="manifest.json of a saved corpus (see benchmarks.corpus.write_corpus)")
+    arg_parser.add_argument("--workers", default="1,2,4", help="comma-separated worker process counts")
+    arg_parser.add_argument("--repeat", type=int, default=1, help="passes over the corpus for stage timings")
+    arg_parser.add_argument("--no-tesseract", action="store_true", help="skip OCR; time image stages and parse only")
+    arg_parser.add_argument("--output", help="write results JSON here")
+    arg_parser.add_argument("--compare", help="baseline results JSON to diff against")
+    args = arg_parser.parse_args(argv)
+
+    samples = corpus_for(args.corpus, args.size, args.seed)
+    results = run_benchmark(
+        samples,
+        worker_counts=[int(w) for w in args.workers.split(",") if w],
+        use_tesseract=False if args.no_tesseract else None,
+        repeat=args.repeat,
+    )
+    results["meta"].update({"seed": args.seed, "corpus": args.corpus})
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered)
+    else:
+        print(rendered)
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare(json.load(f), results)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+OCR worker transport benchmark.
+
+Round-trips frames of increasing size through the OCR worker pool with a
+trivial handler, so only the handoff is measured: pickled through the job
+channel (inline) vs. copied once into a shared-memory slot (shm).
+
+    python -m benchmarks.ocr_transport_bench --sizes-mb 0.5,2,8 --repeat 50 --output transport.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services.ocr_workers import OCRWorkerPool
+
+
+def _checksum(img: Any) -> str:
+    # Touch every byte, as decoding would, without doing any real work
+    return str(int(np.frombuffer(img, np.uint8).sum() if not isinstance(img, np.ndarray) else img.sum()))
+
+
+def measure(size_mb: float, repeat: int, shm: bool) -> Dict[str, float]:
+    frame = np.random.default_rng(0).integers(0, 255, int(size_mb * 1024 * 1024), dtype=np.uint8)
+    slot_size = frame.nbytes if shm else 0
+    pool = OCRWorkerPool(api_slots=1, workers=1, max_jobs=0, handler=_checksum, shm_slots=2 if shm else 0,
+                         shm_slot_size=slot_size)
+    pool.start()
+    try:
+        client = pool.client(0)
+        client.extract_text_from_image(frame)  # warm-up
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            client.extract_text_from_image(frame)
+            samples.append(time.perf_counter() - start)
+    finally:
+        pool.stop()
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 3),
+    }
+
+
+def run_benchmark(sizes_mb: List[float], repeat: int = 30) -> Dict[str, Any]:
+    return {
+        f"{size}MB": {"inline": measure(size, repeat, shm=False), "shm": measure(size, repeat, shm=True)}
+        for size in sizes_mb
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Benchmark image handoff to OCR worker processes")
+    arg_parser.add_argument("--sizes-mb", default="0.25,1,4,8", help="comma-separated frame sizes")
+    arg_parser.add_argument("--repeat", type=int, default=30)
+    arg_parser.add_argument("--output", help="write results JSON here")
+    args = arg_parser.parse_args(argv)
+
+    results = run_benchmark([float(s) for s in args.sizes_mb.split(",")], args.repeat)
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered)
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from typing import Dict, Any
+import asyncio
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,11 +7,17 @@ from dotenv import load_dotenv
 
 # Routers
 from api.health import router as health_router
+from api.metrics import router as metrics_router
 from api.receipts import router as receipts_router
 
-from api.auth import router as auth_router
+from api.auth import router as auth_router, password_hasher
+from api.admin import router as admin_router
 from models.entities import Base
-from database.session import engine
+from database.session import engine, async_engine, AsyncSessionLocal
+from services import derivatives, metrics, retention
+from services.registry import registry, WARM_UP_ON_STARTUP
+from services.scheduler import ocr_scheduler
+from services.firebase_admin import start_key_refresh, stop_key_refresh
 
 load_dotenv()
 
@@ -41,6 +48,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route, plus DB statement timings (no-ops unless metrics are enabled)
+if metrics.ENABLED:
+    app.add_middleware(metrics.RequestMetricsMiddleware)
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
+
 # Attach config (optional access as app.state.settings)
 app.state.settings = {
     "DATABASE_URL": DATABASE_URL,
@@ -58,11 +71,44 @@ def _create_tables_if_missing() -> None:
         # In production prefer Alembic migrations; swallow errors here to avoid masking real startup issues
         pass
 
+
+@app.on_event("startup")
+def _prefetch_firebase_keys() -> None:
+    start_key_refresh()
+
+
+@app.on_event("startup")
+def _warm_up_services() -> None:
+    # OCR stack, pandas and Firebase load in the background once we're serving
+    if WARM_UP_ON_STARTUP:
+        registry.warm_up_in_background()
+
+
+@app.on_event("startup")
+async def _start_retention_sweeper() -> None:
+    app.state.retention_task = None
+    if retention.RETENTION_SWEEP_INTERVAL > 0:
+        sweeper = retention.Sweeper(AsyncSessionLocal)
+        app.state.retention_task = asyncio.create_task(retention.run_periodically(sweeper))
+
+
+@app.on_event("shutdown")
+async def _dispose_async_engine() -> None:
+    if app.state.retention_task is not None:
+        app.state.retention_task.cancel()
+    derivatives.shutdown(wait=False)
+    ocr_scheduler.shutdown(wait=False)
+    stop_key_refresh()
+    password_hasher.shutdown(wait=False)
+    await async_engine.dispose()
+
 @app.get("/", tags=["root"])
 def root() -> Dict[str, Any]:
     return {"status": "ok", "service": "backend", "version": APP_VERSION}
 
 # Include API routers (already prefixed internally)
 app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(receipts_router)
 app.include_router(auth_router)
+app.include_router(admin_router)
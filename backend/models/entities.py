@@ -7,11 +7,13 @@ They will be used for migrations and queries in Phase 1.2 and beyond.
 
 from sqlalchemy import Column, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import DeclarativeBase, relationship, Mapped, mapped_column
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Boolean, JSON
-from datetime import datetime
+from sqlalchemy.orm import DeclarativeBase, relationship, Mapped, mapped_column, validates
+from sqlalchemy import Column, String, Float, Date, DateTime, ForeignKey, Boolean, JSON, Integer, UniqueConstraint, Index, Text
+from datetime import date, datetime
 import uuid
 
+from services.parser import ParserService
+
 # Phase 1.2: define SQLAlchemy entities here (Receipts, ComplianceIssues, etc.)
 
 
@@ -33,11 +35,16 @@ class User(Base):
 
 class Receipt(Base):
     __tablename__ = "receipts"
+    # Per-user listing walks this index instead of the whole table
+    __table_args__ = (Index("ix_receipts_owner_uid_created_at", "owner_uid", "created_at"),)
 
     id: Mapped[str] = mapped_column(
         String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    owner_uid: Mapped[str | None] = mapped_column(String, nullable=True)  # Firebase uid
     vendor: Mapped[str] = mapped_column(String, nullable=False)
     date: Mapped[str] = mapped_column(String, nullable=False)  # ISO YYYY-MM-DD
+    # Typed copy of `date` for range filters / monthly rollups (None if unparseable)
+    receipt_date: Mapped[date | None] = mapped_column(Date, nullable=True, index=True)
     amount: Mapped[float] = mapped_column(Float, nullable=False)
     currency: Mapped[str] = mapped_column(String, default="INR")
     category: Mapped[str] = mapped_column(
@@ -48,6 +55,8 @@ class Receipt(Base):
         String, nullable=False, default="needs_review")
     filename: Mapped[str | None] = mapped_column(String, nullable=True)
     mime_type: Mapped[str | None] = mapped_column(String, nullable=True)
+    blob_sha256: Mapped[str | None] = mapped_column(
+        String, ForeignKey("blobs.sha256"), nullable=True, index=True)
     extracted: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow)
@@ -59,6 +68,26 @@ class Receipt(Base):
         "ComplianceIssue", back_populates="receipt", cascade="all, delete-orphan"
     )
 
+    @validates("date")
+    def _sync_receipt_date(self, key: str, value: str) -> str:
+        self.receipt_date = ParserService().normalize_date(value)
+        return value
+
+
+class Blob(Base):
+    """A stored file, keyed by content hash; see services.blobstore."""
+    __tablename__ = "blobs"
+
+    sha256: Mapped[str] = mapped_column(String, primary_key=True)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    mime_type: Mapped[str | None] = mapped_column(String, nullable=True)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # Receipt rows pointing here
+    ocr_text: Mapped[str | None] = mapped_column(Text, nullable=True)  # OCR cache for identical uploads
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 
 class ComplianceIssue(Base):
     __tablename__ = "compliance_issues"
@@ -77,3 +106,63 @@ class ComplianceIssue(Base):
 
     # Relationships
     receipt: Mapped[Receipt] = relationship("Receipt", back_populates="issues")
+
+
+class ReceiptSummary(Base):
+    """Pre-aggregated spend per dimension value, kept current by services.summaries."""
+    __tablename__ = "receipt_summaries"
+    __table_args__ = (
+        UniqueConstraint("owner_uid", "dimension", "key", name="uq_receipt_summaries_owner_dimension_key"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    owner_uid: Mapped[str] = mapped_column(String, nullable=False, default="")  # "" for unowned legacy rows
+    dimension: Mapped[str] = mapped_column(String, nullable=False)  # vendor, category, month, gstin
+    key: Mapped[str] = mapped_column(String, nullable=False)
+    receipt_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_amount: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    total_tax: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class OCRTask(Base):
+    """A queued OCR + parse job for the distributed worker mode; see services.ocr_queue."""
+    __tablename__ = "ocr_tasks"
+    __table_args__ = (
+        Index("ix_ocr_tasks_status_priority_id", "status", "priority", "id"),
+        Index("ix_ocr_tasks_status_lease_expires_at", "status", "lease_expires_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    receipt_id: Mapped[str] = mapped_column(
+        String, ForeignKey("receipts.id", ondelete="CASCADE"), nullable=False, index=True)
+    blob_sha256: Mapped[str] = mapped_column(String, nullable=False)
+    kind: Mapped[str] = mapped_column(String, nullable=False)  # upload, reprocess
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # services.scheduler.Priority
+    status: Mapped[str] = mapped_column(String, nullable=False, default="queued")  # queued, running, done, failed
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=3)
+    worker_id: Mapped[str | None] = mapped_column(String, nullable=True)  # holder of the lease
+    available_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)  # retry backoff
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    claimed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # start of the current attempt
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class OCRWorker(Base):
+    """A running `python -m services.ocr_worker` process and its last heartbeat."""
+    __tablename__ = "ocr_workers"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    hostname: Mapped[str] = mapped_column(String, nullable=False)
+    pid: Mapped[int] = mapped_column(Integer, nullable=False)
+    tasks_done: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    started_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow)
+    heartbeat_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow)
@@ -0,0 +1,222 @@
+"""
+Admission control for OCR work.
+
+OCR is CPU-bound and runs in the shared threadpool (or the OCR worker pool),
+so without a limit a burst of batch uploads starts every job at once, every
+request slows down together, and health checks time out behind them. Routes
+that OCR first take a ticket from the controller:
+
+- OCR_CONCURRENCY tickets run at once; up to OCR_QUEUE_SIZE more wait, for at
+  most OCR_QUEUE_TIMEOUT seconds. Beyond that, requests are refused with 503.
+- Interactive requests (single uploads, reprocessing) are woken before bulk
+  ones (batches). Bulk requests never hold more than OCR_CONCURRENCY minus
+  OCR_INTERACTIVE_RESERVE tickets, and may fill at most half of the queue.
+- Each user may hold OCR_USER_CONCURRENCY tickets (running or waiting) and is
+  rate limited by a token bucket of OCR_USER_RATE images per second with
+  bursts of OCR_USER_BURST. Going over either limit gets a 429.
+
+Every refusal carries a Retry-After estimate. Limits apply per process; under
+the pre-fork server each API worker has its own controller.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict
+
+from services import metrics
+
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", str(os.cpu_count() or 2)))
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", "32"))
+OCR_QUEUE_TIMEOUT = float(os.getenv("OCR_QUEUE_TIMEOUT", "30"))
+OCR_INTERACTIVE_RESERVE = int(os.getenv("OCR_INTERACTIVE_RESERVE", "1"))
+OCR_USER_CONCURRENCY = int(os.getenv("OCR_USER_CONCURRENCY", "4"))
+OCR_USER_RATE = float(os.getenv("OCR_USER_RATE", "2"))
+OCR_USER_BURST = float(os.getenv("OCR_USER_BURST", "20"))
+# How many users' token buckets to remember (least recently seen are dropped, i.e. refilled)
+OCR_USER_BUCKETS = 10000
+
+
+class AdmissionRejected(Exception):
+    """The request can't be admitted now; retry after `retry_after` seconds."""
+
+    def __init__(self, code: str, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        """Take `cost` tokens; returns 0, or the seconds until that many will be available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (min(cost, self.burst) - self.tokens) / self.rate
+
+
+@dataclass
+class Ticket:
+    user: str
+    bulk: bool
+    started: float = 0.0
+
+
+class AdmissionController:
+    def __init__(self, concurrency: int = OCR_CONCURRENCY, queue_size: int = OCR_QUEUE_SIZE,
+                 queue_timeout: float = OCR_QUEUE_TIMEOUT, interactive_reserve: int = OCR_INTERACTIVE_RESERVE,
+                 user_concurrency: int = OCR_USER_CONCURRENCY, user_rate: float = OCR_USER_RATE,
+                 user_burst: float = OCR_USER_BURST, clock=time.monotonic):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.bulk_limit = max(1, concurrency - interactive_reserve)
+        self.user_concurrency = user_concurrency
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.clock = clock
+        self.running = 0
+        self.running_bulk = 0
+        self._waiting: Dict[bool, Deque["asyncio.Future[None]"]] = {False: deque(), True: deque()}
+        self._per_user: Dict[str, int] = {}
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._service_time = 1.0  # moving average of seconds per ticket, for Retry-After
+        self.rejected: Dict[str, int] = {}
+
+    def _reject(self, code: str, message: str, status_code: int, retry_after: float) -> AdmissionRejected:
+        self.rejected[code] = self.rejected.get(code, 0) + 1
+        metrics.admission_rejected(code)
+        return AdmissionRejected(code, message, status_code, max(1, math.ceil(min(retry_after, 3600))))
+
+    def _queue_wait(self) -> float:
+        """Rough seconds until a newly queued ticket would start."""
+        waiting = len(self._waiting[False]) + len(self._waiting[True])
+        return self._service_time * (waiting + 1) / max(1, self.concurrency)
+
+    def _can_start(self, bulk: bool) -> bool:
+        if self.running >= self.concurrency:
+            return False
+        if bulk:
+            return self.running_bulk < self.bulk_limit and not self._waiting[False]
+        return True
+
+    def _check_user(self, user: str, cost: float) -> None:
+        if self._per_user.get(user, 0) >= self.user_concurrency:
+            raise self._reject(
+                "TOO_MANY_CONCURRENT", f"At most {self.user_concurrency} OCR requests per user at a time", 429,
+                self._service_time,
+            )
+        now = self.clock()
+        bucket = self._buckets.get(user)
+        if bucket is None:
+            bucket = self._buckets[user] = TokenBucket(self.user_rate, self.user_burst, now)
+            if len(self._buckets) > OCR_USER_BUCKETS:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(user)
+        wait = bucket.take(min(cost, self.user_burst), now)
+        if wait:
+            raise self._reject("RATE_LIMITED", f"OCR rate limit is {self.user_rate:g} images per second", 429, wait)
+
+    async def acquire(self, user: str, bulk: bool = False, cost: float = 1) -> Ticket:
+        """
+        Admit one OCR request of `cost` images, waiting in the queue if needed.
+        Raises AdmissionRejected (429 for per-user limits, 503 when saturated).
+        """
+        self._check_user(user, cost)
+        ticket = Ticket(user, bulk)
+        if not self._can_start(bulk):
+            waiting = self._waiting[bulk]
+            queued = len(self._waiting[False]) + len(self._waiting[True])
+            limit = self.queue_size // 2 if bulk else self.queue_size
+            if queued >= self.queue_size or len(waiting) >= limit:
+                self._refund(user, cost)
+                raise self._reject("OVERLOADED", "OCR queue is full, retry shortly", 503, self._queue_wait())
+            future = asyncio.get_running_loop().create_future()
+            waiting.append(future)
+            self._per_user[user] = self._per_user.get(user, 0) + 1
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if future.done() and not future.cancelled():
+                    self._release(ticket)  # woken just as we gave up; pass the slot on
+                else:
+                    future.cancel()
+                    waiting.remove(future)
+                    self._leave(user)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise self._reject("OVERLOADED", "Timed out waiting for OCR capacity", 503, self._queue_wait())
+        else:
+            self._start(ticket)
+            self._per_user[user] = self._per_user.get(user, 0) + 1
+        ticket.started = self.clock()
+        return ticket
+
+    def _start(self, ticket: Ticket) -> None:
+        self.running += 1
+        if ticket.bulk:
+            self.running_bulk += 1
+
+    def _release(self, ticket: Ticket) -> None:
+        self.running -= 1
+        if ticket.bulk:
+            self.running_bulk -= 1
+        self._leave(ticket.user)
+        self._wake()
+
+    def _leave(self, user: str) -> None:
+        self._per_user[user] -= 1
+        if not self._per_user[user]:
+            del self._per_user[user]
+
+    def _refund(self, user: str, cost: float) -> None:
+        bucket = self._buckets.get(user)
+        if bucket is not None:
+            bucket.tokens = min(bucket.burst, bucket.tokens + min(cost, bucket.burst))
+
+    def _wake(self) -> None:
+        # Interactive first; bulk only while under its share of the slots
+        for bulk in (False, True):
+            waiting = self._waiting[bulk]
+            while waiting and self._can_start(bulk):
+                future = waiting.popleft()
+                if future.done():
+                    continue
+                self.running += 1
+                if bulk:
+                    self.running_bulk += 1
+                future.set_result(None)
+
+    def release(self, ticket: Ticket) -> None:
+        if ticket.started:
+            self._service_time = 0.8 * self._service_time + 0.2 * (self.clock() - ticket.started)
+        self._release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "running_bulk": self.running_bulk,
+            "queued_interactive": len(self._waiting[False]),
+            "queued_bulk": len(self._waiting[True]),
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "rejected": dict(self.rejected),
+        }
+
+
+admission = AdmissionController()
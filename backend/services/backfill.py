@@ -0,0 +1,225 @@
+"""
+Chunked backfill jobs for derived columns.
+
+Each job walks the table in primary-key order (keyset pagination), so it
+never holds more than one chunk in memory and can be re-run safely: rows
+that already have a value are skipped.
+
+Run from the backend directory:
+    python -m services.backfill receipt_date --chunk-size 500
+    python -m services.backfill owner_uid
+    python -m services.backfill blobs
+    python -m services.backfill summaries
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+from services.parser import ParserService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Lightweight table definition so jobs (and migrations) don't depend on ORM model state
+receipts_table = sa.table(
+    "receipts",
+    sa.column("id", sa.String),
+    sa.column("date", sa.String),
+    sa.column("receipt_date", sa.Date),
+    sa.column("owner_uid", sa.String),
+    sa.column("mime_type", sa.String),
+    sa.column("blob_sha256", sa.String),
+    sa.column("extracted", sa.JSON),
+)
+
+blobs_table = sa.table(
+    "blobs",
+    sa.column("sha256", sa.String),
+    sa.column("size", sa.Integer),
+    sa.column("mime_type", sa.String),
+    sa.column("ref_count", sa.Integer),
+    sa.column("created_at", sa.DateTime),
+    sa.column("updated_at", sa.DateTime),
+)
+
+
+def iter_chunks(conn: Connection, stmt: sa.Select, key: sa.ColumnElement, chunk_size: int) -> Iterator[List[sa.Row]]:
+    """Yield rows of `stmt` in chunks, paginating on the unique, ordered `key` column."""
+    last_key = None
+    while True:
+        page = stmt.order_by(key).limit(chunk_size)
+        if last_key is not None:
+            page = page.where(key > last_key)
+        rows = conn.execute(page).all()
+        if not rows:
+            return
+        yield rows
+        last_key = rows[-1]._mapping[key.key]
+
+
+def backfill_receipt_dates(conn: Connection, chunk_size: int = DEFAULT_CHUNK_SIZE, commit_each_chunk: bool = False) -> int:
+    """
+    Populate receipts.receipt_date from the free-form receipts.date column.
+
+    Args:
+        conn: Connection to run on (an Alembic migration bind or engine.connect())
+        chunk_size: Rows fetched and updated per round-trip
+        commit_each_chunk: Commit after every chunk (for standalone runs on large tables)
+
+    Returns:
+        Number of rows updated
+    """
+    parser = ParserService()
+    t = receipts_table
+    stmt = sa.select(t.c.id, t.c.date).where(t.c.receipt_date.is_(None))
+    updated = 0
+    for rows in iter_chunks(conn, stmt, t.c.id, chunk_size):
+        params = []
+        for row in rows:
+            normalized = parser.normalize_date(row.date)
+            if normalized is not None:
+                params.append({"b_id": row.id, "b_date": normalized})
+        if params:
+            conn.execute(
+                t.update().where(t.c.id == sa.bindparam("b_id")).values(receipt_date=sa.bindparam("b_date")),
+                params,
+            )
+            updated += len(params)
+        if commit_each_chunk:
+            conn.commit()
+        logger.info(f"receipt_date backfill: {updated} rows updated so far")
+    return updated
+
+
+def backfill_receipt_owners(
+    conn: Connection,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    commit_each_chunk: bool = False,
+    default_owner: Optional[str] = None,
+) -> int:
+    """
+    Populate receipts.owner_uid for rows created before receipts were scoped per user.
+
+    The owner is taken from extracted["owner_uid"] when present, otherwise from
+    `default_owner` (env LEGACY_RECEIPT_OWNER_UID). Rows with neither stay NULL
+    and are invisible to every user until assigned. When any row changed owner
+    the spend rollups are rebuilt, so the new owners' summaries include them.
+
+    Returns:
+        Number of rows updated
+    """
+    default_owner = default_owner or os.getenv("LEGACY_RECEIPT_OWNER_UID")
+    t = receipts_table
+    stmt = sa.select(t.c.id, t.c.extracted).where(t.c.owner_uid.is_(None))
+    updated = 0
+    for rows in iter_chunks(conn, stmt, t.c.id, chunk_size):
+        params = []
+        for row in rows:
+            extracted = row.extracted if isinstance(row.extracted, dict) else {}
+            owner = extracted.get("owner_uid") or default_owner
+            if owner:
+                params.append({"b_id": row.id, "b_owner": owner})
+        if params:
+            conn.execute(
+                t.update().where(t.c.id == sa.bindparam("b_id")).values(owner_uid=sa.bindparam("b_owner")),
+                params,
+            )
+            updated += len(params)
+        if commit_each_chunk:
+            conn.commit()
+        logger.info(f"owner_uid backfill: {updated} rows updated so far")
+    if updated:
+        # Their rollups are still counted under owner "" until rebuilt
+        rebuild_receipt_summaries(conn, chunk_size=chunk_size, commit_each_chunk=commit_each_chunk)
+    return updated
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def backfill_receipt_blobs(conn: Connection, chunk_size: int = DEFAULT_CHUNK_SIZE, commit_each_chunk: bool = False) -> int:
+    """
+    Move files of receipts created before content-addressed storage into the
+    blob store, and point receipts.blob_sha256 at them (one reference each).
+    The legacy file is removed once it is safely stored.
+
+    Returns:
+        Number of receipts linked to a blob
+    """
+    from services.blobstore import dialect_insert, get_blob_backend
+
+    backend = get_blob_backend()
+    insert = dialect_insert(conn.dialect.name)
+    t, b = receipts_table, blobs_table
+    stmt = sa.select(t.c.id, t.c.mime_type, t.c.extracted).where(t.c.blob_sha256.is_(None))
+    linked = 0
+    for rows in iter_chunks(conn, stmt, t.c.id, chunk_size):
+        for row in rows:
+            extracted = row.extracted if isinstance(row.extracted, dict) else {}
+            legacy = Path(extracted.get("path") or "")
+            if not legacy.is_file():
+                continue
+            sha256 = _hash_file(legacy)
+            size = legacy.stat().st_size
+            staged = backend.staging_path()
+            shutil.copyfile(legacy, staged)
+            backend.commit(staged, sha256)
+            now = datetime.utcnow()
+            upsert = insert(b).values(sha256=sha256, size=size, mime_type=row.mime_type, ref_count=1, created_at=now, updated_at=now)
+            conn.execute(upsert.on_conflict_do_update(index_elements=[b.c.sha256], set_={"ref_count": b.c.ref_count + 1, "updated_at": now}))
+            conn.execute(t.update().where(t.c.id == row.id).values(blob_sha256=sha256))
+            if commit_each_chunk:
+                # Only delete the legacy copy once the link is durable
+                conn.commit()
+                legacy.unlink(missing_ok=True)
+            linked += 1
+        logger.info(f"blob backfill: {linked} receipts linked so far")
+    return linked
+
+
+def rebuild_receipt_summaries(conn: Connection, chunk_size: int = DEFAULT_CHUNK_SIZE, commit_each_chunk: bool = False) -> int:
+    """Recompute the spend rollups (see services.summaries)."""
+    from services.summaries import rebuild_summaries  # imports this module
+
+    return rebuild_summaries(conn, chunk_size=chunk_size, commit_each_chunk=commit_each_chunk)
+
+
+JOBS: Dict[str, Callable[..., int]] = {
+    "receipt_date": backfill_receipt_dates,
+    "owner_uid": backfill_receipt_owners,
+    "blobs": backfill_receipt_blobs,
+    "summaries": rebuild_receipt_summaries,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Run a chunked backfill job")
+    arg_parser.add_argument("job", choices=sorted(JOBS))
+    arg_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = arg_parser.parse_args(argv)
+
+    from database.session import engine
+
+    with engine.connect() as conn:
+        count = JOBS[args.job](conn, chunk_size=args.chunk_size, commit_each_chunk=True)
+    print(f"{args.job}: {count} rows updated")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,310 @@
+"""
+Content-addressed blob storage.
+
+Files are stored once per SHA-256 under sharded keys (ab/cd/abcd...), so an
+image uploaded many times occupies disk once. Writes are staged in a temp file
+and atomically renamed (or uploaded) into place; an existing key is never
+rewritten. The `blobs` table counts the Receipt rows pointing at each blob and
+caches the OCR text, keyed by the same hash.
+
+Backends:
+- LocalBlobBackend (default): BLOB_ROOT, defaulting to $UPLOAD_DIR/blobs
+- S3BlobBackend: BLOB_BACKEND=s3 with S3_ENDPOINT_URL (e.g. a local MinIO),
+  S3_BUCKET, AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY. Requires boto3.
+"""
+
+import logging
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.entities import Blob
+
+logger = logging.getLogger(__name__)
+
+
+def shard_key(sha256: str) -> str:
+    """Two levels of 256-way sharding keeps directory sizes small."""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def _remove_older_than(paths: Iterable[Path], max_age_seconds: float) -> int:
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for path in paths:
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+class BlobBackend:
+    """Interface for blob backends. Keys are SHA-256 hex digests."""
+
+    def staging_path(self) -> Path:
+        """A fresh local path to stream an upload into before commit()."""
+        raise NotImplementedError
+
+    def commit(self, staged: Path, sha256: str) -> bool:
+        """Move a staged file into place. Returns False if the blob already existed (deduplicated)."""
+        raise NotImplementedError
+
+    def exists(self, sha256: str) -> bool:
+        raise NotImplementedError
+
+    def read(self, sha256: str) -> bytes:
+        raise NotImplementedError
+
+    def delete(self, sha256: str) -> None:
+        raise NotImplementedError
+
+    def iter_keys(self) -> Iterator[str]:
+        """Yield the SHA-256 of every stored blob."""
+        raise NotImplementedError
+
+    def location(self, sha256: str) -> str:
+        """Human-readable location (path or URL) for logs and API payloads."""
+        raise NotImplementedError
+
+    def modified_at(self, sha256: str) -> Optional[datetime]:
+        """When the blob was written (UTC), or None if it doesn't exist."""
+        raise NotImplementedError
+
+    def clean_staging(self, max_age_seconds: float) -> int:
+        """Remove abandoned staging files older than max_age_seconds; returns how many."""
+        raise NotImplementedError
+
+    # Derivatives (thumbnails etc.) live beside the original as <sha256>.<name>
+
+    def put_derivative(self, sha256: str, name: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def read_derivative(self, sha256: str, name: str) -> Optional[bytes]:
+        """Derivative bytes, or None if it hasn't been generated."""
+        raise NotImplementedError
+
+    def delete_derivatives(self, sha256: str, names: Iterable[str]) -> None:
+        raise NotImplementedError
+
+
+class LocalBlobBackend(BlobBackend):
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.tmp_dir = self.root / ".tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, sha256: str) -> Path:
+        return self.root / shard_key(sha256)
+
+    def staging_path(self) -> Path:
+        # Same filesystem as the final location, so commit() is an atomic rename
+        return self.tmp_dir / f"{uuid.uuid4().hex}.part"
+
+    def commit(self, staged: Path, sha256: str) -> bool:
+        dest = self.path_for(sha256)
+        if dest.exists():
+            staged.unlink(missing_ok=True)
+            return False
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staged, dest)
+        return True
+
+    def exists(self, sha256: str) -> bool:
+        return self.path_for(sha256).exists()
+
+    def read(self, sha256: str) -> bytes:
+        return self.path_for(sha256).read_bytes()
+
+    def delete(self, sha256: str) -> None:
+        self.path_for(sha256).unlink(missing_ok=True)
+
+    def iter_keys(self) -> Iterator[str]:
+        for path in self.root.glob("??/??/*"):
+            if path.is_file() and len(path.name) == 64:
+                yield path.name
+
+    def location(self, sha256: str) -> str:
+        return str(self.path_for(sha256))
+
+    def modified_at(self, sha256: str) -> Optional[datetime]:
+        path = self.path_for(sha256)
+        return datetime.utcfromtimestamp(path.stat().st_mtime) if path.exists() else None
+
+    def clean_staging(self, max_age_seconds: float) -> int:
+        return _remove_older_than(self.tmp_dir.glob("*.part"), max_age_seconds)
+
+    def put_derivative(self, sha256: str, name: str, data: bytes) -> None:
+        dest = self.path_for(sha256).with_name(f"{sha256}.{name}")
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        staged = self.staging_path()
+        staged.write_bytes(data)
+        os.replace(staged, dest)
+
+    def read_derivative(self, sha256: str, name: str) -> Optional[bytes]:
+        path = self.path_for(sha256).with_name(f"{sha256}.{name}")
+        return path.read_bytes() if path.exists() else None
+
+    def delete_derivatives(self, sha256: str, names: Iterable[str]) -> None:
+        for name in names:
+            self.path_for(sha256).with_name(f"{sha256}.{name}").unlink(missing_ok=True)
+
+
+class S3BlobBackend(BlobBackend):
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, prefix: str = "blobs/"):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("BLOB_BACKEND=s3 requires boto3 (pip install boto3)") from e
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.tmp_dir = Path(tempfile.gettempdir()) / "complicopilot-blobs"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, sha256: str) -> str:
+        return f"{self.prefix}{shard_key(sha256)}"
+
+    def staging_path(self) -> Path:
+        return self.tmp_dir / f"{uuid.uuid4().hex}.part"
+
+    def commit(self, staged: Path, sha256: str) -> bool:
+        try:
+            if self.exists(sha256):
+                return False
+            # Object PUTs are atomic: readers see the old state or the whole object
+            self.client.upload_file(str(staged), self.bucket, self._key(sha256))
+            return True
+        finally:
+            staged.unlink(missing_ok=True)
+
+    def exists(self, sha256: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(sha256))
+            return True
+        except ClientError:
+            return False
+
+    def read(self, sha256: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(sha256))["Body"].read()
+
+    def delete(self, sha256: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(sha256))
+
+    def iter_keys(self) -> Iterator[str]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                name = obj["Key"].rsplit("/", 1)[-1]
+                if len(name) == 64:
+                    yield name
+
+    def location(self, sha256: str) -> str:
+        return f"s3://{self.bucket}/{self._key(sha256)}"
+
+    def modified_at(self, sha256: str) -> Optional[datetime]:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(sha256))
+        except ClientError:
+            return None
+        return head["LastModified"].astimezone(timezone.utc).replace(tzinfo=None)
+
+    def clean_staging(self, max_age_seconds: float) -> int:
+        return _remove_older_than(self.tmp_dir.glob("*.part"), max_age_seconds)
+
+    def put_derivative(self, sha256: str, name: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=f"{self._key(sha256)}.{name}", Body=data)
+
+    def read_derivative(self, sha256: str, name: str) -> Optional[bytes]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=f"{self._key(sha256)}.{name}")["Body"].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def delete_derivatives(self, sha256: str, names: Iterable[str]) -> None:
+        for name in names:
+            self.client.delete_object(Bucket=self.bucket, Key=f"{self._key(sha256)}.{name}")
+
+
+_backend: Optional[BlobBackend] = None
+
+
+def get_blob_backend() -> BlobBackend:
+    """Process-wide backend configured from the environment."""
+    global _backend
+    if _backend is None:
+        kind = os.getenv("BLOB_BACKEND", "local").lower()
+        if kind == "s3":
+            _backend = S3BlobBackend(
+                bucket=os.getenv("S3_BUCKET", "complicopilot"),
+                endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+            )
+        else:
+            root = os.getenv("BLOB_ROOT") or os.path.join(os.getenv("UPLOAD_DIR", "uploads"), "blobs")
+            _backend = LocalBlobBackend(root)
+        logger.info(f"Blob backend: {type(_backend).__name__}")
+    return _backend
+
+
+def ensure_stored(sha256: str, content: bytes, backend: Optional[BlobBackend] = None) -> None:
+    """
+    Re-store a blob if it is missing. Called after a deduplicated upload's reference
+    is committed, in case the sweeper removed the unreferenced copy in between.
+    """
+    backend = backend or get_blob_backend()
+    if backend.exists(sha256):
+        return
+    staged = backend.staging_path()
+    staged.write_bytes(content)
+    backend.commit(staged, sha256)
+
+
+def dialect_insert(dialect: str):
+    """INSERT construct with on_conflict_do_update for the given dialect name."""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+async def acquire(db: AsyncSession, sha256: str, size: int, mime_type: Optional[str], refs: int = 1) -> Blob:
+    """
+    Register a stored blob and add `refs` references to it (0 for uploads that no
+    receipt points at yet, e.g. batch exports). Runs in the caller's transaction.
+    """
+    insert = dialect_insert(db.bind.dialect.name)
+    t = Blob.__table__
+    now = datetime.utcnow()
+    stmt = insert(t).values(sha256=sha256, size=size, mime_type=mime_type, ref_count=refs, created_at=now, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[t.c.sha256],
+        set_={"ref_count": t.c.ref_count + refs, "updated_at": now},
+    )
+    await db.execute(stmt)
+    return await db.get(Blob, sha256, populate_existing=True)
+
+
+async def release(db: AsyncSession, sha256: Optional[str]) -> None:
+    """Drop one reference. Blobs at zero references are removed by services.retention after a grace period."""
+    if not sha256:
+        return
+    await db.execute(
+        sa.update(Blob)
+        .where(Blob.sha256 == sha256, Blob.ref_count > 0)
+        .values(ref_count=Blob.ref_count - 1, updated_at=datetime.utcnow())
+    )
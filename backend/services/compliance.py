@@ -1,12 +1,19 @@
-import pandas as pd
+import os
 import tempfile
+from typing import List
+
+# Batch CSVs are written here; the route deletes each one after sending it and
+# services.retention sweeps any left behind
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "complicopilot-exports"))
 
 # Generate CSV from batch OCR/parsed data
 def generate_csv_from_batch(batch_results: List[dict]) -> str:
     """
     Given a list of dicts (each with keys like filename, ocr_text, parsed),
-    generate a CSV file and return its path.
+    generate a CSV file in EXPORT_DIR and return its path.
     """
+    import pandas as pd  # heavy; only batch exports need it
+
     # Flatten parsed dict for each result
     rows = []
     for item in batch_results:
@@ -19,7 +26,8 @@ def generate_csv_from_batch(batch_results: List[dict]) -> str:
         rows.append(row)
     df = pd.DataFrame(rows)
     # Save to a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv", mode="w", newline="", encoding="utf-8") as tmp:
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv", dir=EXPORT_DIR, mode="w", newline="", encoding="utf-8") as tmp:
         df.to_csv(tmp.name, index=False)
         return tmp.name
 """
@@ -0,0 +1,136 @@
+"""
+Derived images generated when a receipt image is ingested.
+
+- thumb.jpg: small compressed preview for the dashboard
+- ocr.png:   grayscale, already resized to OCR's working size, so re-running
+             OCR can skip decoding and shrinking the original
+
+Generation runs on a small background thread pool (DERIVATIVE_WORKERS,
+default 2) so uploads don't wait for it; get_or_create() builds a missing
+derivative on demand. OpenCV and PIL are imported on first use, so importing
+this module (e.g. for schedule()) doesn't load the imaging stack.
+"""
+
+import io
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+from services import metrics
+from services.blobstore import BlobBackend, get_blob_backend
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+THUMB_MAX_SIDE = int(os.getenv("THUMB_MAX_SIDE", "320"))
+THUMB_QUALITY = int(os.getenv("THUMB_QUALITY", "70"))
+DERIVATIVE_WORKERS = int(os.getenv("DERIVATIVE_WORKERS", "2"))
+
+THUMB = "thumb.jpg"
+OCR_READY = "ocr.png"
+MEDIA_TYPES = {THUMB: "image/jpeg", OCR_READY: "image/png"}
+
+
+def make_thumbnail(content: bytes, max_side: int = THUMB_MAX_SIDE, quality: int = THUMB_QUALITY) -> bytes:
+    """Compressed JPEG preview no larger than max_side on either edge."""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(content))
+    # For JPEGs this lets libjpeg decode at 1/2, 1/4 or 1/8 scale directly
+    img.draft("RGB", (max_side, max_side))
+    img = img.convert("RGB")
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def make_ocr_ready(content: bytes) -> bytes:
+    """Grayscale PNG at OCR's working resolution."""
+    import cv2
+    from services.ocr import _decode_reduced_gray, _resize_max
+
+    gray = _decode_reduced_gray(content)
+    if gray is None:
+        raise ValueError("Failed to decode image")
+    ok, encoded = cv2.imencode(".png", _resize_max(gray))
+    if not ok:
+        raise ValueError("Failed to encode OCR-ready image")
+    return encoded.tobytes()
+
+
+GENERATORS: Dict[str, Callable[[bytes], bytes]] = {
+    THUMB: make_thumbnail,
+    OCR_READY: make_ocr_ready,
+}
+
+
+def generate_all(sha256: str, content: bytes, backend: Optional[BlobBackend] = None) -> None:
+    """Create every missing derivative for a blob."""
+    backend = backend or get_blob_backend()
+    for name, generator in GENERATORS.items():
+        if backend.read_derivative(sha256, name) is not None:
+            continue
+        try:
+            backend.put_derivative(sha256, name, generator(content))
+        except Exception as e:
+            logger.warning(f"Derivative {name} for {sha256[:12]} failed: {e}")
+
+
+def get_or_create(sha256: str, name: str, backend: Optional[BlobBackend] = None) -> bytes:
+    """Return a derivative, generating it from the original if the background job hasn't yet."""
+    backend = backend or get_blob_backend()
+    data = backend.read_derivative(sha256, name)
+    metrics.cache_access(f"derivative.{name}", data is not None)
+    if data is None:
+        data = GENERATORS[name](backend.read(sha256))
+        backend.put_derivative(sha256, name, data)
+    return data
+
+
+def load_ocr_ready(sha256: str, backend: Optional[BlobBackend] = None) -> "np.ndarray":
+    """Grayscale array ready for OCRService (no full-resolution decode of the original)."""
+    import cv2
+    import numpy as np
+
+    data = get_or_create(sha256, OCR_READY, backend)
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _job_done(_: Future) -> None:
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def schedule(sha256: str, content: bytes) -> Future:
+    """Queue derivative generation on the background pool."""
+    global _executor, _pending
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DERIVATIVE_WORKERS, thread_name_prefix="derivatives")
+    future = _executor.submit(generate_all, sha256, content)
+    with _pending_lock:
+        _pending += 1
+    future.add_done_callback(_job_done)
+    return future
+
+
+def queue_depth() -> int:
+    """Derivative jobs scheduled and not finished yet (queued or running)."""
+    return _pending
+
+
+def shutdown(wait: bool = True) -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
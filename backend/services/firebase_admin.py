@@ -1,35 +1,96 @@
-import firebase_admin
-from firebase_admin import credentials, auth as fb_auth
+import logging
 import os
+import threading
+from typing import Any, Optional
+
+from services.token_verifier import CertificateStore, FirebaseTokenDecoder, TokenVerifier
+
+logger = logging.getLogger(__name__)
 
 # Check if we're in development mode
 DEVELOPMENT_MODE = os.getenv("DEVELOPMENT_MODE", "true").lower() == "true"
+SKIP_VERIFICATION = DEVELOPMENT_MODE and os.getenv("GOOGLE_APPLICATION_CREDENTIALS") is None
+
+DEV_USER = {
+    "uid": "dev-user-123",
+    "email": "dev@example.com",
+    "name": "Development User"
+}
+
+_app_lock = threading.Lock()
+
+
+def get_app() -> Any:
+    """The default Firebase app, initialized on first use (firebase_admin is slow to import)."""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _app_lock:
+        if not firebase_admin._apps:
+            cred_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+            if cred_path and os.path.exists(cred_path):
+                cred = credentials.Certificate(cred_path)
+                firebase_admin.initialize_app(cred)
+            else:
+                # For development: initialize without credentials
+                # This allows the app to start but Firebase features won't work
+                firebase_admin.initialize_app()
+        return firebase_admin.get_app()
+
+if SKIP_VERIFICATION:
+    logger.warning("DEVELOPMENT MODE: Skipping Firebase token verification")
+
+
+def _project_id() -> Optional[str]:
+    for var in ("FIREBASE_PROJECT_ID", "GOOGLE_CLOUD_PROJECT", "GCLOUD_PROJECT"):
+        if os.getenv(var):
+            return os.getenv(var)
+    try:
+        return get_app().project_id
+    except Exception:
+        return None
+
+
+certificates = CertificateStore()
+_verifier: Optional[TokenVerifier] = None
+
+
+def get_verifier() -> TokenVerifier:
+    """
+    Verify tokens locally against prefetched certificates when the project id is
+    known; otherwise fall back to firebase_admin (results are cached either way).
+    """
+    global _verifier
+    if _verifier is None:
+        project_id = _project_id()
+        if project_id:
+            _verifier = TokenVerifier(FirebaseTokenDecoder(project_id, certificates))
+        else:
+            from firebase_admin import auth as fb_auth
+
+            logger.warning("Firebase project id unknown; verifying tokens through firebase_admin")
+            get_app()
+            _verifier = TokenVerifier(fb_auth.verify_id_token)
+    return _verifier
+
+
+def start_key_refresh() -> None:
+    """Prefetch signing certificates in the background (called on app startup)."""
+    if not SKIP_VERIFICATION:
+        certificates.start()
+
+
+def stop_key_refresh() -> None:
+    certificates.stop()
 
-if not firebase_admin._apps:
-    cred_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-    if cred_path and os.path.exists(cred_path):
-        cred = credentials.Certificate(cred_path)
-        firebase_admin.initialize_app(cred)
-    else:
-        # For development: initialize without credentials
-        # This allows the app to start but Firebase features won't work
-        firebase_admin.initialize_app()
 
 def verify_firebase_token(id_token):
     # In development mode, skip actual verification for easier testing
-    if DEVELOPMENT_MODE and os.getenv("GOOGLE_APPLICATION_CREDENTIALS") is None:
-        print("DEVELOPMENT MODE: Skipping Firebase token verification")
-        # Return a mock user for development
-        return {
-            "uid": "dev-user-123",
-            "email": "dev@example.com",
-            "name": "Development User"
-        }
-    
+    if SKIP_VERIFICATION:
+        return dict(DEV_USER)
+
     try:
-        decoded_token = fb_auth.verify_id_token(id_token)
-        return decoded_token
+        return get_verifier().verify(id_token)
     except Exception as e:
-        print(f"Firebase token verification failed: {e}")
+        logger.info(f"Firebase token verification failed: {e}")
         return None
-    
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+Readiness probes for load balancers.
+
+readiness() checks the things a node needs to take OCR traffic: the database
+(ping latency and pool saturation), the Tesseract binary (availability and
+one-off warm-up time), the OCR backlog (images in flight, worker-thread
+saturation, derivative queue) and free space for uploads, plus the task queue
+and live OCR workers with OCR_BROKER on. Results are cached for
+HEALTH_CACHE_SECONDS so frequent health checks don't add load, and concurrent
+callers share one probe run.
+"""
+
+import asyncio
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional
+
+import sqlalchemy as sa
+from anyio import to_thread
+from starlette.concurrency import run_in_threadpool
+
+from database.session import DB_MAX_OVERFLOW, AsyncSessionLocal, async_engine
+from services import derivatives, ocr_queue
+from services.admission import admission
+from services.blobstore import get_blob_backend
+from services.registry import registry
+from services.scheduler import ocr_scheduler
+
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "2"))
+HEALTH_DB_TIMEOUT = float(os.getenv("HEALTH_DB_TIMEOUT", "2"))  # seconds
+HEALTH_MAX_POOL_SATURATION = float(os.getenv("HEALTH_MAX_POOL_SATURATION", "0.9"))
+HEALTH_MAX_OCR_IN_FLIGHT = int(os.getenv("HEALTH_MAX_OCR_IN_FLIGHT", "8"))
+HEALTH_MIN_FREE_MB = int(os.getenv("HEALTH_MIN_FREE_MB", "500"))
+HEALTH_REQUIRE_TESSERACT = os.getenv("HEALTH_REQUIRE_TESSERACT", "true").lower() == "true"
+HEALTH_TESSERACT_RETRY_SECONDS = float(os.getenv("HEALTH_TESSERACT_RETRY_SECONDS", "30"))
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+async def probe_database() -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        async with async_engine.connect() as conn:
+            await asyncio.wait_for(conn.execute(sa.text("SELECT 1")), HEALTH_DB_TIMEOUT)
+        result: Dict[str, Any] = {"ok": True, "latency_ms": _ms(time.perf_counter() - start)}
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    pool = async_engine.pool
+    if hasattr(pool, "checkedout") and hasattr(pool, "size"):
+        capacity = pool.size() + max(DB_MAX_OVERFLOW, 0)
+        in_use = pool.checkedout()
+        saturation = in_use / capacity if capacity else 0.0
+        result["pool"] = {"in_use": in_use, "capacity": capacity, "saturation": round(saturation, 3)}
+        result["ok"] = saturation < HEALTH_MAX_POOL_SATURATION
+    else:
+        # e.g. NullPool (SQLite): connections aren't pooled, so there's nothing to saturate
+        result["pool"] = {"class": type(pool).__name__, "saturation": None}
+    return result
+
+
+_tesseract: Optional[Dict[str, Any]] = None
+_tesseract_at = 0.0
+
+
+def _warm_up_tesseract() -> Dict[str, Any]:
+    """Find the binary and run one tiny OCR, which loads the language data into the page cache."""
+    start = time.perf_counter()
+    try:
+        import numpy as np
+        import pytesseract
+
+        version = str(pytesseract.get_tesseract_version())
+        pytesseract.image_to_string(np.full((32, 32), 255, np.uint8))
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    return {"ok": True, "version": version, "warm_up_ms": _ms(time.perf_counter() - start)}
+
+
+async def probe_tesseract() -> Dict[str, Any]:
+    # Once found, the binary stays, so a success is remembered; a failure is retried
+    # every HEALTH_TESSERACT_RETRY_SECONDS (e.g. the package was still being installed)
+    global _tesseract, _tesseract_at
+    stale = _tesseract is not None and not _tesseract["ok"] and time.monotonic() - _tesseract_at >= HEALTH_TESSERACT_RETRY_SECONDS
+    if _tesseract is None or stale:
+        _tesseract, _tesseract_at = await run_in_threadpool(_warm_up_tesseract), time.monotonic()
+    result = dict(_tesseract)
+    if not HEALTH_REQUIRE_TESSERACT:
+        result["ok"] = True
+    return result
+
+
+def probe_ocr_queue() -> Dict[str, Any]:
+    limiter = to_thread.current_default_thread_limiter()
+    # Nothing can be in flight before the OCR stack has loaded; don't load it just to find out
+    in_flight = registry.get("ocr").in_flight if registry.is_loaded("ocr") else 0
+    return {
+        "ok": in_flight < HEALTH_MAX_OCR_IN_FLIGHT,
+        "in_flight": in_flight,
+        "threads_busy": limiter.borrowed_tokens,
+        "threads_total": int(limiter.total_tokens),
+        "derivative_queue": derivatives.queue_depth(),
+        "admission": admission.stats(),
+        "scheduler": ocr_scheduler.stats(),
+        "services_loaded": registry.report(),
+    }
+
+
+async def probe_ocr_broker() -> Dict[str, Any]:
+    """Queue depth and live workers in OCR_BROKER mode. Informational: an empty fleet doesn't fail the API node."""
+    try:
+        async with AsyncSessionLocal() as db:
+            return {"ok": True, **await asyncio.wait_for(ocr_queue.stats(db), HEALTH_DB_TIMEOUT)}
+    except Exception as e:
+        return {"ok": True, "error": f"{type(e).__name__}: {e}"}
+
+
+def probe_disk(path: Optional[str] = None) -> Dict[str, Any]:
+    """Free space where uploads are staged (the blob root for the local backend)."""
+    try:
+        path = path or str(get_blob_backend().tmp_dir)
+        usage = shutil.disk_usage(path)
+    except OSError as e:
+        return {"ok": False, "error": str(e)}
+    free_mb = usage.free // (1024 * 1024)
+    return {"ok": free_mb >= HEALTH_MIN_FREE_MB, "free_mb": free_mb, "used_pct": round(100 * usage.used / usage.total, 1)}
+
+
+async def _run_probes() -> Dict[str, Any]:
+    start = time.perf_counter()
+    database, tesseract = await asyncio.gather(probe_database(), probe_tesseract())
+    checks = {
+        "database": database,
+        "tesseract": tesseract,
+        "ocr": probe_ocr_queue(),
+        "disk": await run_in_threadpool(probe_disk),
+    }
+    if ocr_queue.OCR_BROKER:
+        checks["ocr_broker"] = await probe_ocr_broker()
+    failing: List[str] = [name for name, check in checks.items() if not check["ok"]]
+    return {
+        "status": "ready" if not failing else "unavailable",
+        "failing": failing,
+        "checks": checks,
+        "probe_ms": _ms(time.perf_counter() - start),
+    }
+
+
+_cached: Optional[Dict[str, Any]] = None
+_cached_at = 0.0
+_lock: Optional[asyncio.Lock] = None
+
+
+async def readiness() -> Dict[str, Any]:
+    """Probe results, reused for HEALTH_CACHE_SECONDS; `cached_age_ms` shows how old they are."""
+    global _cached, _cached_at, _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        now = time.monotonic()
+        if _cached is None or now - _cached_at >= HEALTH_CACHE_SECONDS:
+            _cached, _cached_at = await _run_probes(), now
+        return {**_cached, "cached_age_ms": _ms(time.monotonic() - _cached_at)}
+
+
+def reset_cache() -> None:
+    global _cached, _cached_at, _tesseract, _tesseract_at, _lock
+    _cached, _cached_at, _tesseract, _tesseract_at, _lock = None, 0.0, None, 0.0, None
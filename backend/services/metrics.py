@@ -0,0 +1,176 @@
+"""
+Prometheus instrumentation.
+
+Histograms and counters for OCR stages, Tesseract calls, cache hits, parsing,
+DB queries and HTTP requests, exposed at /metrics (api/metrics.py).
+
+METRICS_ENABLED (default true) turns everything on or off. When off, or when
+prometheus_client isn't installed, the hooks return a shared no-op and no
+SQLAlchemy listeners or middleware are installed, so instrumented code pays a
+single flag check. With several worker processes set PROMETHEUS_MULTIPROC_DIR
+so /metrics aggregates all of them.
+"""
+
+import logging
+import os
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+try:
+    import prometheus_client as prom
+except ImportError:  # optional dependency
+    prom = None
+    if METRICS_ENABLED:
+        logger.warning("prometheus_client not installed; metrics disabled")
+
+ENABLED = METRICS_ENABLED and prom is not None
+
+# Sub-millisecond resolution for preprocessing stages, up to tens of seconds for Tesseract
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+if ENABLED:
+    REGISTRY = prom.CollectorRegistry(auto_describe=True)
+    OCR_STAGE_SECONDS = prom.Histogram(
+        "complicopilot_ocr_stage_seconds", "Time spent in each OCR pipeline stage",
+        ["stage"], buckets=LATENCY_BUCKETS, registry=REGISTRY,
+    )
+    TESSERACT_CALLS = prom.Counter(
+        "complicopilot_tesseract_calls_total", "Tesseract invocations", ["call"], registry=REGISTRY,
+    )
+    CACHE_REQUESTS = prom.Counter(
+        "complicopilot_cache_requests_total", "Cache lookups by cache and result (hit/miss)",
+        ["cache", "result"], registry=REGISTRY,
+    )
+    PARSE_SECONDS = prom.Histogram(
+        "complicopilot_parse_seconds", "Time spent parsing OCR text into fields",
+        buckets=LATENCY_BUCKETS, registry=REGISTRY,
+    )
+    DB_QUERY_SECONDS = prom.Histogram(
+        "complicopilot_db_query_seconds", "Database statement latency by statement type",
+        ["operation"], buckets=LATENCY_BUCKETS, registry=REGISTRY,
+    )
+    ADMISSION_REJECTED = prom.Counter(
+        "complicopilot_admission_rejected_total", "OCR requests refused by admission control, by reason",
+        ["reason"], registry=REGISTRY,
+    )
+    HTTP_REQUEST_SECONDS = prom.Histogram(
+        "complicopilot_http_request_seconds", "HTTP request latency by route template",
+        ["method", "route", "status"], buckets=LATENCY_BUCKETS, registry=REGISTRY,
+    )
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopTimer":
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Any):
+        self.histogram = histogram
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+def ocr_stage(stage: str):
+    """Context manager timing one OCR stage, e.g. `with metrics.ocr_stage("deskew"): ...`."""
+    return _Timer(OCR_STAGE_SECONDS.labels(stage)) if ENABLED else _NOOP
+
+
+def parse_timer():
+    return _Timer(PARSE_SECONDS) if ENABLED else _NOOP
+
+
+def tesseract_call(call: str) -> None:
+    if ENABLED:
+        TESSERACT_CALLS.labels(call).inc()
+
+
+def cache_access(cache: str, hit: bool) -> None:
+    if ENABLED:
+        CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def admission_rejected(reason: str) -> None:
+    if ENABLED:
+        ADMISSION_REJECTED.labels(reason).inc()
+
+
+def instrument_engine(engine: Any) -> None:
+    """Time every statement on a (sync) SQLAlchemy engine; pass async_engine.sync_engine for async ones."""
+    if not ENABLED:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_query_start")
+        if starts:
+            operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            DB_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - starts.pop())
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording request latency, labelled by the matched route template."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; templates keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
+
+
+def render() -> Optional[bytes]:
+    """Prometheus text exposition of all metrics, or None if metrics are disabled."""
+    if not ENABLED:
+        return None
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = prom.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return prom.generate_latest(registry)
+    return prom.generate_latest(REGISTRY)
+
+
+CONTENT_TYPE = prom.CONTENT_TYPE_LATEST if prom else "text/plain"
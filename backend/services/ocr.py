@@ -1,13 +1,18 @@
 from __future__ import annotations
+import io
 import logging
+import mmap
 import os
+import threading
 from pathlib import Path
-from typing import Union, Tuple, List
+from typing import Optional, Union, Tuple, List
 import cv2
 import numpy as np
 import pytesseract
 from PIL import Image
 
+from services import metrics
+
 logger = logging.getLogger(__name__)
 if not logger.handlers:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
@@ -21,6 +26,76 @@ def _ensure_tesseract_cmd():
         logger.info(f"Tesseract command set to: {cmd}")
 
 
+# Longest side OCR works at; larger inputs are decoded reduced and/or shrunk to this
+MAX_SIDE = 1600
+
+# Decode-time reductions OpenCV supports (JPEG uses libjpeg DCT scaling, so the
+# full-resolution image is never materialized)
+_REDUCED_GRAYSCALE = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+                      4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+ImageInput = Union[str, Path, bytes, bytearray, memoryview, mmap.mmap, Image.Image, np.ndarray]
+
+
+def _image_size(source: Union[str, Path, bytes, bytearray, memoryview, mmap.mmap]) -> Optional[Tuple[int, int]]:
+    """(width, height) from the image header only; None if unrecognised."""
+    try:
+        if isinstance(source, (str, Path)):
+            with Image.open(source) as im:
+                return im.size
+        if isinstance(source, mmap.mmap):
+            source.seek(0)
+            with Image.open(source) as im:
+                return im.size
+        with Image.open(io.BytesIO(source)) as im:
+            return im.size
+    except Exception:
+        return None
+
+
+def _reduction_factor(size: Optional[Tuple[int, int]], max_side: int = MAX_SIDE) -> int:
+    """Largest decode reduction that still leaves the long side >= max_side."""
+    if not size:
+        return 1
+    longest = max(size)
+    for factor in (8, 4, 2):
+        if longest // factor >= max_side:
+            return factor
+    return 1
+
+
+def _decode_reduced_gray(source: Union[str, Path, bytes, bytearray, memoryview, mmap.mmap], max_side: int = MAX_SIDE) -> Optional[np.ndarray]:
+    """
+    Decode straight to grayscale at a reduced resolution picked from the header.
+    Paths are memory-mapped rather than read into the Python heap.
+    """
+    flags = _REDUCED_GRAYSCALE[_reduction_factor(_image_size(source), max_side)]
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return cv2.imdecode(np.frombuffer(mm, np.uint8), flags)
+    return cv2.imdecode(np.frombuffer(source, np.uint8), flags)
+
+
+def _to_gray(img: np.ndarray) -> np.ndarray:
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def _load_for_ocr(img: ImageInput, max_side: int = MAX_SIDE) -> np.ndarray:
+    """
+    Load any supported input as an image OCR can work on (grayscale for encoded
+    inputs, which are decoded reduced; arrays and PIL images as BGR).
+    """
+    if isinstance(img, (str, Path)):
+        if not os.path.exists(str(img)):
+            raise FileNotFoundError(f"Image file not found: {img}")
+        return _decode_reduced_gray(img, max_side)
+    if isinstance(img, (bytes, bytearray, memoryview, mmap.mmap)):
+        return _decode_reduced_gray(img, max_side)
+    if isinstance(img, np.ndarray):
+        return img  # grayscale or BGR; the pipelines handle both
+    return _as_numpy_bgr(img)
+
+
 def _as_numpy_bgr(img: Union[str, Path, bytes, Image.Image, np.ndarray]) -> np.ndarray:
     """Load various input types into a BGR numpy image for OpenCV."""
     if isinstance(img, np.ndarray):
@@ -44,7 +119,7 @@ def _as_numpy_bgr(img: Union[str, Path, bytes, Image.Image, np.ndarray]) -> np.n
     raise TypeError(f"Unsupported image type: {type(img)}")
 
 
-def _resize_max(img: np.ndarray, max_side: int = 1600) -> np.ndarray:
+def _resize_max(img: np.ndarray, max_side: int = MAX_SIDE) -> np.ndarray:
     """Resize image if larger than max_side while maintaining aspect ratio."""
     h, w = img.shape[:2]
     scale = max_side / max(h, w)
@@ -77,7 +152,7 @@ def _deskew(gray: np.ndarray) -> np.ndarray:
 
 def _preprocess_pipeline_binarize(bgr: np.ndarray) -> np.ndarray:
     """Basic preprocessing with adaptive thresholding."""
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    gray = _to_gray(bgr)
     # Apply Gaussian blur to reduce noise
     blurred = cv2.GaussianBlur(gray, (5, 5), 0)
     # Adaptive threshold for better text detection
@@ -87,7 +162,7 @@ def _preprocess_pipeline_binarize(bgr: np.ndarray) -> np.ndarray:
 
 def _preprocess_pipeline_otsu(bgr: np.ndarray) -> np.ndarray:
     """Preprocessing with Otsu's thresholding."""
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    gray = _to_gray(bgr)
     # Apply Gaussian blur
     blurred = cv2.GaussianBlur(gray, (5, 5), 0)
     # Otsu's thresholding
@@ -97,7 +172,7 @@ def _preprocess_pipeline_otsu(bgr: np.ndarray) -> np.ndarray:
 
 def _preprocess_pipeline_clahe(bgr: np.ndarray) -> np.ndarray:
     """Preprocessing with CLAHE (Contrast Limited Adaptive Histogram Equalization)."""
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    gray = _to_gray(bgr)
     # Apply CLAHE
     clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
     enhanced = clahe.apply(gray)
@@ -107,6 +182,19 @@ def _preprocess_pipeline_clahe(bgr: np.ndarray) -> np.ndarray:
     return binary
 
 
+# OCR modes: FULL searches all three pipelines; FAST is the degraded single-pipeline mode
+FULL = "full"
+FAST = "fast"
+PIPELINES = {
+    FULL: [
+        ("binarize", _preprocess_pipeline_binarize),
+        ("otsu", _preprocess_pipeline_otsu),
+        ("clahe", _preprocess_pipeline_clahe),
+    ],
+    FAST: [("otsu", _preprocess_pipeline_otsu)],
+}
+
+
 class OCRService:
     """Service for extracting text from images using Tesseract OCR."""
     
@@ -118,34 +206,50 @@ class OCRService:
             tesseract_config: Tesseract configuration string
         """
         self.tesseract_config = tesseract_config
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
         _ensure_tesseract_cmd()
         logger.info("OCRService initialized")
+
+    @property
+    def in_flight(self) -> int:
+        """Images currently being OCR'd (reported by the readiness probe)."""
+        return self._in_flight
     
-    def extract_text_from_image(self, img: Union[str, Path, bytes, Image.Image, np.ndarray]) -> str:
+    def extract_text_from_image(self, img: ImageInput, mode: str = FULL) -> str:
         """
         Extract text from a single image using multiple preprocessing techniques.
         
         Args:
-            img: Image input (file path, bytes, PIL Image, or numpy array)
+            img: Image input (file path, bytes/memoryview/mmap, PIL Image, or numpy array)
+            mode: FULL tries every preprocessing pipeline and keeps the most confident
+                read; FAST runs only Otsu (about a third of the Tesseract time)
             
         Returns:
             Extracted text string
         """
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            return self._extract_text(img, mode)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+
+    def _extract_text(self, img: ImageInput, mode: str = FULL) -> str:
         try:
-            # Convert to OpenCV format
-            bgr_image = _as_numpy_bgr(img)
+            # Convert to OpenCV format (encoded inputs are decoded reduced, in grayscale)
+            with metrics.ocr_stage("decode"):
+                bgr_image = _load_for_ocr(img)
             if bgr_image is None:
                 raise ValueError("Failed to load image")
             
             # Resize if too large
-            bgr_image = _resize_max(bgr_image)
+            with metrics.ocr_stage("resize"):
+                bgr_image = _resize_max(bgr_image)
             
             # Try multiple preprocessing approaches
-            preprocessors = [
-                ("binarize", _preprocess_pipeline_binarize),
-                ("otsu", _preprocess_pipeline_otsu),
-                ("clahe", _preprocess_pipeline_clahe),
-            ]
+            preprocessors = PIPELINES[mode]
             
             best_text = ""
             best_confidence = 0
@@ -153,17 +257,23 @@ class OCRService:
             for name, preprocess_func in preprocessors:
                 try:
                     # Preprocess image
-                    processed = preprocess_func(bgr_image)
+                    with metrics.ocr_stage(f"preprocess.{name}"):
+                        processed = preprocess_func(bgr_image)
                     
                     # Apply deskewing
-                    deskewed = _deskew(processed)
+                    with metrics.ocr_stage("deskew"):
+                        deskewed = _deskew(processed)
                     
                     # Extract text
-                    text = pytesseract.image_to_string(deskewed, config=self.tesseract_config)
+                    metrics.tesseract_call("image_to_string")
+                    with metrics.ocr_stage("tesseract"):
+                        text = pytesseract.image_to_string(deskewed, config=self.tesseract_config)
                     
                     # Get confidence score
                     try:
-                        data = pytesseract.image_to_data(deskewed, output_type=pytesseract.Output.DICT)
+                        metrics.tesseract_call("image_to_data")
+                        with metrics.ocr_stage("tesseract.confidence"):
+                            data = pytesseract.image_to_data(deskewed, output_type=pytesseract.Output.DICT)
                         confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
                         avg_confidence = sum(confidences) / len(confidences) if confidences else 0
                     except:
@@ -183,8 +293,10 @@ class OCRService:
             # Fallback: try raw image if all preprocessing failed
             if not best_text.strip():
                 try:
-                    gray = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2GRAY)
-                    best_text = pytesseract.image_to_string(gray, config=self.tesseract_config)
+                    gray = _to_gray(bgr_image)
+                    metrics.tesseract_call("image_to_string")
+                    with metrics.ocr_stage("tesseract"):
+                        best_text = pytesseract.image_to_string(gray, config=self.tesseract_config)
                     logger.info("Used fallback raw OCR")
                 except Exception as e:
                     logger.error(f"Fallback OCR failed: {e}")
@@ -196,7 +308,7 @@ class OCRService:
             logger.error(f"OCR extraction failed: {e}")
             return ""
     
-    def extract_texts_from_images(self, imgs: List[Union[str, Path, bytes, Image.Image, np.ndarray]]) -> List[str]:
+    def extract_texts_from_images(self, imgs: List[ImageInput]) -> List[str]:
         """
         Extract text from a list of images (batch processing).
         Returns a list of OCR results (one per image).
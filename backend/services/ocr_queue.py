@@ -0,0 +1,272 @@
+"""
+OCR task queue for the distributed worker mode.
+
+One API node can only OCR as fast as its own cores. With OCR_BROKER=true the
+API stops running OCR itself: uploads and reprocess requests insert a row in
+`ocr_tasks` (in the same transaction as the receipt) and return 202, and any
+number of `python -m services.ocr_worker` processes, on any machine that can
+reach the database and blob store, claim tasks, OCR and parse the image, and
+write the result back to the receipt.
+
+The broker is the database itself, so there is nothing new to run: on
+Postgres, workers claim with `SELECT ... FOR UPDATE SKIP LOCKED`, so they
+never block on or double-claim each other's rows; SQLite serialises writers,
+which is enough to run several workers on one machine.
+
+- A claimed task is leased to its worker for OCR_TASK_VISIBILITY_TIMEOUT
+  seconds. Workers heartbeat every OCR_WORKER_HEARTBEAT seconds, which
+  extends the leases of the tasks they hold, but only for OCR_TASK_MAX_RUNTIME
+  seconds after the claim: a task stuck in a hung OCR call (while the
+  worker's heartbeat goes on) loses its lease like one whose worker died.
+- A lease that expires (the worker crashed, hung or lost the database) makes
+  the task visible again, and another worker picks it up. After
+  OCR_TASK_MAX_ATTEMPTS attempts it is marked failed instead.
+- Results are only written by the worker still holding the lease, so a
+  worker that was presumed dead can't overwrite a redelivered task's result.
+"""
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.entities import Blob, OCRTask, OCRWorker, Receipt
+from services import summaries
+from services.parser import ParserService
+
+OCR_BROKER = os.getenv("OCR_BROKER", "false").lower() == "true"
+OCR_TASK_VISIBILITY_TIMEOUT = float(os.getenv("OCR_TASK_VISIBILITY_TIMEOUT", "120"))  # seconds
+OCR_TASK_MAX_ATTEMPTS = int(os.getenv("OCR_TASK_MAX_ATTEMPTS", "3"))
+# Leases stop being extended this long after a claim (default 5 visibility timeouts)
+OCR_TASK_MAX_RUNTIME = float(os.getenv("OCR_TASK_MAX_RUNTIME", str(5 * OCR_TASK_VISIBILITY_TIMEOUT)))  # seconds
+OCR_TASK_RETRY_DELAY = float(os.getenv("OCR_TASK_RETRY_DELAY", "5"))  # seconds, doubled per attempt
+OCR_WORKER_HEARTBEAT = float(os.getenv("OCR_WORKER_HEARTBEAT", "10"))  # seconds
+OCR_TASK_KEEP_HOURS = float(os.getenv("OCR_TASK_KEEP_HOURS", "24"))  # finished tasks, for stats and debugging
+
+UPLOAD = "upload"  # OCR the original, fill in vendor/date/amount
+REPROCESS = "reprocess"  # OCR the OCR-ready derivative, refresh `extracted` only
+
+PROCESSING = "processing"  # Receipt.status until an upload's OCR result is written back
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def parsed_fields(parsed: Dict[str, Any], parser: ParserService) -> Dict[str, Any]:
+    """Receipt columns filled in from parser output (placeholders where nothing was found)."""
+    return {
+        "vendor": parsed.get("vendor") or "Unknown Vendor",
+        "date": parsed.get("date") or "",
+        "amount": parser.normalize_amount(parsed.get("total")) or 0.0,
+    }
+
+
+async def enqueue(db: AsyncSession, receipt: Receipt, kind: str, priority: int = 0,
+                  max_attempts: Optional[int] = None) -> OCRTask:
+    """Queue OCR for a receipt with a stored image. Runs in the caller's transaction."""
+    task = OCRTask(receipt_id=receipt.id, blob_sha256=receipt.blob_sha256, kind=kind, priority=int(priority),
+                   max_attempts=max_attempts or OCR_TASK_MAX_ATTEMPTS, available_at=datetime.utcnow())
+    db.add(task)
+    await db.flush()
+    return task
+
+
+async def pending_for(db: AsyncSession, receipt_id: str) -> Optional[OCRTask]:
+    """A queued or running task for the receipt, if there is one."""
+    stmt = sa.select(OCRTask).where(OCRTask.receipt_id == receipt_id, OCRTask.status.in_((QUEUED, RUNNING))).limit(1)
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+
+async def claim(db: AsyncSession, worker_id: str, limit: int = 1,
+                visibility_timeout: float = OCR_TASK_VISIBILITY_TIMEOUT,
+                now: Optional[datetime] = None) -> List[OCRTask]:
+    """
+    Lease up to `limit` tasks to a worker, highest priority (lowest number) and
+    oldest first, and commit. Each claim counts as an attempt.
+    """
+    now = now or datetime.utcnow()
+    candidates = (
+        sa.select(OCRTask.id)
+        .where(OCRTask.status == QUEUED, OCRTask.available_at <= now)
+        .order_by(OCRTask.priority, OCRTask.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)  # no-op on SQLite, which locks the whole database for the UPDATE
+    )
+    stmt = (
+        sa.update(OCRTask)
+        .where(OCRTask.id.in_(candidates.scalar_subquery()), OCRTask.status == QUEUED)
+        .values(status=RUNNING, worker_id=worker_id, attempts=OCRTask.attempts + 1,
+                lease_expires_at=now + timedelta(seconds=visibility_timeout), claimed_at=now, updated_at=now)
+        .returning(OCRTask)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    tasks = list((await db.scalars(stmt)).all())
+    await db.commit()
+    return sorted(tasks, key=lambda t: (t.priority, t.id))
+
+
+async def heartbeat(db: AsyncSession, worker_id: str, tasks_done: int = 0,
+                    visibility_timeout: float = OCR_TASK_VISIBILITY_TIMEOUT,
+                    now: Optional[datetime] = None, max_runtime: Optional[float] = None) -> int:
+    """
+    Record that the worker is alive and extend its leases of tasks claimed less
+    than `max_runtime` (OCR_TASK_MAX_RUNTIME) ago; returns how many it extended.
+    """
+    now = now or datetime.utcnow()
+    max_runtime = OCR_TASK_MAX_RUNTIME if max_runtime is None else max_runtime
+    result = await db.execute(
+        sa.update(OCRTask)
+        .where(OCRTask.worker_id == worker_id, OCRTask.status == RUNNING,
+               OCRTask.claimed_at > now - timedelta(seconds=max_runtime))
+        .values(lease_expires_at=now + timedelta(seconds=visibility_timeout), updated_at=now)
+    )
+    updated = await db.execute(
+        sa.update(OCRWorker).where(OCRWorker.id == worker_id).values(heartbeat_at=now, tasks_done=tasks_done)
+    )
+    if not updated.rowcount:
+        hostname, pid = worker_id.split(":")[:2]
+        db.add(OCRWorker(id=worker_id, hostname=hostname, pid=int(pid), tasks_done=tasks_done,
+                         started_at=now, heartbeat_at=now))
+    await db.commit()
+    return result.rowcount
+
+
+async def requeue_expired(db: AsyncSession, now: Optional[datetime] = None) -> Tuple[int, List[OCRTask]]:
+    """
+    Make tasks whose lease ran out visible again, or fail them if they have
+    used up their attempts. Returns (requeued count, newly failed tasks) without
+    committing: the caller records the failures on the receipts first.
+    """
+    now = now or datetime.utcnow()
+    expired = [OCRTask.status == RUNNING, OCRTask.lease_expires_at < now]
+    failed = (await db.scalars(
+        sa.update(OCRTask)
+        .where(*expired, OCRTask.attempts >= OCRTask.max_attempts)
+        .values(status=FAILED, worker_id=None, lease_expires_at=None, updated_at=now,
+                error="Lease expired on the last attempt")
+        .returning(OCRTask)
+        .execution_options(synchronize_session=False)
+    )).all()
+    requeued = await db.execute(
+        sa.update(OCRTask)
+        .where(*expired)
+        .values(status=QUEUED, worker_id=None, lease_expires_at=None, available_at=now, updated_at=now)
+    )
+    return requeued.rowcount, list(failed)
+
+
+def _holds_lease(task: OCRTask, worker_id: str) -> sa.ColumnElement:
+    return sa.and_(OCRTask.id == task.id, OCRTask.worker_id == worker_id, OCRTask.status == RUNNING)
+
+
+async def complete(db: AsyncSession, task: OCRTask, worker_id: str) -> bool:
+    """
+    Mark a task done if this worker still holds its lease. Call before writing
+    the result, in the same transaction; on False, roll back and drop the result.
+    """
+    result = await db.execute(
+        sa.update(OCRTask).where(_holds_lease(task, worker_id))
+        .values(status=DONE, lease_expires_at=None, error=None, updated_at=datetime.utcnow())
+    )
+    return result.rowcount == 1
+
+
+async def fail(db: AsyncSession, task: OCRTask, worker_id: str, error: str,
+               retry_delay: Optional[float] = None) -> Optional[str]:
+    """
+    Give up on this attempt: queue the task again after a backoff, or mark it
+    failed after its last attempt. Returns the new status, or None if the lease
+    was lost. Like complete(), the caller commits.
+    """
+    now = datetime.utcnow()
+    final = task.attempts >= task.max_attempts
+    values: Dict[str, Any] = {"worker_id": None, "lease_expires_at": None, "error": error[:2000], "updated_at": now}
+    if final:
+        values["status"] = FAILED
+    else:
+        values["status"] = QUEUED
+        delay = OCR_TASK_RETRY_DELAY if retry_delay is None else retry_delay
+        values["available_at"] = now + timedelta(seconds=delay * 2 ** (task.attempts - 1))
+    result = await db.execute(sa.update(OCRTask).where(_holds_lease(task, worker_id)).values(**values))
+    return values["status"] if result.rowcount == 1 else None
+
+
+async def write_result(db: AsyncSession, task: OCRTask, text: str, parsed: Dict[str, Any]) -> Optional[Receipt]:
+    """
+    Store a finished task's OCR text and parse on its receipt (and the blob's
+    OCR cache). An upload still in PROCESSING also gets vendor, date and amount
+    and moves to needs_review; once its status has moved on (someone reviewed
+    it), only `extracted` is refreshed. The caller commits, after complete().
+    """
+    blob = await db.get(Blob, task.blob_sha256)
+    if blob is not None and text:
+        blob.ocr_text = text
+    receipt = await db.get(Receipt, task.receipt_id)
+    if receipt is None:
+        return None  # deleted while queued
+    extracted = {k: v for k, v in (receipt.extracted or {}).items() if k != "ocr_error"}
+    receipt.extracted = {**extracted, "ocr_text": text, "parsed": parsed, "ocr_status": DONE}
+    if task.kind == UPLOAD and receipt.status == PROCESSING:
+        before = summaries.snapshot(receipt)
+        for key, value in parsed_fields(parsed, ParserService()).items():
+            setattr(receipt, key, value)
+        receipt.status = "needs_review"
+        await summaries.apply_change(db, before, summaries.snapshot(receipt))
+    return receipt
+
+
+async def record_failure(db: AsyncSession, receipt_id: str, error: str) -> None:
+    """Mark a receipt's OCR as failed for good; uploads go to review so the fields can be entered by hand."""
+    receipt = await db.get(Receipt, receipt_id)
+    if receipt is None:
+        return
+    receipt.extracted = {**(receipt.extracted or {}), "ocr_status": FAILED, "ocr_error": error}
+    if receipt.status == PROCESSING:
+        receipt.status = "needs_review"
+
+
+async def release(db: AsyncSession, worker_id: str) -> int:
+    """Hand back a stopping worker's unfinished tasks without counting the attempt, and drop its heartbeat row."""
+    result = await db.execute(
+        sa.update(OCRTask)
+        .where(OCRTask.worker_id == worker_id, OCRTask.status == RUNNING)
+        .values(status=QUEUED, worker_id=None, lease_expires_at=None, attempts=OCRTask.attempts - 1,
+                available_at=datetime.utcnow(), updated_at=datetime.utcnow())
+    )
+    await db.execute(sa.delete(OCRWorker).where(OCRWorker.id == worker_id))
+    await db.commit()
+    return result.rowcount
+
+
+async def prune(db: AsyncSession, keep_hours: float = OCR_TASK_KEEP_HOURS, now: Optional[datetime] = None) -> int:
+    """Delete finished tasks, and heartbeat rows of workers, not updated for `keep_hours`. The caller commits."""
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=keep_hours)
+    result = await db.execute(
+        sa.delete(OCRTask).where(OCRTask.status.in_((DONE, FAILED)), OCRTask.updated_at < cutoff)
+    )
+    await db.execute(sa.delete(OCRWorker).where(OCRWorker.heartbeat_at < cutoff))
+    return result.rowcount
+
+
+async def stats(db: AsyncSession, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Task counts per status and the workers seen within the last three heartbeats."""
+    now = now or datetime.utcnow()
+    counts = dict((await db.execute(sa.select(OCRTask.status, sa.func.count()).group_by(OCRTask.status))).all())
+    alive_since = now - timedelta(seconds=3 * OCR_WORKER_HEARTBEAT)
+    workers = await db.scalar(sa.select(sa.func.count()).select_from(OCRWorker).where(OCRWorker.heartbeat_at >= alive_since))
+    oldest = await db.scalar(sa.select(sa.func.min(OCRTask.created_at)).where(OCRTask.status == QUEUED))
+    return {
+        "tasks": {status: int(counts.get(status, 0)) for status in (QUEUED, RUNNING, DONE, FAILED)},
+        "workers": int(workers or 0),
+        "oldest_queued_seconds": round((now - oldest).total_seconds(), 1) if oldest else None,
+    }
@@ -0,0 +1,219 @@
+"""
+OCR worker process for the distributed worker mode (services/ocr_queue.py).
+
+    python -m services.ocr_worker --concurrency 4
+
+Each process claims tasks from `ocr_tasks`, OCRs them on a thread pool of
+--concurrency threads, and writes the text and parse back to the receipt.
+It needs the same DATABASE_URL and blob store (BLOB_BACKEND, BLOB_ROOT or
+S3_BUCKET) as the API; start as many as there are cores to spare, on as many
+machines as needed. A background loop heartbeats every OCR_WORKER_HEARTBEAT
+seconds, which keeps this worker's leases alive (for up to
+OCR_TASK_MAX_RUNTIME per task), and also puts tasks whose lease expired (a
+worker that died or an OCR call that hung) back in the queue.
+
+SIGTERM or SIGINT stops claiming, finishes the tasks in hand and hands back
+any that didn't finish. --max-tasks exits after that many tasks, for a
+supervisor to restart (like OCR_WORKER_MAX_JOBS); --drain exits once no task
+is ready, for one-off backlogs and tests.
+"""
+
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from database.session import AsyncSessionLocal, async_engine
+from models.entities import OCRTask
+from services import ocr_queue
+
+logger = logging.getLogger(__name__)
+
+OCR_WORKER_CONCURRENCY = int(os.getenv("OCR_WORKER_CONCURRENCY", str(os.cpu_count() or 2)))
+# Finished tasks and dead workers' rows are pruned at most this often
+PRUNE_INTERVAL = 3600.0
+
+
+def _registry_ocr(image: Any) -> str:
+    from services.registry import registry
+
+    return registry.get("ocr").extract_text_from_image(image)
+
+
+def load_handler(path: str) -> Callable[[Any], str]:
+    """`module:function` -> the function (an alternative OCR callable, e.g. for tests)."""
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+class QueueWorker:
+    def __init__(self, concurrency: int = OCR_WORKER_CONCURRENCY, handler: Callable[[Any], str] = _registry_ocr,
+                 session_factory=AsyncSessionLocal, poll_interval: float = 1.0,
+                 heartbeat_interval: float = ocr_queue.OCR_WORKER_HEARTBEAT,
+                 visibility_timeout: float = ocr_queue.OCR_TASK_VISIBILITY_TIMEOUT,
+                 max_tasks: int = 0, drain: bool = False, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or ocr_queue.new_worker_id()
+        self.concurrency = concurrency
+        self.handler = handler
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.visibility_timeout = visibility_timeout
+        self.max_tasks = max_tasks
+        self.drain = drain
+        self.claimed = 0
+        self.completed = 0
+        self.failed = 0
+        self.stopping = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._last_prune = 0.0
+
+    def stop(self) -> None:
+        self.stopping = True
+
+    def _load_image(self, task: OCRTask) -> Any:
+        from services import derivatives
+        from services.blobstore import get_blob_backend
+
+        if task.kind == ocr_queue.REPROCESS:
+            return derivatives.load_ocr_ready(task.blob_sha256)
+        return get_blob_backend().read(task.blob_sha256)
+
+    def _ocr(self, task: OCRTask) -> Tuple[str, Dict[str, Any]]:
+        from services.parser import ParserService
+
+        text = self.handler(self._load_image(task))
+        return text, ParserService().parse(text)
+
+    async def _process(self, task: OCRTask) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            text, parsed = await loop.run_in_executor(self._executor, self._ocr, task)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.warning(f"OCR task {task.id} attempt {task.attempts}/{task.max_attempts} failed: {error}")
+            async with self.session_factory() as db:
+                status = await ocr_queue.fail(db, task, self.worker_id, error)
+                if status == ocr_queue.FAILED:
+                    await ocr_queue.record_failure(db, task.receipt_id, error)
+                await db.commit()
+            self.failed += 1
+            return
+        async with self.session_factory() as db:
+            if not await ocr_queue.complete(db, task, self.worker_id):
+                # Our lease expired and the task went to another worker; its result wins
+                logger.warning(f"Lost the lease on OCR task {task.id}; dropping the result")
+                await db.rollback()
+                return
+            await ocr_queue.write_result(db, task, text, parsed)
+            await db.commit()
+        self.completed += 1
+
+    async def _run_task(self, task: OCRTask) -> None:
+        try:
+            await self._process(task)
+        except Exception:
+            # e.g. the database went away: the lease runs out and the task is redelivered
+            logger.exception(f"OCR task {task.id} could not be recorded")
+
+    async def maintain(self) -> None:
+        """One heartbeat: extend our leases, requeue expired ones elsewhere, prune old rows now and then."""
+        async with self.session_factory() as db:
+            await ocr_queue.heartbeat(db, self.worker_id, self.completed, self.visibility_timeout)
+            requeued, failed = await ocr_queue.requeue_expired(db)
+            for task in failed:
+                await ocr_queue.record_failure(db, task.receipt_id, task.error or "OCR failed")
+            if time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+                await ocr_queue.prune(db)
+                self._last_prune = time.monotonic()
+            await db.commit()
+        if requeued or failed:
+            logger.info(f"Expired leases: {requeued} requeued, {len(failed)} failed")
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.maintain()
+            except Exception as e:
+                logger.warning(f"Heartbeat failed: {type(e).__name__}: {e}")
+
+    async def _claim(self, limit: int) -> List[OCRTask]:
+        try:
+            async with self.session_factory() as db:
+                return await ocr_queue.claim(db, self.worker_id, limit, self.visibility_timeout)
+        except Exception as e:
+            logger.warning(f"Claiming OCR tasks failed: {type(e).__name__}: {e}")
+            return []
+
+    async def run(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ocr-worker")
+        await self.maintain()
+        heartbeats = asyncio.create_task(self._heartbeat_loop())
+        in_flight: Set[asyncio.Task] = set()
+        logger.info(f"OCR worker {self.worker_id} started with {self.concurrency} threads")
+        try:
+            while not self.stopping:
+                free = self.concurrency - len(in_flight)
+                if self.max_tasks:
+                    free = min(free, self.max_tasks - self.claimed)
+                tasks = await self._claim(free) if free > 0 else []
+                self.claimed += len(tasks)
+                in_flight.update(asyncio.create_task(self._run_task(task)) for task in tasks)
+                if self.max_tasks and self.claimed >= self.max_tasks:
+                    break
+                if not in_flight:
+                    if self.drain:
+                        break
+                    await asyncio.sleep(self.poll_interval)
+                elif not tasks or len(in_flight) >= self.concurrency:
+                    _, in_flight = await asyncio.wait(in_flight, timeout=self.poll_interval,
+                                                      return_when=asyncio.FIRST_COMPLETED)
+            if in_flight:
+                await asyncio.wait(in_flight)
+        finally:
+            heartbeats.cancel()
+            try:
+                async with self.session_factory() as db:
+                    await ocr_queue.release(db, self.worker_id)
+            except Exception as e:
+                logger.warning(f"Could not release OCR tasks: {type(e).__name__}: {e}")
+            self._executor.shutdown(wait=False)
+        logger.info(f"OCR worker {self.worker_id} stopped: {self.completed} done, {self.failed} failed")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Run OCR tasks from the queue (OCR_BROKER mode)")
+    arg_parser.add_argument("--concurrency", type=int, default=OCR_WORKER_CONCURRENCY, help="OCR threads")
+    arg_parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between claims when idle")
+    arg_parser.add_argument("--max-tasks", type=int, default=0, help="exit after this many tasks (0 = never)")
+    arg_parser.add_argument("--drain", action="store_true", help="exit once no task is ready")
+    arg_parser.add_argument("--handler", help="module:function to OCR with instead of the OCR service")
+    arg_parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = arg_parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    worker = QueueWorker(
+        concurrency=args.concurrency, handler=load_handler(args.handler) if args.handler else _registry_ocr,
+        poll_interval=args.poll_interval, max_tasks=args.max_tasks, drain=args.drain,
+    )
+
+    async def serve() -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, worker.stop)
+        try:
+            await worker.run()
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
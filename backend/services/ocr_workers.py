@@ -0,0 +1,276 @@
+"""
+OCR in dedicated worker processes.
+
+Under the pre-fork server (services/prefork.py) the master loads the OCR stack
+once and forks OCR_WORKERS processes that run it. API workers don't OCR in
+their own threadpool; they hand images to the OCR workers through a shared job
+queue, and each API worker slot reads its results from its own pipe.
+
+    pool = OCRWorkerPool(api_slots=4, workers=2)   # in the master, before forking
+    pool.start()
+    registry.provide("ocr", pool.client(slot))     # in the API worker for `slot`
+
+Results are written without a lock: each reply is cut into records of at
+most PIPE_BUF bytes, which the OS writes to a pipe atomically, so records
+from different OCR workers never interleave mid-record and a worker killed
+mid-reply (even by SIGKILL) leaves at most an unfinished reply, whose request
+times out after OCR_TIMEOUT. The job channel's locks are only held while a
+message is being written or read, never while idle; a process killed
+outright inside that window would leave the channel locked until the server
+restarts. Each result pipe has a single reader; a replacement API worker in
+the same slot drops results addressed to the old process. OCR workers exit after OCR_WORKER_MAX_JOBS jobs (0 = never) and the
+master starts new ones.
+
+Images travel through shared memory (services/shared_frames.py): the job
+carries a small Frame descriptor and the OCR worker reads the image in
+place. OCR_SHM_SLOTS=0 sends them pickled through the job channel instead.
+"""
+
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import threading
+from multiprocessing.connection import Connection, wait
+from select import PIPE_BUF
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.shared_frames import OCR_SHM_SLOTS, OCR_SHM_SLOT_MB, Frame, FrameRing
+
+logger = logging.getLogger(__name__)
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+OCR_WORKER_MAX_JOBS = int(os.getenv("OCR_WORKER_MAX_JOBS", "500"))
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "120"))
+
+# Payload bytes per result record; the rest of PIPE_BUF covers the record's
+# framing and the Connection length header, so each record is one atomic write
+RESULT_RECORD_BYTES = PIPE_BUF - 256
+
+Handler = Callable[[Any], str]
+
+
+class Channel:
+    """Many-writer, many-reader pipe for picklable messages."""
+
+    def __init__(self, ctx):
+        self._reader, self._writer = ctx.Pipe(duplex=False)
+        self._read_lock = ctx.Lock()
+        self._write_lock = ctx.Lock()
+
+    def put(self, message: Any) -> None:
+        with self._write_lock:
+            self._writer.send(message)
+
+    def get(self, timeout: float = 1.0) -> Any:
+        """Next message, or raises TimeoutError. Waits without holding the read lock."""
+        if wait([self._reader], timeout) and self._read_lock.acquire(timeout=timeout):
+            try:
+                # Another reader may have taken it between wait() and acquire()
+                if self._reader.poll(0):
+                    return self._reader.recv()
+            finally:
+                self._read_lock.release()
+        raise TimeoutError
+
+    def close(self) -> None:
+        self._reader.close()
+        self._writer.close()
+
+
+def _default_handler() -> Handler:
+    from services.registry import registry
+
+    return registry.get("ocr").extract_text_from_image
+
+
+def _run(handler: Handler, frames: Optional[FrameRing], payload: Any, options: Dict[str, Any]) -> str:
+    if isinstance(payload, Frame):
+        with frames.open(payload) as image:
+            return handler(image, **options)
+    return handler(payload, **options)
+
+
+def _send_result(conn: Connection, job_id: Any, text: Optional[str], error: Optional[str]) -> None:
+    """Write (text, error) as records (job_id, more, piece); the last one has more=False."""
+    data = pickle.dumps((text, error))
+    pieces = [data[i:i + RESULT_RECORD_BYTES] for i in range(0, len(data), RESULT_RECORD_BYTES)]
+    for n, piece in enumerate(pieces, 1):
+        conn.send((job_id, n < len(pieces), piece))
+
+
+def _work(jobs: Channel, results: List[Connection], frames: Optional[FrameRing], max_jobs: int,
+          handler: Optional[Handler]) -> None:
+    # The master coordinates shutdown (sentinels on the job queue); Ctrl-C goes to the whole group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    handler = handler or _default_handler()
+    done = 0
+    while not max_jobs or done < max_jobs:
+        try:
+            job = jobs.get()
+        except TimeoutError:
+            continue
+        if job is None:
+            break
+        slot, job_id, payload, options = job
+        try:
+            text, error = _run(handler, frames, payload, options), None
+        except Exception as e:
+            text, error = None, f"{type(e).__name__}: {e}"
+        _send_result(results[slot], job_id, text, error)
+        done += 1
+
+
+class OCRClient:
+    """OCRService stand-in for an API worker; OCR runs in the worker pool."""
+
+    def __init__(self, jobs, results, slot: int, timeout: float = OCR_TIMEOUT, frames: Optional[FrameRing] = None):
+        self._jobs = jobs
+        self.slot = slot
+        self.frames = frames
+        self._results = results
+        self.timeout = timeout
+        self._ids = itertools.count()
+        self._pending: Dict[Tuple[int, int], Future] = {}
+        self._partial: Dict[Tuple[int, int], List[bytes]] = {}  # records of results still arriving
+        self._lock = threading.Lock()
+        self._reader: Optional[threading.Thread] = None
+        self._reader_pid: Optional[int] = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def _ensure_reader(self) -> None:
+        # Started lazily (and again after a fork) so the master never runs it
+        if self._reader_pid != os.getpid():
+            self._reader_pid = os.getpid()
+            self._reader = threading.Thread(target=self._read, name="ocr-results", daemon=True)
+            self._reader.start()
+
+    def _read(self) -> None:
+        while True:
+            try:
+                job_id, more, piece = self._results.recv()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                self._partial.setdefault(job_id, []).append(piece)
+                if more:
+                    continue
+                data = b"".join(self._partial.pop(job_id))
+                future = self._pending.pop(job_id, None)
+            if future is None:
+                continue  # timed out, or addressed to this slot's previous process
+            text, error = pickle.loads(data)
+            if error is None:
+                future.set_result(text)
+            else:
+                future.set_exception(RuntimeError(f"OCR worker failed: {error}"))
+
+    def submit(self, img: Any, **options: Any) -> Future:
+        """Queue one image; options (e.g. mode) are passed on to the OCR call."""
+        with self._lock:
+            self._ensure_reader()
+            job_id = (os.getpid(), next(self._ids))
+            future: Future = Future()
+            self._pending[job_id] = future
+        future.job_id = job_id
+        frame = self.frames.put(img) if self.frames is not None else None
+        try:
+            self._jobs.put((self.slot, job_id, frame or img, options))
+        except BaseException:
+            if frame is not None:
+                self.frames.release(frame)
+            raise
+        return future
+
+    def _wait(self, future: Future) -> str:
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._pending.pop(future.job_id, None)
+                self._partial.pop(future.job_id, None)  # e.g. its OCR worker died mid-reply
+            raise TimeoutError(f"OCR did not finish within {self.timeout}s")
+
+    def extract_text_from_image(self, img: Any, **options: Any) -> str:
+        return self._wait(self.submit(img, **options))
+
+    def extract_texts_from_images(self, imgs: List[Any]) -> List[str]:
+        """Like OCRService's: one result per image, "" for failures; images run in parallel."""
+        futures = [self.submit(img) for img in imgs]
+        texts = []
+        for future in futures:
+            try:
+                texts.append(self._wait(future))
+            except Exception as e:
+                logger.error(f"Failed to process image: {e}")
+                texts.append("")
+        return texts
+
+
+class OCRWorkerPool:
+    def __init__(self, api_slots: int, workers: int = OCR_WORKERS, max_jobs: int = OCR_WORKER_MAX_JOBS,
+                 handler: Optional[Handler] = None, shm_slots: int = OCR_SHM_SLOTS,
+                 shm_slot_size: int = int(OCR_SHM_SLOT_MB * 1024 * 1024)):
+        self._ctx = multiprocessing.get_context("fork")
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.handler = handler
+        self.jobs = Channel(self._ctx)
+        self.frames = FrameRing(self._ctx, shm_slots, shm_slot_size) if shm_slots > 0 else None
+        pipes = [self._ctx.Pipe(duplex=False) for _ in range(api_slots)]
+        self._readers = [reader for reader, _ in pipes]
+        self._writers = [writer for _, writer in pipes]
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self.recycled = 0
+
+    def _spawn(self, index: int) -> None:
+        process = self._ctx.Process(
+            target=_work, args=(self.jobs, self._writers, self.frames, self.max_jobs, self.handler), name=f"ocr-worker-{index}",
+        )
+        process.start()
+        self.processes[index] = process
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def reap(self) -> int:
+        """Replace OCR workers that exited (recycled or crashed); returns how many were started."""
+        started = 0
+        for index, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                if process.exitcode != 0:
+                    logger.warning(f"OCR worker {process.pid} exited with code {process.exitcode}")
+                self.reclaim(process.pid)
+                self.recycled += 1
+                self._spawn(index)
+                started += 1
+        return started
+
+    def reclaim(self, pid: int) -> None:
+        """Free shared-memory slots still held by an exited worker (OCR or API)."""
+        if self.frames is not None and self.frames.reclaim(pid):
+            logger.warning(f"Reclaimed shared-memory frames held by exited worker {pid}")
+
+    def client(self, slot: int, timeout: float = OCR_TIMEOUT) -> OCRClient:
+        return OCRClient(self.jobs, self._readers[slot], slot, timeout, self.frames)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        for _ in self.processes:
+            self.jobs.put(None)
+        for process in self.processes:
+            if process is not None:
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+        self.jobs.close()
+        if self.frames is not None:
+            self.frames.close()
@@ -1,6 +1,19 @@
 import re
+from datetime import date, datetime
 from typing import Optional, Dict
 
+from services import metrics
+
+# Formats tried (in order) when normalizing a date string. Day-first wins for
+# ambiguous numeric dates since most receipts we see are Indian.
+_DATE_FORMATS = [
+    "%Y-%m-%d", "%Y/%m/%d",
+    "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y",
+    "%m/%d/%Y", "%m-%d-%Y",
+    "%d-%m-%y", "%d/%m/%y", "%m/%d/%y",
+    "%d %b %Y", "%d %B %Y", "%b %d %Y", "%B %d %Y", "%d-%b-%Y", "%d %b %y",
+]
+
 class ParserService:
     """
     A service to parse structured data (Total Amount, Date, Vendor) from OCR text.
@@ -13,7 +26,8 @@ class ParserService:
         """
         # More comprehensive patterns for amounts
         total_patterns = [
-            r"(?i)(total|grand total|amount due|amount|net amount|final amount)\s*[:\-]?\s*[₹$]?\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.\d{2})?)",
+            # (?!\d) stops "4872.81" matching as "487" here; the next pattern takes it
+            r"(?i)(total|grand total|amount due|amount|net amount|final amount)\s*[:\-]?\s*[₹$]?\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.\d{2})?)(?!\d)",
             r"(?i)(total|grand total|amount due|amount|net amount|final amount)\s*[:\-]?\s*[₹$]?\s*([0-9]+(?:\.\d{2})?)",
             r"[₹$]\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.\d{2})?)",  # Just currency symbol followed by number
             r"([0-9]{1,3}(?:,[0-9]{3})*(?:\.\d{2})?)\s*[₹$]",  # Number followed by currency
@@ -33,6 +47,17 @@ class ParserService:
                     continue
         return None
 
+    def normalize_amount(self, amount_str: Optional[str]) -> Optional[float]:
+        """
+        Convert an extracted amount such as "1,234.50" into a float.
+        """
+        if not amount_str:
+            return None
+        try:
+            return float(re.sub(r"[^0-9.]", "", amount_str))
+        except ValueError:
+            return None
+
     def extract_date(self, ocr_text: str) -> Optional[str]:
         """
         Extract the date from the OCR text using regular expressions.
@@ -55,6 +80,25 @@ class ParserService:
                     return date_str
         return None
 
+    def normalize_date(self, date_str: Optional[str]) -> Optional[date]:
+        """
+        Normalize a free-form date string (as typed by users or extracted by OCR)
+        into a date. Returns None if the string can't be interpreted.
+        """
+        if not date_str:
+            return None
+        cleaned = re.sub(r"\s+", " ", date_str.strip().replace(",", " ")).strip()
+        # Drop a trailing time component such as "2025-08-31T10:00:00" or "31/08/2025 12:45"
+        cleaned = re.split(r"[T ](?=\d{1,2}:\d{2})", cleaned)[0]
+        for fmt in _DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(cleaned, fmt).date()
+            except ValueError:
+                continue
+            if 1900 <= parsed.year <= 2100:
+                return parsed
+        return None
+
     def extract_vendor(self, ocr_text: str) -> Optional[str]:
         """
         Extract the vendor name from the OCR text.
@@ -99,11 +143,12 @@ class ParserService:
         """
         Parse the OCR text to extract structured data.
         """
-        return {
-            "total": self.extract_total(ocr_text),
-            "date": self.extract_date(ocr_text),
-            "vendor": self.extract_vendor(ocr_text),
-        }
+        with metrics.parse_timer():
+            return {
+                "total": self.extract_total(ocr_text),
+                "date": self.extract_date(ocr_text),
+                "vendor": self.extract_vendor(ocr_text),
+            }
 
 # Example usage
 if __name__ == "__main__":
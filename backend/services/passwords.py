@@ -0,0 +1,82 @@
+"""
+Password hashing off the event loop.
+
+bcrypt takes hundreds of milliseconds per hash by design. Running it in
+Starlette's shared threadpool lets a login storm starve every other sync
+route and threadpool call (OCR, file I/O). Instead, hashing gets its own small
+pool (PASSWORD_HASH_WORKERS). Admission control caps the work queued for that
+pool (PASSWORD_HASH_MAX_PENDING): excess requests fail fast with
+HashingBusy, and the auth routes turn that into a 503 with Retry-After. This
+keeps the latency of admitted requests bounded instead of letting the queue
+grow.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from passlib.context import CryptContext
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+
+T = TypeVar("T")
+
+
+class HashingBusy(Exception):
+    """Too many password hashes are already queued."""
+
+
+class PasswordHasher:
+    def __init__(self, context: CryptContext, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dummy_hash: Optional[str] = None
+
+    def _submit(self, fn: Callable[..., T], *args) -> "asyncio.Future[T]":
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise HashingBusy("Too many sign-in attempts in progress")
+            self.pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            executor = self._executor
+        try:
+            future = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BaseException:
+            # e.g. RuntimeError from an executor shut down meanwhile; the slot was never used
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: Optional[str]) -> bool:
+        """
+        Check a password. With hashed=None (unknown user) a dummy hash is still
+        verified, so the response time doesn't reveal whether the account exists.
+        """
+        if hashed is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = await self._submit(self.context.hash, "not-a-real-password")
+            await self._submit(self.context.verify, password, self._dummy_hash)
+            return False
+        return await self._submit(self.context.verify, password, hashed)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,172 @@
+"""
+Pre-fork server: load once, fork the workers.
+
+`uvicorn --workers N` starts N fresh interpreters that each import OpenCV,
+numpy, pytesseract and pandas again. This master imports the app and warms up
+the heavy services (services/registry.py) before forking, so the workers share
+those pages copy-on-write instead of holding a copy each:
+
+    python -m services.prefork --host 0.0.0.0 --port 8000 --api-workers 4 --ocr-workers 2
+
+- API_WORKERS uvicorn workers accept on one shared socket.
+- OCR_WORKERS processes run OCR for them (services/ocr_workers.py); with
+  --ocr-workers 0 each API worker OCRs in its own threadpool as before.
+- An API worker exits after API_WORKER_MAX_REQUESTS requests (plus up to
+  API_WORKER_MAX_REQUESTS_JITTER, so they don't all restart at once), and an
+  OCR worker exits after OCR_WORKER_MAX_JOBS images. The master replaces them,
+  which bounds memory growth from fragmentation or leaks in native code.
+
+SIGTERM or SIGINT shuts the workers down gracefully. Startup hooks (DB tables,
+key prefetch, retention sweeper) run in each API worker, not in the master.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import time
+from typing import List, Optional
+
+from services import ocr_workers
+
+logger = logging.getLogger(__name__)
+
+API_WORKERS = int(os.getenv("API_WORKERS", "2"))
+API_WORKER_MAX_REQUESTS = int(os.getenv("API_WORKER_MAX_REQUESTS", "1000"))
+API_WORKER_MAX_REQUESTS_JITTER = int(os.getenv("API_WORKER_MAX_REQUESTS_JITTER", "100"))
+PREFORK_WARM_UP = [s.strip() for s in os.getenv("PREFORK_WARM_UP", "ocr,compliance").split(",") if s.strip()]
+
+_SHUTDOWN_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+
+
+def _serve(app, sock: socket.socket, slot: int, pool: Optional[ocr_workers.OCRWorkerPool],
+           max_requests: int, log_level: str) -> None:
+    # Drop the master's handlers inherited through fork (uvicorn installs its own), then
+    # take the signals the master blocked around the fork
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, _SHUTDOWN_SIGNALS)
+    import uvicorn
+
+    from services.registry import registry
+
+    if pool is not None:
+        registry.provide("ocr", pool.client(slot))
+    config = uvicorn.Config(app, log_level=log_level, limit_max_requests=max_requests or None)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class PreforkServer:
+    def __init__(self, app, sock: socket.socket, api_workers: int = API_WORKERS,
+                 ocr_worker_count: int = ocr_workers.OCR_WORKERS, max_requests: int = API_WORKER_MAX_REQUESTS,
+                 max_requests_jitter: int = API_WORKER_MAX_REQUESTS_JITTER,
+                 ocr_max_jobs: int = ocr_workers.OCR_WORKER_MAX_JOBS, log_level: str = "info"):
+        self._ctx = multiprocessing.get_context("fork")
+        self.app = app
+        self.sock = sock
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.log_level = log_level
+        self.pool = None
+        if ocr_worker_count > 0:
+            self.pool = ocr_workers.OCRWorkerPool(api_workers, ocr_worker_count, ocr_max_jobs)
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * api_workers
+        self.stopping = False
+
+    def _spawn(self, slot: int) -> None:
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests else 0
+        process = self._ctx.Process(
+            target=_serve, args=(self.app, self.sock, slot, self.pool, limit, self.log_level), name=f"api-worker-{slot}",
+        )
+        # A SIGTERM landing between fork and _serve() would otherwise run the master's handler in the child
+        signal.pthread_sigmask(signal.SIG_BLOCK, _SHUTDOWN_SIGNALS)
+        try:
+            process.start()
+        finally:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, _SHUTDOWN_SIGNALS)
+        self.processes[slot] = process
+
+    def reap(self) -> int:
+        """Replace exited API and OCR workers; returns how many were started."""
+        started = self.pool.reap() if self.pool is not None else 0
+        for slot, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                if process.exitcode != 0:
+                    logger.warning(f"API worker {process.pid} exited with code {process.exitcode}")
+                if self.pool is not None:
+                    self.pool.reclaim(process.pid)
+                self._spawn(slot)
+                started += 1
+        return started
+
+    def stop(self, *_args) -> None:
+        self.stopping = True
+
+    def run(self, poll_interval: float = 0.5) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        if self.pool is not None:
+            self.pool.start()
+        for slot in range(len(self.processes)):
+            self._spawn(slot)
+        logger.info(f"Serving with {len(self.processes)} API and {self.pool.workers if self.pool else 0} OCR workers")
+        while not self.stopping:
+            time.sleep(poll_interval)
+            if not self.stopping:
+                self.reap()
+        self.shutdown()
+
+    def shutdown(self, timeout: float = 30.0) -> None:
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()  # SIGTERM: uvicorn finishes in-flight requests
+        for process in self.processes:
+            if process is not None:
+                process.join(timeout)
+                if process.is_alive():
+                    process.kill()
+        if self.pool is not None:
+            self.pool.stop()
+        self.sock.close()
+
+
+def bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Serve the API from pre-forked workers")
+    arg_parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    arg_parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    arg_parser.add_argument("--api-workers", type=int, default=API_WORKERS)
+    arg_parser.add_argument("--ocr-workers", type=int, default=ocr_workers.OCR_WORKERS)
+    arg_parser.add_argument("--max-requests", type=int, default=API_WORKER_MAX_REQUESTS, help="0 = never recycle")
+    arg_parser.add_argument("--max-requests-jitter", type=int, default=API_WORKER_MAX_REQUESTS_JITTER)
+    arg_parser.add_argument("--ocr-max-jobs", type=int, default=ocr_workers.OCR_WORKER_MAX_JOBS, help="0 = never recycle")
+    arg_parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = arg_parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    from main import app
+    from services.registry import registry
+
+    # Only imports and object construction here: no threads or connections may exist before fork
+    report = registry.warm_up(PREFORK_WARM_UP)
+    logger.info(f"Warmed up before fork: {report}")
+    PreforkServer(
+        app, bind(args.host, args.port), args.api_workers, args.ocr_workers, args.max_requests,
+        args.max_requests_jitter, args.ocr_max_jobs, args.log_level,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+In-process sampling profiler for diagnosing a live worker.
+
+A background thread snapshots every thread's Python stack with
+sys._current_frames() at a fixed interval. The profiled code is left alone:
+there are no setprofile/settrace hooks, so a profile can be taken from a
+running uvicorn worker without restarting it. Stacks are aggregated and
+rendered either as collapsed stacks (flamegraph.pl / speedscope "collapsed"
+import) or as a speedscope JSON file.
+
+Overhead budget: the sampler times its own work, and if a sample costs more
+than `max_overhead` of the interval, the interval is stretched to fit. Only
+one profile runs at a time and durations are capped.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_MAX_OVERHEAD = float(os.getenv("PROFILE_MAX_OVERHEAD", "0.02"))  # fraction of wall time
+MIN_INTERVAL = 0.001
+MAX_INTERVAL = 0.5
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+Stack = Tuple[Frame, ...]     # root first
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already being taken in this process."""
+
+
+_active = threading.Lock()
+
+
+def _short_path(filename: str) -> str:
+    for marker in ("site-packages/", "dist-packages/", "backend/"):
+        idx = filename.rfind(marker)
+        if idx != -1:
+            return filename[idx + len(marker):]
+    return os.path.basename(filename)
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000, max_overhead: float = PROFILE_MAX_OVERHEAD):
+        self.interval = max(MIN_INTERVAL, interval)
+        self.max_overhead = max_overhead
+        self.counts: Counter = Counter()   # (thread name, stack) -> samples
+        self.weights: Counter = Counter()  # (thread name, stack) -> seconds represented
+        self.sample_seconds = 0.0
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        if not _active.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.stopped_at = time.perf_counter()
+            _active.release()
+        return self
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names: Dict[int, str] = {}
+        while not self._stop.wait(self.interval):
+            start = time.perf_counter()
+            frames = sys._current_frames()
+            if any(ident not in names for ident in frames):
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack: List[Frame] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                key = (names.get(ident, str(ident)), tuple(reversed(stack)))
+                self.counts[key] += 1
+                self.weights[key] += self.interval
+            del frames
+            cost = time.perf_counter() - start
+            self.sample_seconds += cost
+            # Keep sampling cost within the overhead budget by sampling less often
+            if cost > self.interval * self.max_overhead:
+                self.interval = min(MAX_INTERVAL, cost / self.max_overhead)
+
+    @property
+    def duration(self) -> float:
+        return (self.stopped_at or time.perf_counter()) - self.started_at
+
+    def stats(self) -> Dict[str, Any]:
+        duration = self.duration
+        return {
+            "duration": round(duration, 3),
+            "samples": sum(self.counts.values()),
+            "interval_ms": round(self.interval * 1000, 3),
+            "overhead": round(self.sample_seconds / duration, 4) if duration else 0.0,
+        }
+
+    def collapsed(self) -> str:
+        """One line per unique stack: `thread;file:func;file:func count`, root first."""
+        lines = []
+        for (thread, stack), count in self.counts.most_common():
+            frames = ";".join(f"{_short_path(f)}:{name}" for name, f, _ in stack)
+            lines.append(f"{thread};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str = "complicopilot") -> Dict[str, Any]:
+        """Speedscope file format: one sampled profile per thread, weights in seconds."""
+        frame_index: Dict[Frame, int] = {}
+        frames: List[Dict[str, Any]] = []
+        profiles: Dict[str, Dict[str, Any]] = {}
+        duration = self.duration
+        for (thread, stack), weight in self.weights.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": _short_path(frame[1]), "line": frame[2]})
+                indexes.append(frame_index[frame])
+            profile = profiles.setdefault(thread, {
+                "type": "sampled", "name": thread, "unit": "seconds",
+                "startValue": 0, "endValue": duration, "samples": [], "weights": [],
+            })
+            profile["samples"].append(indexes)
+            profile["weights"].append(weight)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "complicopilot-sampling-profiler",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        }
+
+
+def render(profiler: SamplingProfiler, fmt: str) -> Tuple[bytes, str]:
+    """Encode a finished profile; returns (body, media type)."""
+    if fmt == "speedscope":
+        return json.dumps(profiler.speedscope()).encode(), "application/json"
+    return profiler.collapsed().encode(), "text/plain; charset=utf-8"
@@ -0,0 +1,113 @@
+"""
+Lazily loaded heavy services.
+
+Importing the OCR stack (OpenCV, numpy, pytesseract, which pulls in pandas),
+pandas for exports, and initializing the Firebase app together take longer
+than starting the rest of the API. Routes reach them through this registry,
+so they load on first use, or earlier through warm_up_in_background(), which
+the app starts once it is serving (WARM_UP_ON_STARTUP, default true). Health
+checks and other light routes never wait for them.
+
+    from services.registry import ocr_service   # proxy; loads services.ocr on first attribute access
+    registry.get("compliance").generate_csv_from_batch(rows)
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "true").lower() == "true"
+
+
+class ServiceRegistry:
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._load_ms: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self._load_ms[name] = round((time.perf_counter() - start) * 1000, 2)
+                logger.info(f"Loaded service {name} in {self._load_ms[name]}ms")
+            return self._instances[name]
+
+    def provide(self, name: str, instance: Any) -> None:
+        """Use an already built instance (e.g. a pre-fork worker's OCR client) instead of the factory."""
+        with self._lock:
+            self._instances[name] = instance
+            self._load_ms[name] = 0.0
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def proxy(self, name: str) -> "LazyProxy":
+        return LazyProxy(self, name)
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, Optional[float]]:
+        """Load services now; failures are logged, not raised. Returns load times in ms."""
+        for name in list(names or self._factories):
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning(f"Warm-up of {name} failed: {e}")
+        return self.report()
+
+    def warm_up_in_background(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        thread = threading.Thread(target=self.warm_up, args=(names,), name="service-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def report(self) -> Dict[str, Optional[float]]:
+        """Load time in ms per registered service (None if not loaded yet)."""
+        return {name: self._load_ms.get(name) for name in self._factories}
+
+
+class LazyProxy:
+    """Stands in for a registered service; the first attribute access loads it."""
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: ServiceRegistry, name: str):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._registry.get(self._name), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._registry.is_loaded(self._name) else "not loaded"
+        return f"<lazy {self._name} ({state})>"
+
+
+def _module_attr(module: str, attr: Optional[str] = None, preload: Iterable[str] = ()) -> Callable[[], Any]:
+    def load() -> Any:
+        # preload: modules the service imports lazily itself, pulled in here so warm-up covers them
+        for name in preload:
+            importlib.import_module(name)
+        loaded = importlib.import_module(module)
+        return getattr(loaded, attr) if attr else loaded
+    return load
+
+
+registry = ServiceRegistry()
+registry.register("ocr", _module_attr("services.ocr", "ocr_service"))
+registry.register("compliance", _module_attr("services.compliance", preload=("pandas",)))
+registry.register("firebase", lambda: importlib.import_module("services.firebase_admin").get_app())
+
+ocr_service = registry.proxy("ocr")
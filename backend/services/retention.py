@@ -0,0 +1,200 @@
+"""
+Storage retention and garbage collection.
+
+A low-priority sweeper that keeps disk use bounded on long-running nodes:
+- blobs whose reference count has been zero for BLOB_ORPHAN_GRACE_HOURS
+  (deleted receipts, batch-only uploads) are removed with their derivatives
+- stored files with no `blobs` row (crashed uploads) are removed after the same grace
+- abandoned upload staging files and batch CSV exports are removed after TEMP_MAX_AGE_SECONDS
+- receipts in a status with a retention policy are deleted once older than the
+  policy allows, e.g. RETENTION_POLICIES="rejected:30,needs_review:365" (days)
+
+Work is done in batches of RETENTION_BATCH_SIZE with a pause between them, and
+file I/O runs in the threadpool, so a sweep never hogs the event loop. The app
+runs a sweep every RETENTION_SWEEP_INTERVAL seconds (0 disables); run one by hand
+with `python -m services.retention`.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from starlette.concurrency import run_in_threadpool
+
+from models.entities import Blob, Receipt
+from services import blobstore, derivatives, summaries
+from services.blobstore import BlobBackend, get_blob_backend
+from services.compliance import EXPORT_DIR
+
+logger = logging.getLogger(__name__)
+
+RETENTION_SWEEP_INTERVAL = int(os.getenv("RETENTION_SWEEP_INTERVAL", "3600"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+RETENTION_BATCH_PAUSE = float(os.getenv("RETENTION_BATCH_PAUSE", "0.5"))  # seconds between batches
+BLOB_ORPHAN_GRACE_HOURS = float(os.getenv("BLOB_ORPHAN_GRACE_HOURS", "24"))
+TEMP_MAX_AGE_SECONDS = int(os.getenv("TEMP_MAX_AGE_SECONDS", "3600"))
+
+
+def parse_policies(spec: Optional[str]) -> Dict[str, int]:
+    """Parse "status:days,status:days" into {status: days}."""
+    policies: Dict[str, int] = {}
+    for part in (spec or "").split(","):
+        if ":" not in part:
+            continue
+        status, days = part.split(":", 1)
+        try:
+            policies[status.strip()] = int(days)
+        except ValueError:
+            logger.warning(f"Ignoring invalid retention policy: {part!r}")
+    return policies
+
+
+RETENTION_POLICIES = parse_policies(os.getenv("RETENTION_POLICIES"))
+
+
+class Sweeper:
+    """One configured sweeper; sweep_once() runs every stage and returns counts."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        backend: Optional[BlobBackend] = None,
+        policies: Optional[Dict[str, int]] = None,
+        batch_size: int = RETENTION_BATCH_SIZE,
+        batch_pause: float = RETENTION_BATCH_PAUSE,
+        orphan_grace: timedelta = timedelta(hours=BLOB_ORPHAN_GRACE_HOURS),
+        temp_max_age: float = TEMP_MAX_AGE_SECONDS,
+        export_dir: str = EXPORT_DIR,
+    ):
+        self.session_factory = session_factory
+        self.backend = backend or get_blob_backend()
+        self.policies = RETENTION_POLICIES if policies is None else policies
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.orphan_grace = orphan_grace
+        self.temp_max_age = temp_max_age
+        self.export_dir = Path(export_dir)
+
+    async def sweep_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        now = now or datetime.utcnow()
+        counts = {"receipts": 0, "blobs": 0, "untracked_files": 0, "temp_files": 0}
+        for status, days in self.policies.items():
+            counts["receipts"] += await self.expire_receipts(status, now - timedelta(days=days))
+        counts["blobs"] = await self.delete_unreferenced_blobs(now - self.orphan_grace)
+        counts["untracked_files"] = await self.delete_untracked_files(now - self.orphan_grace)
+        counts["temp_files"] = await run_in_threadpool(self.delete_temp_files)
+        logger.info(f"Retention sweep: {counts}")
+        return counts
+
+    async def _pause(self) -> None:
+        await asyncio.sleep(self.batch_pause)
+
+    async def expire_receipts(self, status: str, cutoff: datetime) -> int:
+        """Delete receipts in `status` created before `cutoff`, keeping rollups and blob refs in step."""
+        deleted = 0
+        while True:
+            async with self.session_factory() as db:
+                stmt = (
+                    sa.select(Receipt)
+                    .where(Receipt.status == status, Receipt.created_at < cutoff)
+                    .options(selectinload(Receipt.issues))
+                    .limit(self.batch_size)
+                )
+                rows = (await db.execute(stmt)).scalars().all()
+                if not rows:
+                    return deleted
+                for obj in rows:
+                    await db.delete(obj)
+                    await blobstore.release(db, obj.blob_sha256)
+                    await summaries.apply_change(db, summaries.snapshot(obj), None)
+                await db.commit()
+            deleted += len(rows)
+            await self._pause()
+
+    async def delete_unreferenced_blobs(self, cutoff: datetime) -> int:
+        """Remove blobs that have had no references since before `cutoff`."""
+        deleted = 0
+        last_sha = ""
+        while True:
+            async with self.session_factory() as db:
+                stmt = (
+                    sa.select(Blob.sha256)
+                    .where(Blob.ref_count <= 0, Blob.updated_at < cutoff, Blob.sha256 > last_sha)
+                    .order_by(Blob.sha256)
+                    .limit(self.batch_size)
+                )
+                candidates = list((await db.execute(stmt)).scalars().all())
+                if not candidates:
+                    return deleted
+                last_sha = candidates[-1]
+                # Re-check the condition in the DELETE so a blob referenced meanwhile survives
+                result = await db.execute(
+                    sa.delete(Blob)
+                    .where(Blob.sha256.in_(candidates), Blob.ref_count <= 0)
+                    .returning(Blob.sha256)
+                )
+                gone = list(result.scalars().all())
+                await db.commit()
+            await run_in_threadpool(self._delete_files, gone)
+            deleted += len(gone)
+            await self._pause()
+
+    async def delete_untracked_files(self, cutoff: datetime) -> int:
+        """Remove stored files that no `blobs` row knows about (e.g. an upload that crashed mid-way)."""
+        deleted = 0
+        keys = await run_in_threadpool(lambda: list(self.backend.iter_keys()))
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            async with self.session_factory() as db:
+                known = set((await db.execute(sa.select(Blob.sha256).where(Blob.sha256.in_(batch)))).scalars().all())
+            untracked = await run_in_threadpool(self._delete_untracked, batch, known, cutoff)
+            deleted += len(untracked)
+            await self._pause()
+        return deleted
+
+    def delete_temp_files(self) -> int:
+        removed = self.backend.clean_staging(self.temp_max_age)
+        if self.export_dir.is_dir():
+            removed += blobstore._remove_older_than(self.export_dir.glob("*.csv"), self.temp_max_age)
+        return removed
+
+    def _delete_untracked(self, batch: List[str], known: Set[str], cutoff: datetime) -> List[str]:
+        # modified_at is a HEAD request per key on S3, so this stays off the event loop
+        untracked = [sha for sha in batch if sha not in known and (self.backend.modified_at(sha) or cutoff) < cutoff]
+        self._delete_files(untracked)
+        return untracked
+
+    def _delete_files(self, shas: List[str]) -> None:
+        for sha in shas:
+            self.backend.delete(sha)
+            self.backend.delete_derivatives(sha, derivatives.GENERATORS)
+
+
+async def run_periodically(sweeper: Sweeper, interval: float = RETENTION_SWEEP_INTERVAL) -> None:
+    """Background loop started by the app; errors are logged and the loop carries on."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sweeper.sweep_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Retention sweep failed: {e}")
+
+
+def main() -> None:
+    from database.session import AsyncSessionLocal
+
+    counts: Dict[str, Any] = asyncio.run(Sweeper(AsyncSessionLocal, batch_pause=0).sweep_once())
+    print(counts)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
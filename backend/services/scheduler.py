@@ -0,0 +1,218 @@
+"""
+Priority-aware OCR scheduler.
+
+Admission control (services/admission.py) decides whether a request gets in;
+this decides which admitted image is OCR'd next. Routes submit single images
+instead of running OCR in Starlette's threadpool, and OCR_SCHEDULER_WORKERS
+threads take jobs in this order:
+
+- Priority class first: INTERACTIVE (someone is waiting on upload.html), then
+  BULK (batch uploads), then BACKGROUND (overnight reprocessing). Lower
+  classes only run when nothing above them is queued, so they use idle CPU.
+- Within a class, tenants take turns (round robin), so one user's 200-image
+  batch doesn't queue everyone else's behind it. A job whose deadline is at
+  risk goes first regardless of whose turn it is.
+- Each job may carry a deadline. If the full three-pipeline search is not
+  expected to finish in time, the job runs in FAST mode (one pipeline);
+  expected durations are moving averages of recent jobs in each mode.
+
+Batches are split into one job per image, so interactive uploads can run in
+between a batch's images instead of waiting for the whole batch. The OCR
+backend is looked up in the registry when a job runs: the in-process
+OCRService, or the OCR worker pool's client under the pre-fork server.
+Worker threads start with the first job, so none exist in a pre-fork master.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OCR_SCHEDULER_WORKERS = int(os.getenv("OCR_SCHEDULER_WORKERS", os.getenv("OCR_CONCURRENCY", str(os.cpu_count() or 2))))
+OCR_DEADLINE_INTERACTIVE = float(os.getenv("OCR_DEADLINE_INTERACTIVE", "8"))
+OCR_DEADLINE_BULK = float(os.getenv("OCR_DEADLINE_BULK", "0"))  # 0 = no deadline
+
+# Mode names as in services.ocr (not imported: that would load OpenCV)
+FULL = "full"
+FAST = "fast"
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BULK = 1
+    BACKGROUND = 2
+
+
+DEFAULT_DEADLINES = {Priority.INTERACTIVE: OCR_DEADLINE_INTERACTIVE, Priority.BULK: OCR_DEADLINE_BULK}
+
+
+@dataclass
+class Job:
+    image: Any
+    priority: Priority
+    tenant: str
+    deadline: Optional[float]  # clock() time, None = whenever
+    submitted: float
+    future: Future = field(default_factory=Future)
+    mode: str = FULL
+
+
+def _default_service() -> Any:
+    from services.registry import registry
+
+    return registry.get("ocr")
+
+
+class OCRScheduler:
+    def __init__(self, workers: int = OCR_SCHEDULER_WORKERS, service: Callable[[], Any] = _default_service,
+                 clock: Callable[[], float] = time.monotonic):
+        self.workers = workers
+        self._service = service
+        self.clock = clock
+        # Per class: tenant -> that tenant's queued jobs, plus the order tenants take turns in
+        self._queues: Dict[Priority, Dict[str, Deque[Job]]] = {p: {} for p in Priority}
+        self._turns: Dict[Priority, Deque[str]] = {p: deque() for p in Priority}
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._generation = 0  # bumped by shutdown(); threads of older generations exit when idle
+        # Seconds per image in each mode (moving averages), for deadline decisions
+        self.estimates = {FULL: 3.0, FAST: 1.0}
+        self.degraded = 0
+        self.completed = 0
+
+    def _ensure_workers(self) -> None:
+        if len(self._threads) < self.workers:
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(
+                    target=self._work, args=(self._generation,), name=f"ocr-scheduler-{i}", daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, image: Any, priority: Priority = Priority.INTERACTIVE, tenant: str = "",
+               deadline: Optional[float] = None) -> Future:
+        """
+        Queue one image. `deadline` is in seconds from now (None uses the class
+        default, 0 means none). Returns a Future for the OCR text.
+        """
+        now = self.clock()
+        if deadline is None:
+            deadline = DEFAULT_DEADLINES.get(priority, 0)
+        job = Job(image, priority, tenant, now + deadline if deadline else None, now)
+        with self._cond:
+            self._ensure_workers()
+            queue = self._queues[priority].get(tenant)
+            if queue is None:
+                queue = self._queues[priority][tenant] = deque()
+                self._turns[priority].append(tenant)
+            queue.append(job)
+            self._cond.notify()
+        return job.future
+
+    async def run(self, image: Any, priority: Priority = Priority.INTERACTIVE, tenant: str = "",
+                  deadline: Optional[float] = None) -> str:
+        return await asyncio.wrap_future(self.submit(image, priority, tenant, deadline))
+
+    async def run_many(self, images: List[Any], priority: Priority = Priority.BULK, tenant: str = "",
+                       deadline: Optional[float] = None) -> List[str]:
+        """Like OCRService.extract_texts_from_images: one text per image, "" for failures."""
+        futures = [asyncio.wrap_future(self.submit(image, priority, tenant, deadline)) for image in images]
+        texts = []
+        for result in await asyncio.gather(*futures, return_exceptions=True):
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to process image: {result}")
+                result = ""
+            texts.append(result)
+        return texts
+
+    def _pick(self) -> Optional[Job]:
+        """Next job (called with the lock held): highest class, at-risk deadlines, then tenant turns."""
+        now = self.clock()
+        for priority in Priority:
+            tenants = self._queues[priority]
+            if not tenants:
+                continue
+            at_risk = [
+                q[0] for q in tenants.values()
+                if q[0].deadline is not None and q[0].deadline - now < self.estimates[FULL]
+            ]
+            if at_risk:
+                tenant = min(at_risk, key=lambda job: job.deadline).tenant
+            else:
+                tenant = self._turns[priority][0]
+            queue = tenants[tenant]
+            job = queue.popleft()
+            turns = self._turns[priority]
+            turns.remove(tenant)
+            if queue:
+                turns.append(tenant)  # back of the line
+            else:
+                del tenants[tenant]
+            return job
+        return None
+
+    def _choose_mode(self, job: Job) -> str:
+        if job.deadline is not None and self.clock() + self.estimates[FULL] > job.deadline:
+            return FAST
+        return FULL
+
+    def _work(self, generation: int) -> None:
+        while True:
+            with self._cond:
+                job = self._pick()
+                while job is None:
+                    if generation != self._generation:
+                        return
+                    self._cond.wait()
+                    job = self._pick()
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            job.mode = self._choose_mode(job)
+            start = self.clock()
+            try:
+                service = self._service()
+                if job.mode == FULL:
+                    text = service.extract_text_from_image(job.image)
+                else:
+                    text = service.extract_text_from_image(job.image, mode=job.mode)
+            except BaseException as e:
+                job.future.set_exception(e)
+                continue
+            elapsed = self.clock() - start
+            with self._cond:
+                self.estimates[job.mode] = 0.8 * self.estimates[job.mode] + 0.2 * elapsed
+                self.completed += 1
+                if job.mode != FULL:
+                    self.degraded += 1
+            job.future.set_result(text)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queued": {p.name.lower(): sum(len(q) for q in self._queues[p].values()) for p in Priority},
+                "workers": self.workers,
+                "completed": self.completed,
+                "degraded": self.degraded,
+                "estimate_seconds": {mode: round(v, 3) for mode, v in self.estimates.items()},
+            }
+
+    def shutdown(self, wait: bool = True, timeout: Optional[float] = None) -> None:
+        """Let the worker threads exit once the queue is empty; a later submit() starts new ones."""
+        with self._cond:
+            threads, self._threads = self._threads, []
+            self._generation += 1
+            self._cond.notify_all()
+        if wait:
+            for thread in threads:
+                thread.join(timeout)
+
+
+ocr_scheduler = OCRScheduler()
@@ -0,0 +1,127 @@
+"""
+Shared-memory frames for the OCR worker pool.
+
+Sending an image to an OCR worker through a pipe pickles it, writes it
+through the kernel and unpickles a copy on the other side: several copies
+of a multi-megabyte frame per job. Instead, the pool's master creates one
+`multiprocessing.shared_memory` segment of OCR_SHM_SLOTS fixed-size slots
+(OCR_SHM_SLOT_MB each), which every forked worker maps. An API worker copies
+the image into a free slot once and sends a small Frame descriptor (segment,
+slot, shape, dtype); the OCR worker works on a view of the slot, with no
+copy, and frees the slot when it is done.
+
+Slots are handed out round-robin. Each slot records the pid of the process
+holding it and a generation number, so the master can reclaim slots held by
+a worker that died, and a descriptor for a reclaimed slot is rejected rather
+than read after the slot has been reused. Images that don't fit in a slot, or
+that arrive while every slot is busy, are sent inline as before.
+"""
+
+import os
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Any, Iterator, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+OCR_SHM_SLOTS = int(os.getenv("OCR_SHM_SLOTS", "4"))
+OCR_SHM_SLOT_MB = float(os.getenv("OCR_SHM_SLOT_MB", "10"))
+
+
+class Frame(NamedTuple):
+    segment: str
+    slot: int
+    generation: int
+    nbytes: int
+    shape: Optional[Tuple[int, ...]]  # None for encoded image bytes
+    dtype: Optional[str]
+
+
+class FrameRing:
+    def __init__(self, ctx, slots: int = OCR_SHM_SLOTS, slot_size: int = int(OCR_SHM_SLOT_MB * 1024 * 1024)):
+        self.slots = slots
+        self.slot_size = slot_size
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * slot_size)
+        self.name = self._shm.name
+        self._creator = os.getpid()
+        self._lock = ctx.Lock()
+        self._owner = ctx.RawArray("q", slots)  # pid holding the slot, 0 = free
+        self._generation = ctx.RawArray("q", slots)
+        self._cursor = ctx.RawValue("i", 0)
+
+    def _acquire(self) -> Tuple[Optional[int], int]:
+        with self._lock:
+            for i in range(self.slots):
+                slot = (self._cursor.value + i) % self.slots
+                if self._owner[slot] == 0:
+                    self._owner[slot] = os.getpid()
+                    self._generation[slot] += 1
+                    self._cursor.value = (slot + 1) % self.slots
+                    return slot, self._generation[slot]
+        return None, 0
+
+    def put(self, img: Any) -> Optional[Frame]:
+        """Copy an image (encoded bytes or array) into a free slot; None means send it inline."""
+        if isinstance(img, np.ndarray):
+            nbytes, shape, dtype = img.nbytes, img.shape, img.dtype.str
+        elif isinstance(img, (bytes, bytearray, memoryview)):
+            img = memoryview(img).cast("B")
+            nbytes, shape, dtype = img.nbytes, None, None
+        else:
+            return None
+        if nbytes > self.slot_size:
+            return None
+        slot, generation = self._acquire()
+        if slot is None:
+            return None
+        offset = slot * self.slot_size
+        if shape is None:
+            self._shm.buf[offset:offset + nbytes] = img
+        else:
+            np.ndarray(shape, dtype, buffer=self._shm.buf, offset=offset)[...] = img
+        return Frame(self.name, slot, generation, nbytes, shape, dtype)
+
+    @contextmanager
+    def open(self, frame: Frame) -> Iterator[Union[memoryview, np.ndarray]]:
+        """
+        Claim a frame for this process and yield a view of it (memoryview for
+        encoded bytes, ndarray otherwise). The slot is freed on exit, so the view
+        must not outlive the block. Raises LookupError if the slot was reclaimed.
+        """
+        with self._lock:
+            if self._generation[frame.slot] != frame.generation or self._owner[frame.slot] == 0:
+                raise LookupError(f"Frame in slot {frame.slot} was reclaimed")
+            self._owner[frame.slot] = os.getpid()
+        offset = frame.slot * self.slot_size
+        view = self._shm.buf[offset:offset + frame.nbytes]
+        try:
+            yield view if frame.shape is None else np.ndarray(frame.shape, frame.dtype, buffer=view)
+        finally:
+            try:
+                view.release()
+            except BufferError:
+                pass  # an array over it is still referenced; freed with it
+            self.release(frame)
+
+    def release(self, frame: Frame) -> None:
+        with self._lock:
+            if self._generation[frame.slot] == frame.generation:
+                self._owner[frame.slot] = 0
+
+    def reclaim(self, pid: int) -> int:
+        """Free the slots held by a process that exited; returns how many."""
+        freed = 0
+        with self._lock:
+            for slot in range(self.slots):
+                if self._owner[slot] == pid:
+                    self._owner[slot] = 0
+                    freed += 1
+        return freed
+
+    def in_use(self) -> int:
+        return sum(1 for slot in range(self.slots) if self._owner[slot])
+
+    def close(self) -> None:
+        self._shm.close()
+        if os.getpid() == self._creator:
+            self._shm.unlink()
@@ -5,16 +5,75 @@ This service will be responsible for:
 - Validating file type and size
 - Saving files to the uploads directory
 - Managing file paths and references
+
+Uploads go through UploadStream: chunks are hashed, size-checked and written
+to a staging file as they are read, the type is sniffed from the first bytes
+(the client's Content-Type is not trusted), and the file is committed to the
+content-addressed blob store (services.blobstore) only once it is complete.
+The bytes are kept so OCR can decode them directly instead of reading the
+file back. stream_upload() runs the staging writes and the commit (a PUT on
+S3) in the threadpool, so a slow store doesn't stall the event loop.
 """
 
-import os
+import hashlib
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Iterable, List, Tuple, Optional
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from services.blobstore import BlobBackend, get_blob_backend
 
 
-ALLOWED_MIME = {"image/jpeg", "image/png", "application/pdf"}
+ALLOWED_MIME = {"image/jpeg", "image/png", "image/tiff", "application/pdf"}
+IMAGE_MIME = {"image/jpeg", "image/png", "image/tiff"}
 MAX_SIZE_BYTES = 10 * 1024 * 1024  # 10MB
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes -> MIME type
+MAGIC_NUMBERS = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"%PDF-", "application/pdf"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+]
+SNIFF_BYTES = max(len(magic) for magic, _ in MAGIC_NUMBERS)
+
+
+class UploadRejected(ValueError):
+    """Raised while streaming an upload that fails validation."""
+
+    def __init__(self, code: str, message: str, status_code: int):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+
+
+@dataclass
+class StoredUpload:
+    filename: str
+    path: str  # blob location
+    mime_type: str
+    size: int
+    sha256: str
+    content: bytes
+    deduplicated: bool = False  # identical content was already stored
+
+
+def sniff_mime(head: bytes) -> Optional[str]:
+    """Identify a file type from its magic bytes."""
+    for magic, mime in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mime
+    return None
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    """Strip any directory components a client may have sent."""
+    name = Path((filename or "").replace("\\", "/")).name
+    return name or "upload"
 
 
 def validate_file(filename: str, mime_type: str, size: int) -> Tuple[bool, str]:
@@ -29,33 +88,127 @@ def validate_file(filename: str, mime_type: str, size: int) -> Tuple[bool, str]:
     return True, ""
 
 
-async def save_file(file: UploadFile, receipt_id: str, upload_dir: str) -> Tuple[str, str, int]:
+class UploadStream:
     """
-    Save an uploaded file to the uploads directory.
-    
-    This is a placeholder stub for Phase 1.1. Will be implemented in Phase 1.3.
-    
-    Args:
-        file: The uploaded file
-        receipt_id: The receipt ID used for creating a folder
-        upload_dir: The base upload directory path
-        
-    Returns:
-        Tuple containing (path, mime_type, size)
+    Incrementally validate, hash and persist a single upload.
+
+    Usage:
+        stream = UploadStream("r.png")
+        for chunk in chunks:
+            stream.write(chunk)      # raises UploadRejected as soon as a check fails
+        stored = stream.finish()
+    """
+
+    def __init__(
+        self,
+        filename: Optional[str],
+        backend: Optional[BlobBackend] = None,
+        max_size: int = MAX_SIZE_BYTES,
+        allowed: Iterable[str] = ALLOWED_MIME,
+    ):
+        self.filename = safe_filename(filename)
+        self.backend = backend or get_blob_backend()
+        self.max_size = max_size
+        self.allowed = set(allowed)
+        self.size = 0
+        self.mime_type: Optional[str] = None
+        self._hash = hashlib.sha256()
+        self._chunks: List[bytes] = []
+        self._head = b""
+        self._tmp_path = self.backend.staging_path()
+        self._fh = open(self._tmp_path, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            self.abort()
+            raise UploadRejected("FILE_TOO_LARGE", f"File too large (max {self.max_size // (1024 * 1024)}MB)", 413)
+        if self.mime_type is None:
+            self._head += chunk[:SNIFF_BYTES]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_type()
+        self._hash.update(chunk)
+        self._chunks.append(chunk)
+        self._fh.write(chunk)
+
+    def _check_type(self) -> None:
+        self.mime_type = sniff_mime(self._head) or "application/octet-stream"
+        if self.mime_type not in self.allowed:
+            self.abort()
+            raise UploadRejected("UNSUPPORTED_TYPE", f"Unsupported type: {self.mime_type}", 415)
+
+    def finish(self) -> StoredUpload:
+        if self.size == 0:
+            self.abort()
+            raise UploadRejected("EMPTY_FILE", "Uploaded file is empty", 400)
+        if self.mime_type is None:
+            self._check_type()
+        self._fh.close()
+        sha256 = self._hash.hexdigest()
+        created = self.backend.commit(self._tmp_path, sha256)
+        return StoredUpload(
+            filename=self.filename,
+            path=self.backend.location(sha256),
+            mime_type=self.mime_type,
+            size=self.size,
+            sha256=sha256,
+            content=b"".join(self._chunks),
+            deduplicated=not created,
+        )
+
+    def abort(self) -> None:
+        """Discard the partial file (safe to call more than once)."""
+        if not self._fh.closed:
+            self._fh.close()
+        self._tmp_path.unlink(missing_ok=True)
+        self._chunks = []
+
+
+async def stream_upload(
+    file: UploadFile,
+    backend: Optional[BlobBackend] = None,
+    max_size: int = MAX_SIZE_BYTES,
+    allowed: Iterable[str] = ALLOWED_MIME,
+    chunk_size: int = CHUNK_SIZE,
+) -> StoredUpload:
     """
-    # For Phase 1.1, we don't save anything, just return placeholders
-    return (
-        f"{upload_dir}/{receipt_id}/original{Path(file.filename).suffix}",
-        file.content_type or "application/octet-stream",
-        0  # Will be the actual file size in Phase 1.3
-    )
+    Read an UploadFile chunk by chunk through an UploadStream.
+
+    Raises:
+        UploadRejected: wrong type, empty, or larger than max_size
+    """
+    stream = UploadStream(file.filename, backend, max_size=max_size, allowed=allowed)
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            await run_in_threadpool(stream.write, chunk)
+        return await run_in_threadpool(stream.finish)
+    except BaseException:
+        stream.abort()
+        raise
 
 
-# Phase 1.2: implement disk storage under UPLOAD_DIR
-def save_file(bytes_data: bytes, dest_path: str) -> None:
+def save_file(
+    data: bytes,
+    filename: str,
+    backend: Optional[BlobBackend] = None,
+    allowed: Iterable[str] = ALLOWED_MIME,
+) -> StoredUpload:
     """
-    Save file bytes to dest_path. To be implemented in Phase 1.2.
+    Store in-memory file bytes (validated like an upload) in the blob store.
+
+    Raises:
+        UploadRejected: wrong type, empty, or larger than MAX_SIZE_BYTES
     """
-    # with open(dest_path, "wb") as f:
-    #     f.write(bytes_data)
-    raise NotImplementedError("Implement in Phase 1.2")
+    stream = UploadStream(filename, backend, allowed=allowed)
+    try:
+        for start in range(0, len(data), CHUNK_SIZE):
+            stream.write(data[start:start + CHUNK_SIZE])
+        return stream.finish()
+    except BaseException:
+        stream.abort()
+        raise
@@ -0,0 +1,170 @@
+"""
+Spend summaries (rollups) per vendor, category, month and GSTIN.
+
+Rows in receipt_summaries are adjusted incrementally in the same transaction
+as the receipt write, so reading a summary costs a handful of indexed rows no
+matter how many receipts a user has. rebuild_summaries() recomputes them from
+scratch (used by the migration and `python -m services.backfill summaries`).
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.entities import ReceiptSummary
+from services.backfill import DEFAULT_CHUNK_SIZE, iter_chunks
+
+DIMENSIONS = ("vendor", "category", "month", "gstin")
+UNKNOWN_KEY = "unknown"
+
+Delta = Dict[Tuple[str, str, str], List[float]]  # (owner_uid, dimension, key) -> [count, amount, tax]
+
+_receipts = sa.table(
+    "receipts",
+    sa.column("id", sa.String),
+    sa.column("owner_uid", sa.String),
+    sa.column("vendor", sa.String),
+    sa.column("category", sa.String),
+    sa.column("gstin", sa.String),
+    sa.column("receipt_date", sa.Date),
+    sa.column("amount", sa.Float),
+    sa.column("tax_amount", sa.Float),
+)
+
+
+def summary_keys(receipt: Any) -> Dict[str, str]:
+    """Map a receipt (ORM object or row) to its key in every dimension."""
+    receipt_date = getattr(receipt, "receipt_date", None)
+    return {
+        "vendor": (receipt.vendor or "").strip() or UNKNOWN_KEY,
+        "category": (receipt.category or "").strip() or "uncategorized",
+        "month": receipt_date.strftime("%Y-%m") if receipt_date else UNKNOWN_KEY,
+        "gstin": (receipt.gstin or "").strip() or UNKNOWN_KEY,
+    }
+
+
+def snapshot(receipt: Any) -> Dict[str, Any]:
+    """Capture the parts of a receipt that feed the rollups (call before mutating it)."""
+    return {
+        "owner_uid": getattr(receipt, "owner_uid", None) or "",
+        "keys": summary_keys(receipt),
+        "amount": float(receipt.amount or 0),
+        "tax": float(receipt.tax_amount or 0),
+    }
+
+
+def _accumulate(delta: Delta, snap: Dict[str, Any], sign: int) -> None:
+    for dimension, key in snap["keys"].items():
+        entry = delta.setdefault((snap["owner_uid"], dimension, key), [0, 0.0, 0.0])
+        entry[0] += sign
+        entry[1] += sign * snap["amount"]
+        entry[2] += sign * snap["tax"]
+
+
+def _upsert(dialect: str, owner_uid: str, dimension: str, key: str, count: float, amount: float, tax: float) -> sa.Executable:
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    t = ReceiptSummary.__table__
+    stmt = insert(t).values(
+        owner_uid=owner_uid, dimension=dimension, key=key, receipt_count=count, total_amount=amount, total_tax=tax,
+        updated_at=datetime.utcnow(),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[t.c.owner_uid, t.c.dimension, t.c.key],
+        set_={
+            "receipt_count": t.c.receipt_count + stmt.excluded.receipt_count,
+            "total_amount": t.c.total_amount + stmt.excluded.total_amount,
+            "total_tax": t.c.total_tax + stmt.excluded.total_tax,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+
+async def apply_change(db: AsyncSession, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+    """
+    Adjust the rollups for a receipt write. Pass before=None for a create,
+    after=None for a delete, and both snapshots for an update. Runs inside the
+    caller's transaction; the caller commits.
+    """
+    delta: Delta = {}
+    if before:
+        _accumulate(delta, before, -1)
+    if after:
+        _accumulate(delta, after, +1)
+    dialect = db.bind.dialect.name
+    for (owner_uid, dimension, key), (count, amount, tax) in delta.items():
+        if count == 0 and abs(amount) < 1e-9 and abs(tax) < 1e-9:
+            continue
+        await db.execute(_upsert(dialect, owner_uid, dimension, key, count, amount, tax))
+
+
+async def fetch_summaries(db: AsyncSession, owner_uid: str, dimensions: Iterable[str], limit: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Return a user's top `limit` keys per dimension (months chronologically, others by spend)."""
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for dimension in dimensions:
+        order = ReceiptSummary.key.desc() if dimension == "month" else ReceiptSummary.total_amount.desc()
+        stmt = (
+            sa.select(ReceiptSummary)
+            .where(
+                ReceiptSummary.owner_uid == owner_uid,
+                ReceiptSummary.dimension == dimension,
+                ReceiptSummary.receipt_count > 0,
+            )
+            .order_by(order)
+            .limit(limit)
+        )
+        rows = (await db.execute(stmt)).scalars().all()
+        out[dimension] = [
+            {
+                "key": r.key,
+                "count": int(r.receipt_count),
+                "total_amount": round(r.total_amount, 2),
+                "tax_amount": round(r.total_tax, 2),
+            }
+            for r in rows
+        ]
+    return out
+
+
+async def fetch_totals(db: AsyncSession, owner_uid: str) -> Dict[str, Any]:
+    """Overall totals; every receipt has exactly one category key, so sum that dimension."""
+    stmt = sa.select(
+        sa.func.coalesce(sa.func.sum(ReceiptSummary.receipt_count), 0),
+        sa.func.coalesce(sa.func.sum(ReceiptSummary.total_amount), 0.0),
+        sa.func.coalesce(sa.func.sum(ReceiptSummary.total_tax), 0.0),
+    ).where(ReceiptSummary.owner_uid == owner_uid, ReceiptSummary.dimension == "category")
+    count, amount, tax = (await db.execute(stmt)).one()
+    return {"count": int(count), "total_amount": round(float(amount), 2), "tax_amount": round(float(tax), 2)}
+
+
+def rebuild_summaries(conn: Connection, chunk_size: int = DEFAULT_CHUNK_SIZE, commit_each_chunk: bool = False) -> int:
+    """
+    Recompute receipt_summaries from the receipts table, reading receipts in chunks.
+
+    Returns:
+        Number of summary rows written
+    """
+    totals: Delta = defaultdict(lambda: [0, 0.0, 0.0])
+    stmt = sa.select(*_receipts.c)
+    for rows in iter_chunks(conn, stmt, _receipts.c.id, chunk_size):
+        for row in rows:
+            _accumulate(totals, snapshot(row), +1)
+
+    t = ReceiptSummary.__table__
+    conn.execute(t.delete())
+    now = datetime.utcnow()
+    values = [
+        {"owner_uid": o, "dimension": d, "key": k, "receipt_count": c, "total_amount": a, "total_tax": x, "updated_at": now}
+        for (o, d, k), (c, a, x) in totals.items()
+    ]
+    if values:
+        conn.execute(t.insert(), values)
+    if commit_each_chunk:
+        conn.commit()
+    return len(values)
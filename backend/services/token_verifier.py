@@ -0,0 +1,222 @@
+"""
+Firebase ID token verification off the request path.
+
+- Decoded claims are cached per token hash until the token's `exp`, in a
+  bounded LRU (TOKEN_CACHE_SIZE), so repeat calls with the same token cost a
+  dict lookup instead of an RSA signature check.
+- Google's signing certificates are fetched by a background thread
+  (CertificateStore.start) and refreshed ahead of their Cache-Control
+  expiry, so requests normally never wait on a key fetch. A token signed
+  with an unknown key id triggers a background refresh and is rejected
+  meanwhile. Before the first fetch has landed, or with no refresher thread
+  running, the request fetches the keys itself, at most once per
+  CERT_RETRY_SECONDS bound and with the fetch's own timeout.
+- FirebaseTokenDecoder checks the same claims as firebase_admin's
+  verify_id_token (RS256, kid, aud, iss, sub, iat/auth_time/exp).
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+from cryptography.x509 import load_pem_x509_certificate
+from jose import jwk, jwt
+
+logger = logging.getLogger(__name__)
+
+FIREBASE_CERTS_URL = os.getenv(
+    "FIREBASE_CERTS_URL",
+    "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com",
+)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+CERT_REFRESH_MARGIN = 300   # refresh this many seconds before the certificates expire
+CERT_RETRY_SECONDS = (5, 60)  # backoff bounds after a failed fetch
+CLOCK_SKEW_SECONDS = 5
+
+Claims = Dict[str, Any]
+
+
+class TokenError(Exception):
+    """The token is malformed, expired, or not signed by a current Firebase key."""
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries also expire at an absolute time."""
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Any]:
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _max_age(cache_control: Optional[str], default: int = 3600) -> int:
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return int(match.group(1)) if match else default
+
+
+def fetch_certificates(url: str = FIREBASE_CERTS_URL, timeout: float = 5) -> Tuple[Dict[str, str], int]:
+    """GET the kid -> PEM certificate map; returns (certs, max-age seconds)."""
+    res = requests.get(url, timeout=timeout)
+    res.raise_for_status()
+    return res.json(), _max_age(res.headers.get("Cache-Control"))
+
+
+class CertificateStore:
+    """Signing keys by kid, kept fresh by a background thread."""
+
+    def __init__(self, fetch: Callable[[], Tuple[Dict[str, str], int]] = fetch_certificates):
+        self._fetch = fetch
+        self._keys: Dict[str, Any] = {}
+        self.expires_at = 0.0
+        self.fetched_at = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._attempted_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> None:
+        with self._fetch_lock:
+            self._load()
+
+    def _load(self) -> None:
+        self._attempted_at = time.time()
+        certs, max_age = self._fetch()
+        keys = {
+            kid: jwk.construct(load_pem_x509_certificate(pem.encode()).public_key(), "RS256")
+            for kid, pem in certs.items()
+        }
+        now = time.time()
+        with self._lock:
+            self._keys, self.fetched_at, self.expires_at = keys, now, now + max_age
+        logger.info(f"Loaded {len(keys)} Firebase signing keys (valid {max_age}s)")
+
+    def _run(self) -> None:
+        retry = CERT_RETRY_SECONDS[0]
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                retry = CERT_RETRY_SECONDS[0]
+                wait = max(CERT_RETRY_SECONDS[1], self.expires_at - time.time() - CERT_REFRESH_MARGIN)
+            except Exception as e:
+                logger.warning(f"Firebase certificate fetch failed (retrying in {retry}s): {e}")
+                wait, retry = retry, min(retry * 2, CERT_RETRY_SECONDS[1])
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Prefetch now and keep refreshing in the background (idempotent)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="firebase-certs", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def get(self, kid: str) -> Optional[Any]:
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        if self.loaded and self._thread is not None and self._thread.is_alive():
+            if time.time() - self.fetched_at > CERT_RETRY_SECONDS[1]:
+                self._wake.set()  # keys may have rotated early; refresh without blocking this request
+            return None
+        # Nothing loaded yet, or nobody refreshing: fetch here rather than reject a valid token.
+        # Throttled, so tokens with made-up key ids can't turn into a fetch each.
+        min_gap = CERT_RETRY_SECONDS[1] if self.loaded else CERT_RETRY_SECONDS[0]
+        if time.time() - self._attempted_at < min_gap:
+            return None
+        with self._fetch_lock:
+            # A concurrent caller (or the refresher's first fetch) may have just done it
+            if kid not in self._keys and time.time() - self._attempted_at >= min_gap:
+                try:
+                    self._load()
+                except Exception as e:
+                    logger.warning(f"Firebase certificate fetch failed: {e}")
+        return self._keys.get(kid)
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._keys)
+
+
+class FirebaseTokenDecoder:
+    """Verify a Firebase ID token's signature and claims against a CertificateStore."""
+
+    def __init__(self, project_id: str, certs: CertificateStore):
+        self.project_id = project_id
+        self.issuer = f"https://securetoken.google.com/{project_id}"
+        self.certs = certs
+
+    def __call__(self, token: str) -> Claims:
+        try:
+            header = jwt.get_unverified_header(token)
+        except Exception as e:
+            raise TokenError(f"Malformed token: {e}") from e
+        if header.get("alg") != "RS256":
+            raise TokenError("Token must be signed with RS256")
+        key = self.certs.get(header.get("kid", ""))
+        if key is None:
+            raise TokenError("Token signed with an unknown key" if self.certs.loaded else "Signing keys not loaded yet")
+        try:
+            claims = jwt.decode(
+                token, key, algorithms=["RS256"], audience=self.project_id, issuer=self.issuer,
+                options={"leeway": CLOCK_SKEW_SECONDS},
+            )
+        except Exception as e:
+            raise TokenError(str(e)) from e
+        sub = claims.get("sub")
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise TokenError("Token has an invalid subject")
+        if claims.get("auth_time", 0) > time.time() + CLOCK_SKEW_SECONDS:
+            raise TokenError("Token auth_time is in the future")
+        claims["uid"] = sub
+        return claims
+
+
+class TokenVerifier:
+    """Caches whatever `decode` returns until the token's exp."""
+
+    def __init__(self, decode: Callable[[str], Claims], cache: Optional[TTLCache] = None):
+        self.decode = decode
+        self.cache = cache or TTLCache()
+
+    def verify(self, token: str) -> Claims:
+        key = hashlib.sha256(token.encode()).hexdigest()
+        claims = self.cache.get(key)
+        if claims is None:
+            claims = self.decode(token)
+            self.cache.set(key, claims, float(claims.get("exp", time.time() + 60)))
+        return claims
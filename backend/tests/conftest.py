@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Point the app at a throwaway SQLite database before anything imports database.session
+_DB_DIR = tempfile.mkdtemp(prefix="complicopilot-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_DIR}/test.db")
+os.environ.setdefault("DEVELOPMENT_MODE", "true")
+os.environ.setdefault("UPLOAD_DIR", f"{_DB_DIR}/uploads")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+@pytest.fixture()
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+    from database.session import engine
+    from models.entities import Base
+
+    Base.metadata.drop_all(bind=engine)
+    with TestClient(app) as c:
+        c.headers.update({"Authorization": "Bearer test-token"})
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def fresh_admission(monkeypatch):
+    """OCR rate limits and queues are per process; don't let one test's uploads throttle the next."""
+    from api import receipts
+    from services.admission import AdmissionController
+
+    controller = AdmissionController()
+    monkeypatch.setattr(receipts, "admission", controller)
+    return controller
+
+
+@pytest.fixture()
+def png_bytes():
+    import io
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (200, 80), "white")
+    ImageDraw.Draw(img).text((10, 30), "TOTAL 100.00", fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture()
+def db_session():
+    from database.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
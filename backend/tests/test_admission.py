@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from services.admission import AdmissionController, AdmissionRejected
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_limits_each_user():
+    clock = FakeClock()
+    controller = AdmissionController(user_rate=1, user_burst=3, clock=clock)
+
+    async def run():
+        controller.release(await controller.acquire("alice", cost=3))
+        with pytest.raises(AdmissionRejected) as e:
+            await controller.acquire("alice")
+        assert (e.value.status_code, e.value.code, e.value.retry_after) == (429, "RATE_LIMITED", 1)
+        controller.release(await controller.acquire("bob"))  # other users are unaffected
+        clock.now += 1
+        controller.release(await controller.acquire("alice"))
+
+    asyncio.run(run())
+
+
+def test_per_user_concurrency():
+    controller = AdmissionController(concurrency=8, user_concurrency=1)
+
+    async def run():
+        ticket = await controller.acquire("alice")
+        with pytest.raises(AdmissionRejected) as e:
+            await controller.acquire("alice")
+        assert e.value.status_code == 429 and e.value.code == "TOO_MANY_CONCURRENT"
+        controller.release(ticket)
+        controller.release(await controller.acquire("alice"))
+
+    asyncio.run(run())
+
+
+def test_interactive_requests_overtake_bulk_and_keep_a_reserved_slot():
+    controller = AdmissionController(concurrency=2, interactive_reserve=1, queue_size=8)
+    order = []
+
+    async def job(user, bulk):
+        ticket = await controller.acquire(user, bulk=bulk)
+        order.append(user)
+        return ticket
+
+    async def run():
+        first_bulk = await job("bulk-1", True)
+        # The second slot is reserved: more bulk work queues, interactive work doesn't
+        queued_bulk = asyncio.create_task(job("bulk-2", True))
+        await asyncio.sleep(0)
+        interactive = await job("ui-1", False)
+        assert controller.stats()["queued_bulk"] == 1 and controller.running == 2
+
+        queued_ui = asyncio.create_task(job("ui-2", False))
+        await asyncio.sleep(0)
+        controller.release(first_bulk)
+        second_ui = await queued_ui
+        assert order == ["bulk-1", "ui-1", "ui-2"]  # woken ahead of the older bulk request
+        assert controller.stats()["queued_bulk"] == 1
+
+        controller.release(interactive)
+        controller.release(second_ui)
+        controller.release(await queued_bulk)
+        assert order[-1] == "bulk-2" and controller.running == 0
+
+    asyncio.run(run())
+
+
+def test_full_queue_and_queue_timeout_return_503():
+    controller = AdmissionController(concurrency=1, queue_size=1, queue_timeout=0.05)
+
+    async def run():
+        ticket = await controller.acquire("a")
+        waiter = asyncio.create_task(controller.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as e:
+            await controller.acquire("c")
+        assert e.value.status_code == 503 and e.value.retry_after >= 1
+        with pytest.raises(AdmissionRejected):
+            await waiter  # timed out in the queue
+        controller.release(ticket)
+        assert controller.stats()["rejected"] == {"OVERLOADED": 2}
+        controller.release(await controller.acquire("b"))  # nothing leaked
+
+    asyncio.run(run())
+
+
+def test_upload_rate_limit_returns_429_with_retry_after(client, png_bytes, monkeypatch, fresh_admission):
+    from services.ocr import ocr_service
+
+    monkeypatch.setattr(ocr_service, "extract_text_from_image", lambda img: "Shop\nTotal: 10.00")
+    fresh_admission.user_rate, fresh_admission.user_burst = 0.1, 1
+    assert client.post("/api/v1/receipts/", files={"file": ("r.png", png_bytes, "image/png")}).status_code == 201
+    r = client.post("/api/v1/receipts/", files={"file": ("r.png", png_bytes, "image/png")})
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1 and r.json()["detail"]["error"]["code"] == "RATE_LIMITED"
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from passlib.context import CryptContext
+
+from api import auth
+from services.passwords import HashingBusy, PasswordHasher
+
+FAST_CONTEXT = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+
+
+@pytest.fixture()
+def fast_hashing(monkeypatch):
+    monkeypatch.setattr(auth, "password_hasher", PasswordHasher(FAST_CONTEXT))
+    auth.user_cache._data.clear()
+    yield
+    auth.password_hasher.shutdown()
+
+
+def test_signup_signin_and_me(client, fast_hashing, db_session):
+    user = {"email": "a@example.com", "password": "s3cret", "full_name": "A"}
+    assert client.post("/auth/signup", json=user).status_code == 200
+    assert client.post("/auth/signup", json=user).status_code == 400
+    assert client.post("/auth/signin", json={"email": user["email"], "password": "nope"}).status_code == 401
+    assert client.post("/auth/signin", json={"email": "b@example.com", "password": "x"}).status_code == 401
+
+    token = client.post("/auth/signin", json={"email": user["email"], "password": "s3cret"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/auth/users/me", headers=headers).json()["email"] == user["email"]
+
+    # Later lookups are served from the user cache, even once the row is gone
+    from models import entities
+    db_session.query(entities.User).delete()
+    db_session.commit()
+    assert client.get("/auth/users/me", headers=headers).json()["email"] == user["email"]
+
+
+def test_deactivated_user_is_rejected_once_uncached(client, fast_hashing, db_session):
+    from models import entities
+
+    user = {"email": "d@example.com", "password": "s3cret"}
+    client.post("/auth/signup", json=user)
+    headers = {"Authorization": f"Bearer {client.post('/auth/signin', json=user).json()['access_token']}"}
+    assert client.get("/auth/users/me", headers=headers).status_code == 200
+
+    db_session.query(entities.User).update({"is_active": 0})
+    db_session.commit()
+    auth.user_cache._data.clear()  # as if USER_CACHE_TTL had passed
+    assert client.get("/auth/users/me", headers=headers).status_code == 401
+    assert len(auth.user_cache) == 0
+
+
+def test_hashing_admission_control(client, fast_hashing, monkeypatch):
+    monkeypatch.setattr(auth.password_hasher, "max_pending", 0)
+    res = client.post("/auth/signup", json={"email": "c@example.com", "password": "x"})
+    assert res.status_code == 503 and res.headers["retry-after"] == "1"
+
+
+def test_hasher_rejects_beyond_max_pending():
+    hasher = PasswordHasher(FAST_CONTEXT, workers=1, max_pending=2)
+
+    async def run():
+        results = await asyncio.gather(*(hasher.hash("pw") for _ in range(2)))
+        with pytest.raises(HashingBusy):
+            await asyncio.gather(*(hasher.hash("pw") for _ in range(3)))
+        return results
+
+    hashed = asyncio.run(run())
+    assert all(FAST_CONTEXT.verify("pw", h) for h in hashed)
+    assert hasher.pending == 0
+    hasher.shutdown()
+
+
+def test_failed_submit_releases_its_slot():
+    hasher = PasswordHasher(FAST_CONTEXT, workers=1, max_pending=1)
+
+    async def run():
+        await hasher.hash("pw")
+        hasher._executor.shutdown()  # shut down without clearing, like a concurrent shutdown()
+        with pytest.raises(RuntimeError):
+            await hasher.hash("pw")
+
+    asyncio.run(run())
+    assert hasher.pending == 0
@@ -0,0 +1,54 @@
+import json
+
+from benchmarks.corpus import generate_corpus, load_corpus, write_corpus
+from benchmarks.import_bench import parse_importtime, summarize
+from benchmarks.ocr_bench import _parser, compare, field_matches, run_benchmark
+from benchmarks.ocr_transport_bench import run_benchmark as run_transport_benchmark
+
+
+def test_corpus_is_reproducible_and_round_trips(tmp_path):
+    first, second = generate_corpus(4, seed=7), generate_corpus(4, seed=7)
+    assert [s.content for s in first] == [s.content for s in second]
+    assert [s.truth for s in first] == [s.truth for s in second]
+    assert generate_corpus(1, seed=8)[0].content != first[0].content
+
+    loaded = load_corpus(str(write_corpus(first, str(tmp_path))))
+    assert [(s.id, s.truth, s.content) for s in loaded] == [(s.id, s.truth, s.content) for s in first]
+
+
+def test_ground_truth_text_parses_to_truth():
+    # A perfect OCR read must score 100%, otherwise accuracy numbers measure the corpus, not OCR
+    for sample in generate_corpus(12):
+        assert all(field_matches(_parser.parse(sample.text), sample.truth).values()), sample.truth
+
+
+def test_run_benchmark_without_tesseract():
+    results = run_benchmark(generate_corpus(2), worker_counts=[1], use_tesseract=False)
+    assert {"decode", "resize", "deskew", "parse", "preprocess.otsu"} <= set(results["stages"])
+    assert "tesseract" not in results["stages"] and results["accuracy"] is None
+    assert results["stages"]["deskew"]["n"] == 6
+    assert results["throughput"]["1"]["receipts_per_second"] > 0
+    json.dumps(results)
+    assert any("decode" in line for line in compare(results, results))
+
+
+def test_importtime_report():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     numpy.core\n"
+        "import time:       300 |        420 |   numpy\n"
+        "import time:        50 |        470 | main\n"
+        "import time:        10 |         10 | json\n"
+    )
+    records = parse_importtime(stderr)
+    assert [(r.module, r.depth) for r in records] == [("numpy.core", 2), ("numpy", 1), ("main", 0), ("json", 0)]
+    summary = summarize(records, top=1)
+    assert summary["total_ms"] == 0.5
+    assert summary["heavy_modules_loaded"] == ["numpy"]
+    assert summary["top_cumulative_ms"] == {"main": 0.5} and summary["top_self_ms"] == {"numpy": 0.3}
+
+
+def test_transport_benchmark_covers_both_paths():
+    results = run_transport_benchmark([0.01], repeat=2)
+    assert set(results["0.01MB"]) == {"inline", "shm"}
+    assert all(r["p50_ms"] > 0 for r in results["0.01MB"].values())
@@ -0,0 +1,162 @@
+import hashlib
+import importlib.util
+import io
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+import pytest
+
+# The Vercel handler at the repository root (api/receipts.py); it isn't part of the backend package
+_spec = importlib.util.spec_from_file_location("edge_receipts", Path(__file__).parents[2] / "api" / "receipts.py")
+edge = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(edge)
+
+CREATED_AT = "2025-10-19T10:00:00.000000Z"
+
+
+@pytest.fixture()
+def store(tmp_path, monkeypatch):
+    store = edge.SQLiteReceiptStore(str(tmp_path / "edge.sqlite3"))
+    monkeypatch.setattr(edge, "_store", store)
+    return store
+
+
+@pytest.fixture()
+def server(store):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), edge.handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    with httpx.Client(base_url=f"http://127.0.0.1:{httpd.server_port}") as c:
+        yield c
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_pages_walk_tied_timestamps_without_gaps(server, store):
+    for i in range(5):
+        store.put({"id": f"r{i}", "created_at": CREATED_AT})
+    store.put({"id": "newest", "created_at": "2025-10-19T11:00:00.000000Z"})
+
+    seen, cursor = [], None
+    while True:
+        body = server.get("/api/receipts", params={"limit": 2, **({"cursor": cursor} if cursor else {})}).json()
+        seen += [item["id"] for item in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["newest", "r4", "r3", "r2", "r1", "r0"]
+
+    # A last page that is exactly full still ends with a null cursor
+    body = server.get("/api/receipts", params={"limit": 6}).json()
+    assert body["count"] == 6 and body["next_cursor"] is None
+
+
+@pytest.mark.parametrize("params, code", [
+    ({"limit": "0"}, "invalid_limit"),
+    ({"limit": "101"}, "invalid_limit"),
+    ({"limit": "ten"}, "invalid_limit"),
+    ({"cursor": "not base64!"}, "invalid_cursor"),
+    ({"cursor": edge.encode_cursor({"created_at": 1, "id": "r0"})}, "invalid_cursor"),
+])
+def test_bad_list_parameters_are_rejected(server, params, code):
+    res = server.get("/api/receipts", params=params)
+    assert res.status_code == 400 and res.json()["error"]["code"] == code
+
+
+def test_routes(server, store):
+    store.put({"id": "r1", "created_at": CREATED_AT})
+    assert server.get("/api/receipts").json()["items"] == [{"id": "r1", "created_at": CREATED_AT}]
+    assert server.get("/api/receipts/r1").json()["id"] == "r1"
+    assert server.get("/api/receipts/missing").status_code == 404
+    assert server.get("/api/other").status_code == 404
+
+
+class _Request:
+    """Just what _parse_multipart reads from a BaseHTTPRequestHandler."""
+
+    def __init__(self, body: bytes, content_type: str, length=None):
+        self.rfile = io.BytesIO(body)
+        self.headers = {"Content-Type": content_type, "Content-Length": str(len(body) if length is None else length)}
+
+
+def _multipart(boundary: str, content: bytes, filename: str = "r.png") -> bytes:
+    return (
+        f"preamble\r\n--{boundary}\r\nContent-Disposition: form-data; name=\"vendor\"\r\n\r\nCafé\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: image/png\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\nepilogue".encode()
+
+
+def test_multipart_boundary_split_across_chunks(monkeypatch):
+    monkeypatch.setattr(edge, "CHUNK_SIZE", 7)
+    # File data that keeps looking like the start of a delimiter
+    for n in range(40):
+        content = b"\r\n--b0un" * n + bytes(range(n))
+        files, fields = edge._parse_multipart(_Request(_multipart("b0und", content), "multipart/form-data; boundary=b0und"))
+        assert files["file"] == {"filename": "r.png", "type": "image/png", "size": len(content),
+                                 "sha256": hashlib.sha256(content).hexdigest()}
+        assert fields == {"vendor": "Café"}
+
+
+def test_multipart_quoted_boundary_empty_file_and_utf8_filename():
+    files, _ = edge._parse_multipart(
+        _Request(_multipart("a b", b"", filename="reçu.png"), 'multipart/form-data; boundary="a b"'))
+    assert files["file"] == {"filename": "reçu.png", "type": "image/png", "size": 0,
+                             "sha256": hashlib.sha256(b"").hexdigest()}
+
+
+@pytest.mark.parametrize("request_, status, code", [
+    (_Request(_multipart("b", b"x" * 100)[:-30], "multipart/form-data; boundary=b"), 400, "malformed_multipart"),
+    # The connection closes before Content-Length bytes arrived
+    (_Request(_multipart("b", b"x" * 100)[:-30], "multipart/form-data; boundary=b", length=10_000), 400, "incomplete_body"),
+    (_Request(b"", "multipart/form-data; boundary=b", length=edge.MAX_UPLOAD_BYTES + 1), 413, "payload_too_large"),
+    (_Request(b"", "multipart/form-data; boundary=b", length=""), 411, "length_required"),
+    (_Request(b"", "multipart/form-data"), 400, "malformed_multipart"),
+])
+def test_multipart_rejections(request_, status, code):
+    with pytest.raises(edge.MultipartError) as info:
+        edge._parse_multipart(request_)
+    assert (info.value.status, info.value.code) == (status, code)
+
+
+def test_upload_round_trip(server, monkeypatch):
+    content = bytes(range(256)) * 1000
+    res = server.post("/api/receipts", data={"vendor": "Café"}, files={"file": ("reçu.png", content, "image/png")})
+    assert res.status_code == 201
+    item = res.json()
+    assert item["vendor"] == "Café" and item["file"] == {
+        "name": "reçu.png", "type": "image/png", "size": len(content), "sha256": hashlib.sha256(content).hexdigest(),
+    }
+    assert server.get(f"/api/receipts/{item['id']}").json() == item
+
+    monkeypatch.setattr(edge, "MAX_UPLOAD_BYTES", 1024)
+    res = server.post("/api/receipts", files={"file": ("big.png", content, "image/png")})
+    assert res.status_code == 413 and res.json()["error"]["code"] == "payload_too_large"
+
+
+class _DroppedConnection:
+    """psycopg2-like connection whose server went away: statements fail, and so does rollback."""
+
+    closed = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        raise ConnectionError("server closed the connection unexpectedly")
+
+    def rollback(self):
+        raise RuntimeError("connection already closed")
+
+    def close(self):
+        self.closed = 1
+
+
+def test_failed_rollback_keeps_the_original_error_and_reconnects():
+    store = edge.PostgresReceiptStore("postgresql://edge")
+    store._conn = _DroppedConnection()
+    with pytest.raises(ConnectionError):
+        store.get("r1")
+    assert store._conn is None  # the next request opens a new connection
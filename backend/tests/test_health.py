@@ -0,0 +1,65 @@
+import pytest
+
+from services import health
+
+
+@pytest.fixture(autouse=True)
+def fresh_probes():
+    health.reset_cache()
+    yield
+    health.reset_cache()
+
+
+def test_liveness_is_static(client):
+    assert client.get("/api/v1/health/").json()["status"] == "ok"
+
+
+def test_readiness_reports_each_probe(client, monkeypatch):
+    monkeypatch.setattr(health, "HEALTH_REQUIRE_TESSERACT", False)
+    res = client.get("/api/v1/health/ready")
+    body = res.json()
+    assert res.status_code == 200 and body["status"] == "ready", body
+    checks = body["checks"]
+    assert checks["database"]["latency_ms"] >= 0 and "saturation" in checks["database"]["pool"]
+    assert checks["ocr"]["in_flight"] == 0 and checks["ocr"]["threads_total"] > 0
+    assert checks["disk"]["free_mb"] > 0
+
+
+def test_readiness_fails_and_is_cached(client, monkeypatch):
+    monkeypatch.setattr(health, "HEALTH_REQUIRE_TESSERACT", False)
+    monkeypatch.setattr(health, "HEALTH_MIN_FREE_MB", 10 ** 12)
+    res = client.get("/api/v1/health/ready")
+    assert res.status_code == 503 and res.json()["failing"] == ["disk"]
+
+    calls = []
+    monkeypatch.setattr(health, "probe_disk", lambda: calls.append(1) or {"ok": True})
+    again = client.get("/api/v1/health/ready")
+    assert again.status_code == 503 and calls == []  # served from the cache
+
+
+def test_tesseract_failure_is_retried_after_backoff(monkeypatch):
+    import asyncio
+
+    results = [{"ok": False, "error": "TesseractNotFoundError"}, {"ok": True, "version": "5.3.0"}]
+    monkeypatch.setattr(health, "_warm_up_tesseract", lambda: results.pop(0))
+    monkeypatch.setattr(health, "HEALTH_TESSERACT_RETRY_SECONDS", 3600)
+    assert not asyncio.run(health.probe_tesseract())["ok"]
+    assert not asyncio.run(health.probe_tesseract())["ok"] and len(results) == 1  # within the backoff
+
+    monkeypatch.setattr(health, "HEALTH_TESSERACT_RETRY_SECONDS", 0)
+    assert asyncio.run(health.probe_tesseract())["ok"]
+    assert asyncio.run(health.probe_tesseract())["ok"]  # success is kept, no further probe
+
+
+def test_derivative_queue_depth_counts_unfinished_jobs(monkeypatch):
+    import threading
+
+    from services import derivatives
+
+    release = threading.Event()
+    monkeypatch.setattr(derivatives, "generate_all", lambda sha, content: release.wait(5))
+    futures = [derivatives.schedule(f"sha{i}", b"") for i in range(3)]
+    assert derivatives.queue_depth() == 3
+    release.set()
+    derivatives.shutdown(wait=True)  # done-callbacks have run once the threads exit
+    assert all(f.done() for f in futures) and derivatives.queue_depth() == 0
@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.load_test import AUTH_HEADERS, LoadTest, parse_mix, percentile
+
+
+def test_parse_mix_and_percentile():
+    assert parse_mix("upload=2,list") == {"upload": 2.0, "list": 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("delete=1")
+    assert percentile([1, 2, 3, 4], 50) in (2, 3) and percentile([], 99) == 0.0
+
+
+def test_load_test_drives_every_operation(client, png_bytes, monkeypatch):
+    from api import receipts
+    from main import app
+    from services.admission import AdmissionController
+    from services.ocr import ocr_service
+
+    # All load comes from one user; per-user limits would turn it into a rate-limit test
+    monkeypatch.setattr(receipts, "admission", AdmissionController(user_concurrency=100, user_rate=1e6, user_burst=1e6))
+
+    monkeypatch.setattr(ocr_service, "extract_text_from_image", lambda img: "Shop\nTotal: 10.00")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=AUTH_HEADERS) as c:
+            return await LoadTest(c, [png_bytes], parse_mix(None)).run(duration=1.0, concurrency=2, warmup_uploads=2)
+
+    report = asyncio.run(run())
+    assert report["errors"] == 0, report
+    for op in ("upload", "list", "get", "patch"):
+        stats = report["endpoints"][op]
+        assert stats["requests"] > 0 and stats["p50_ms"] <= stats["p99_ms"]
+
+
+def test_fallback_uploads_are_counted_as_uploads(client, png_bytes):
+    from main import app
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=AUTH_HEADERS) as c:
+            test = LoadTest(c, [png_bytes], {"get": 1.0})
+            await test._record("get")
+            await test._record("get")
+            return test.report(1.0, 1)
+
+    endpoints = asyncio.run(run())["endpoints"]
+    assert endpoints["upload"]["requests"] == 1 and endpoints["get"]["requests"] == 1
@@ -0,0 +1,45 @@
+from services import metrics
+
+
+def _sample(text, name, **labels):
+    for line in text.splitlines():
+        if line.startswith(name + "{") or line.startswith(name + " "):
+            if all(f'{k}="{v}"' in line for k, v in labels.items()):
+                return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_metrics_endpoint_reports_requests_and_queries(client):
+    assert client.get("/api/v1/receipts/missing").status_code == 404
+    text = client.get("/metrics").text
+    assert _sample(text, "complicopilot_http_request_seconds_count",
+                   method="GET", route="/api/v1/receipts/{id}", status="404") >= 1
+    assert _sample(text, "complicopilot_db_query_seconds_count", operation="SELECT") >= 1
+
+
+def test_ocr_stages_and_cache_hits_are_recorded(client, png_bytes, monkeypatch):
+    from services.ocr import ocr_service
+
+    before = client.get("/metrics").text
+    # No Tesseract binary is needed: the image stages still run and are timed
+    ocr_service.extract_text_from_image(png_bytes)
+    monkeypatch.setattr(ocr_service, "extract_text_from_image", lambda img: "Shop\nTotal: 10.00")
+    for name in ("a.png", "b.png"):
+        client.post("/api/v1/receipts/", files={"file": (name, png_bytes, "image/png")})
+    after = client.get("/metrics").text
+
+    def delta(name, **labels):
+        return (_sample(after, name, **labels) or 0) - (_sample(before, name, **labels) or 0)
+
+    assert delta("complicopilot_ocr_stage_seconds_count", stage="decode") == 1
+    assert delta("complicopilot_ocr_stage_seconds_count", stage="preprocess.otsu") == 1
+    assert delta("complicopilot_cache_requests_total", cache="ocr_text", result="miss") == 1
+    assert delta("complicopilot_cache_requests_total", cache="ocr_text", result="hit") == 1
+    assert delta("complicopilot_parse_seconds_count") == 2
+
+
+def test_hooks_are_noops_when_disabled(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    assert metrics.ocr_stage("decode") is metrics.parse_timer() is metrics._NOOP
+    metrics.cache_access("ocr_text", True)
+    assert metrics.render() is None
@@ -0,0 +1,40 @@
+import io
+import mmap
+
+import numpy as np
+from PIL import Image
+
+from services.ocr import MAX_SIDE, _decode_reduced_gray, _load_for_ocr, _reduction_factor
+
+
+def _jpeg(width, height):
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_reduction_factor_keeps_long_side_above_target():
+    assert _reduction_factor((6000, 4000)) == 2
+    assert _reduction_factor((13000, 9000)) == 8
+    assert _reduction_factor((1200, 800)) == 1
+    assert _reduction_factor(None) == 1
+
+
+def test_large_jpeg_decodes_reduced_grayscale():
+    gray = _decode_reduced_gray(_jpeg(4000, 3000))
+    assert gray.ndim == 2
+    assert gray.shape == (1500, 2000)
+    assert max(gray.shape) >= MAX_SIDE
+
+
+def test_path_and_mmap_inputs(tmp_path):
+    path = tmp_path / "scan.jpg"
+    path.write_bytes(_jpeg(3400, 2000))
+    assert _load_for_ocr(str(path)).shape == (1000, 1700)
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        assert _load_for_ocr(mm).shape == (1000, 1700)
+
+
+def test_arrays_pass_through():
+    arr = np.zeros((10, 20), np.uint8)
+    assert _load_for_ocr(arr) is arr
@@ -0,0 +1,188 @@
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from models.entities import OCRTask, Receipt
+from services import ocr_queue
+from services.ocr_worker import QueueWorker
+
+BACKEND = Path(__file__).parent.parent
+
+
+def fake_ocr(image):
+    """Stands in for Tesseract in worker processes (--handler tests.test_ocr_queue:fake_ocr)."""
+    time.sleep(0.3)
+    if b"unreadable" in bytes(image):
+        raise ValueError("unreadable image")
+    return "FRESH MART\nDate: 31/08/2025\nTOTAL 123.45"
+
+
+def _png(seed: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (40, 20), (seed, 255 - seed, 7)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture()
+def sessions():
+    # Own engine without pooling, so connections don't outlive each test's event loop
+    from database.session import ASYNC_DATABASE_URL
+
+    engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture()
+def broker(client, monkeypatch):
+    monkeypatch.setattr(ocr_queue, "OCR_BROKER", True)
+    return client
+
+
+def _receipts(db_session, n):
+    receipts = [Receipt(vendor="v", date="", amount=0.0, owner_uid="u", blob_sha256=f"sha{i}") for i in range(n)]
+    db_session.add_all(receipts)
+    db_session.commit()
+    return receipts
+
+
+def test_claims_are_exclusive_and_in_priority_order(client, db_session, sessions):
+    receipts = _receipts(db_session, 3)
+
+    async def run():
+        async with sessions() as db:
+            for receipt, priority in zip(receipts, (2, 0, 1)):
+                await ocr_queue.enqueue(db, receipt, ocr_queue.UPLOAD, priority)
+            await db.commit()
+        async with sessions() as a, sessions() as b:
+            first = await ocr_queue.claim(a, "host:1:a", limit=2)
+            second = await ocr_queue.claim(b, "host:2:b", limit=2)
+            third = await ocr_queue.claim(b, "host:2:b", limit=2)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert [t.priority for t in first] == [0, 1]
+    assert [t.priority for t in second] == [2] and third == []
+    assert all(t.status == ocr_queue.RUNNING and t.attempts == 1 for t in first + second)
+
+
+def test_expired_leases_are_redelivered_and_fenced(client, db_session, sessions):
+    retried, final = _receipts(db_session, 2)
+
+    async def run():
+        async with sessions() as db:
+            await ocr_queue.enqueue(db, retried, ocr_queue.UPLOAD, max_attempts=2)
+            await ocr_queue.enqueue(db, final, ocr_queue.UPLOAD, max_attempts=1)
+            await db.commit()
+            stale = await ocr_queue.claim(db, "host:1:dead", limit=2, visibility_timeout=30)
+            # A heartbeat keeps the leases; without one they run out and the tasks come back
+            assert await ocr_queue.heartbeat(db, "host:1:dead", visibility_timeout=30) == 2
+            later = datetime.utcnow() + timedelta(seconds=60)
+            requeued, failed = await ocr_queue.requeue_expired(db, now=later)
+            for task in failed:
+                await ocr_queue.record_failure(db, task.receipt_id, task.error)
+            await db.commit()
+            assert requeued == 1 and [t.receipt_id for t in failed] == [final.id]
+
+            fresh = await ocr_queue.claim(db, "host:2:live", now=later)
+            assert [t.id for t in fresh] == [stale[0].id] and fresh[0].attempts == 2
+            # The presumed-dead worker finishing late must not overwrite the new attempt
+            assert not await ocr_queue.complete(db, stale[0], "host:1:dead")
+            assert await ocr_queue.complete(db, fresh[0], "host:2:live")
+            await db.commit()
+            failed_receipt = await db.get(Receipt, final.id, populate_existing=True)
+            return failed_receipt, await ocr_queue.stats(db)
+
+    failed_receipt, stats = asyncio.run(run())
+    assert failed_receipt.extracted["ocr_status"] == ocr_queue.FAILED
+    assert stats["tasks"] == {"queued": 0, "running": 0, "done": 1, "failed": 1}
+    assert stats["workers"] == 1
+
+
+def test_leases_of_hung_tasks_stop_being_extended(client, db_session, sessions):
+    (receipt,) = _receipts(db_session, 1)
+
+    async def run():
+        async with sessions() as db:
+            await ocr_queue.enqueue(db, receipt, ocr_queue.UPLOAD)
+            await db.commit()
+            (task,) = await ocr_queue.claim(db, "host:1:hung", visibility_timeout=30)
+            claimed_at = task.claimed_at
+            # The worker keeps heartbeating, but its OCR call never returns
+            await asyncio.sleep(0.3)
+            assert await ocr_queue.heartbeat(db, "host:1:hung", visibility_timeout=30, max_runtime=0.6) == 1
+            await asyncio.sleep(0.4)
+            assert await ocr_queue.heartbeat(db, "host:1:hung", visibility_timeout=30, max_runtime=0.6) == 0
+            task = await db.get(OCRTask, task.id, populate_existing=True)
+            assert task.claimed_at == claimed_at  # heartbeats don't move the start of the attempt
+            requeued, _ = await ocr_queue.requeue_expired(db, now=task.lease_expires_at + timedelta(seconds=1))
+            await db.commit()
+            return requeued, await db.get(OCRTask, task.id, populate_existing=True)
+
+    requeued, task = asyncio.run(run())
+    assert requeued == 1 and task.status == ocr_queue.QUEUED and task.worker_id is None
+
+
+def test_upload_is_queued_and_written_back_by_a_worker(broker, sessions, monkeypatch):
+    res = broker.post("/api/v1/receipts/", files={"file": ("r.png", _png(1), "image/png")})
+    assert res.status_code == 202
+    body = res.json()
+    assert body["status"] == ocr_queue.PROCESSING and body["extracted"]["ocr_status"] == ocr_queue.QUEUED
+
+    monkeypatch.setattr(ocr_queue, "OCR_TASK_MAX_ATTEMPTS", 1)
+    bad_id = broker.post("/api/v1/receipts/", files={"file": ("bad.png", _png(2) + b"unreadable", "image/png")}).json()["id"]
+    asyncio.run(QueueWorker(concurrency=2, handler=fake_ocr, session_factory=sessions, poll_interval=0.05,
+                            drain=True).run())
+
+    done = broker.get(f"/api/v1/receipts/{body['id']}").json()
+    assert (done["vendor"], done["amount"], done["status"]) == ("FRESH MART", 123.45, "needs_review")
+    assert done["extracted"]["ocr_status"] == ocr_queue.DONE
+    vendors = broker.get("/api/v1/receipts/summary", params={"dimension": "vendor"}).json()["summaries"]["vendor"]
+    assert {v["key"]: (v["count"], v["total_amount"]) for v in vendors} == {
+        "FRESH MART": (1, 123.45), "Unknown Vendor": (1, 0.0),
+    }
+
+    # Out of attempts: left for the user to fill in by hand
+    failed = broker.get(f"/api/v1/receipts/{bad_id}").json()
+    assert failed["status"] == "needs_review" and failed["extracted"]["ocr_status"] == ocr_queue.FAILED
+    assert "unreadable image" in failed["extracted"]["ocr_error"]
+
+    res = broker.post(f"/api/v1/receipts/{body['id']}/reprocess")
+    assert res.status_code == 202 and res.json()["extracted"]["ocr_status"] == ocr_queue.QUEUED
+
+
+def test_several_worker_processes_share_the_queue(broker, sessions):
+    ids = [
+        broker.post("/api/v1/receipts/", files={"file": (f"{i}.png", _png(10 + i), "image/png")}).json()["id"]
+        for i in range(6)
+    ]
+    command = [sys.executable, "-m", "services.ocr_worker", "--drain", "--concurrency", "1",
+               "--poll-interval", "0.1", "--handler", "tests.test_ocr_queue:fake_ocr", "--log-level", "warning"]
+    workers = [subprocess.Popen(command, cwd=BACKEND, env=dict(os.environ)) for _ in range(3)]
+    try:
+        assert [w.wait(timeout=60) for w in workers] == [0, 0, 0]
+    finally:
+        for w in workers:
+            if w.poll() is None:
+                w.kill()
+
+    async def tasks():
+        async with sessions() as db:
+            return (await db.scalars(select(OCRTask).where(OCRTask.receipt_id.in_(ids)))).all()
+
+    finished = asyncio.run(tasks())
+    assert {t.status for t in finished} == {ocr_queue.DONE} and len(finished) == 6
+    assert len({t.worker_id for t in finished}) > 1
+    for receipt_id in ids:
+        assert broker.get(f"/api/v1/receipts/{receipt_id}").json()["vendor"] == "FRESH MART"
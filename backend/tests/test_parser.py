@@ -0,0 +1,25 @@
+from datetime import date
+
+import pytest
+
+from services.parser import ParserService
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("2025-08-31", date(2025, 8, 31)),
+    ("31/08/2025", date(2025, 8, 31)),
+    ("05/06/2025", date(2025, 6, 5)),  # day-first when ambiguous
+    ("08/31/2025", date(2025, 8, 31)),  # month-first only when day-first is impossible
+    ("31 Aug 2025", date(2025, 8, 31)),
+    ("31-08-25", date(2025, 8, 31)),
+    ("2025-08-31T10:15:00", date(2025, 8, 31)),
+    ("not a date", None),
+    (None, None),
+])
+def test_normalize_date(raw, expected):
+    assert ParserService().normalize_date(raw) == expected
+
+
+def test_parse_extracts_fields():
+    parsed = ParserService().parse("SuperMart Grocery\nDate: 31/08/2025\nTotal: 793.00\n")
+    assert parsed == {"total": "793.00", "date": "31/08/2025", "vendor": "SuperMart Grocery"}
@@ -0,0 +1,137 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import multiprocessing
+
+import httpx
+import numpy as np
+import pytest
+
+from services.ocr_workers import OCRWorkerPool
+from services.shared_frames import FrameRing
+
+
+def _fake_ocr(img):
+    if img == b"bad":
+        raise ValueError("unreadable")
+    return f"{os.getpid()}:{len(img)}"
+
+
+def test_ocr_workers_serve_and_recycle():
+    pool = OCRWorkerPool(api_slots=2, workers=2, max_jobs=2, handler=_fake_ocr)
+    pool.start()
+    try:
+        client = pool.client(1, timeout=10)
+        texts = client.extract_texts_from_images([b"x" * n for n in range(1, 5)])
+        assert [t.split(":")[1] for t in texts] == ["1", "2", "3", "4"]
+        assert client.in_flight == 0
+
+        # Each worker exits after two jobs; the pool replaces them and keeps serving
+        deadline = time.time() + 10
+        while pool.recycled < 2 and time.time() < deadline:
+            pool.reap()
+            time.sleep(0.05)
+        assert pool.recycled == 2
+        pid = int(client.extract_text_from_image(b"y").split(":")[0])
+        assert pid not in {int(t.split(":")[0]) for t in texts}
+
+        with pytest.raises(RuntimeError, match="unreadable"):
+            client.extract_text_from_image(b"bad")
+    finally:
+        pool.stop()
+
+
+def test_results_survive_a_worker_dying_mid_reply():
+    pool = OCRWorkerPool(api_slots=1, workers=2, max_jobs=0, handler=lambda img: "t" * len(img))
+    pool.start()
+    try:
+        client = pool.client(0, timeout=2)
+        # A reply cut short: the first record of a result whose sender was killed
+        pool._writers[0].send(((os.getpid(), -1), True, b"half a pickle"))
+        # Replies spanning many PIPE_BUF-sized records, from both workers at once
+        sizes = [1, 50_000, 9_000, 120_000]
+        assert [len(t) for t in client.extract_texts_from_images([b"x" * n for n in sizes])] == sizes
+        assert client.extract_text_from_image(b"ok") == "tt"
+    finally:
+        pool.stop()
+
+
+def test_frame_ring_slots_are_reused_and_reclaimed():
+    ring = FrameRing(multiprocessing.get_context("fork"), slots=2, slot_size=1024)
+    try:
+        frame = ring.put(b"png-bytes")
+        with ring.open(frame) as view:
+            assert bytes(view) == b"png-bytes"
+        assert ring.in_use() == 0
+
+        gray = np.arange(64, dtype=np.uint8).reshape(8, 8)
+        frame = ring.put(gray)
+        with ring.open(frame) as image:
+            assert np.array_equal(image, gray)
+
+        assert ring.put(b"x" * 2048) is None  # too big for a slot: sent inline
+        first, second = ring.put(b"a"), ring.put(b"b")
+        assert ring.put(b"c") is None  # all slots busy
+        assert ring.reclaim(os.getpid()) == 2
+        with pytest.raises(LookupError):
+            ring.open(first).__enter__()
+        reused = ring.put(b"reused")
+        stale = first if first.slot == reused.slot else second
+        with pytest.raises(LookupError):  # the slot is taken again, by a newer generation
+            ring.open(stale).__enter__()
+    finally:
+        ring.close()
+
+
+def test_ocr_workers_read_images_from_shared_memory():
+    pool = OCRWorkerPool(api_slots=1, workers=1, max_jobs=0, handler=lambda img: type(img).__name__, shm_slots=2,
+                         shm_slot_size=1024)
+    pool.start()
+    try:
+        client = pool.client(0, timeout=10)
+        images = [b"png", np.zeros((4, 4), np.uint8), b"x" * 4096]
+        assert client.extract_texts_from_images(images) == ["memoryview", "ndarray", "bytes"]
+        assert pool.frames.in_use() == 0
+    finally:
+        pool.stop()
+
+
+def test_prefork_server_recycles_api_workers_and_stops_cleanly(tmp_path):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(
+        os.environ, DATABASE_URL=f"sqlite:///{tmp_path}/db.sqlite", UPLOAD_DIR=str(tmp_path / "uploads"),
+        EXPORT_DIR=str(tmp_path / "exports"), DEVELOPMENT_MODE="true", RETENTION_SWEEP_INTERVAL="0",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "services.prefork", "--port", str(port), "--api-workers", "2", "--ocr-workers", "1",
+         "--max-requests", "2", "--max-requests-jitter", "0", "--log-level", "warning"],
+        cwd=Path(__file__).resolve().parent.parent, env=env,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}/api/v1/health/"
+        deadline = time.time() + 60
+        while True:
+            try:
+                httpx.get(url)
+                break
+            except httpx.HTTPError:
+                assert time.time() < deadline and proc.poll() is None
+                time.sleep(0.2)
+        # Workers exit after two requests each; the master restarts them between requests
+        statuses = []
+        for _ in range(10):
+            try:
+                statuses.append(httpx.get(url).status_code)
+            except httpx.HTTPError:
+                time.sleep(0.5)
+        assert statuses.count(200) >= 8
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(30) == 0
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from services import profiler
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def _profile_busy_thread(seconds=0.3):
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy")
+    worker.start()
+    sampler = profiler.SamplingProfiler(interval=0.005).start()
+    try:
+        time.sleep(seconds)
+    finally:
+        sampler.stop()
+        stop.set()
+        worker.join()
+    return sampler
+
+
+def test_collapsed_and_speedscope_output():
+    sampler = _profile_busy_thread()
+    assert sampler.stats()["samples"] > 0
+    busy = [line for line in sampler.collapsed().splitlines() if line.startswith("busy;")]
+    assert busy and all("_busy_loop" in line for line in busy)
+
+    doc = sampler.speedscope()
+    frames = doc["shared"]["frames"]
+    profile = next(p for p in doc["profiles"] if p["name"] == "busy")
+    assert len(profile["samples"]) == len(profile["weights"])
+    assert any(frames[i]["name"] == "_busy_loop" for stack in profile["samples"] for i in stack)
+
+
+def test_only_one_profile_at_a_time_and_overhead_backoff():
+    first = profiler.SamplingProfiler().start()
+    with pytest.raises(profiler.ProfilerBusy):
+        profiler.SamplingProfiler().start()
+    first.stop()
+
+    # An impossible budget forces the sampler to stretch its interval
+    sampler = profiler.SamplingProfiler(interval=0.001, max_overhead=1e-6).start()
+    time.sleep(0.05)
+    sampler.stop()
+    assert sampler.interval > 0.001
+    profiler.SamplingProfiler().start().stop()  # lock was released
+
+
+def test_profile_endpoint_requires_admin_and_opt_in(client, monkeypatch):
+    from api import admin, auth
+
+    url = "/api/v1/admin/profile?seconds=0.2&interval_ms=5"
+    monkeypatch.setattr(admin, "PROFILING_ENABLED", True)
+    assert client.get(url).status_code == 403
+
+    monkeypatch.setattr(auth, "ADMIN_UIDS", {"dev-user-123"})
+    res = client.get(url + "&format=speedscope")
+    assert res.status_code == 200 and res.json()["profiles"]
+    assert int(res.headers["x-profile-samples"]) > 0
+
+    monkeypatch.setattr(admin, "PROFILING_ENABLED", False)
+    assert client.get(url).status_code == 404
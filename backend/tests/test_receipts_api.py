@@ -0,0 +1,236 @@
+import io
+
+from PIL import Image
+
+from models.entities import Receipt, ComplianceIssue
+
+DEV_UID = "dev-user-123"  # uid returned by verify_firebase_token in DEVELOPMENT_MODE
+
+
+def _add_receipt(db, **overrides):
+    data = {"vendor": "SuperMart", "date": "2025-08-31", "amount": 100.0, "gstin": "", "category": "groceries",
+            "owner_uid": DEV_UID}
+    data.update(overrides)
+    obj = Receipt(**data)
+    db.add(obj)
+    db.commit()
+    return obj
+
+
+def test_list_filters_and_paginates(client, db_session):
+    _add_receipt(db_session, vendor="SuperMart")
+    _add_receipt(db_session, vendor="Cafe Coffee Day", category="meals")
+    res = client.get("/api/v1/receipts/", params={"q": "cafe"})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["total"] == 1
+    assert body["items"][0]["vendor"] == "Cafe Coffee Day"
+
+    res = client.get("/api/v1/receipts/", params={"size": 1})
+    assert res.json()["total"] == 2
+    assert len(res.json()["items"]) == 1
+
+
+def test_get_patch_delete_roundtrip(client, db_session):
+    obj = _add_receipt(db_session)
+    db_session.add(ComplianceIssue(receipt_id=obj.id, level="warning", code="GST_MISSING", message="x"))
+    db_session.commit()
+
+    res = client.patch(f"/api/v1/receipts/{obj.id}", json={"vendor": "Renamed", "id": "ignored"})
+    assert res.status_code == 200
+    assert res.json()["vendor"] == "Renamed"
+    assert client.get(f"/api/v1/receipts/{obj.id}").json()["id"] == obj.id
+
+    assert client.delete(f"/api/v1/receipts/{obj.id}").status_code == 204
+    assert client.get(f"/api/v1/receipts/{obj.id}").status_code == 404
+
+
+def test_date_range_filter_uses_normalized_date(client, db_session):
+    _add_receipt(db_session, vendor="July", date="15/07/2025")
+    _add_receipt(db_session, vendor="August", date="2025-08-31")
+    _add_receipt(db_session, vendor="Unknown", date="n/a")
+    res = client.get("/api/v1/receipts/", params={"date_from": "2025-08-01", "date_to": "2025-08-31"})
+    assert [r["vendor"] for r in res.json()["items"]] == ["August"]
+
+
+def test_backfill_receipt_dates_in_chunks(client, db_session):
+    from services.backfill import backfill_receipt_dates, receipts_table
+    from database.session import engine
+
+    with engine.begin() as conn:
+        conn.execute(Receipt.__table__.insert(), [
+            {"id": f"r{i}", "owner_uid": DEV_UID, "vendor": "v", "date": f"0{i}/08/2025", "amount": 1.0,
+             "category": "c", "status": "needs_review"}
+            for i in range(1, 6)
+        ])
+    with engine.connect() as conn:
+        assert backfill_receipt_dates(conn, chunk_size=2, commit_each_chunk=True) == 5
+        dates = conn.execute(receipts_table.select().order_by(receipts_table.c.id)).all()
+    assert [r.receipt_date.day for r in dates] == [1, 2, 3, 4, 5]
+
+
+def test_summary_rollups_follow_patch_and_delete(client, db_session):
+    from services.backfill import rebuild_receipt_summaries
+    from database.session import engine
+
+    a = _add_receipt(db_session, vendor="SuperMart", category="groceries", amount=100.0, date="2025-08-01")
+    _add_receipt(db_session, vendor="SuperMart", category="groceries", amount=50.0, date="2025-09-02")
+    with engine.connect() as conn:
+        rebuild_receipt_summaries(conn, chunk_size=1, commit_each_chunk=True)
+
+    body = client.get("/api/v1/receipts/summary").json()
+    assert body["totals"] == {"count": 2, "total_amount": 150.0, "tax_amount": 0.0}
+    assert body["summaries"]["vendor"] == [{"key": "SuperMart", "count": 2, "total_amount": 150.0, "tax_amount": 0.0}]
+    assert [m["key"] for m in body["summaries"]["month"]] == ["2025-09", "2025-08"]
+
+    client.patch(f"/api/v1/receipts/{a.id}", json={"category": "meals", "amount": 120.0})
+    cats = client.get("/api/v1/receipts/summary", params={"dimension": "category"}).json()["summaries"]["category"]
+    assert {c["key"]: c["total_amount"] for c in cats} == {"meals": 120.0, "groceries": 50.0}
+
+    client.delete(f"/api/v1/receipts/{a.id}")
+    body = client.get("/api/v1/receipts/summary").json()
+    assert body["totals"]["count"] == 1
+    assert [c["key"] for c in body["summaries"]["category"]] == ["groceries"]
+
+
+def test_list_views_and_field_projection(client, db_session):
+    _add_receipt(db_session, extracted={"ocr_text": "x" * 1000})
+    row = client.get("/api/v1/receipts/").json()["items"][0]
+    assert "extracted" not in row and row["receipt_date"] == "2025-08-31"
+    assert "extracted" in client.get("/api/v1/receipts/", params={"view": "full"}).json()["items"][0]
+
+    row = client.get("/api/v1/receipts/", params={"fields": "vendor,amount"}).json()["items"][0]
+    assert set(row) == {"id", "vendor", "amount"}
+    assert client.get("/api/v1/receipts/", params={"fields": "vendor,nope"}).status_code == 400
+
+
+def test_get_receipt_etag_roundtrip(client, db_session):
+    obj = _add_receipt(db_session)
+    first = client.get(f"/api/v1/receipts/{obj.id}")
+    etag = first.headers["ETag"]
+    assert first.json()["extracted"] == {}
+
+    cached = client.get(f"/api/v1/receipts/{obj.id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+
+    patched = client.patch(f"/api/v1/receipts/{obj.id}", json={"vendor": "Changed"})
+    assert patched.headers["ETag"] != etag
+    assert client.get(f"/api/v1/receipts/{obj.id}", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_receipts_are_scoped_to_owner(client, db_session):
+    mine = _add_receipt(db_session, vendor="Mine")
+    theirs = _add_receipt(db_session, vendor="Theirs", owner_uid="someone-else")
+    _add_receipt(db_session, vendor="Legacy", owner_uid=None)
+
+    body = client.get("/api/v1/receipts/").json()
+    assert body["total"] == 1 and body["items"][0]["id"] == mine.id
+    assert client.get(f"/api/v1/receipts/{theirs.id}").status_code == 404
+    assert client.patch(f"/api/v1/receipts/{theirs.id}", json={"vendor": "x"}).status_code == 404
+    assert client.delete(f"/api/v1/receipts/{theirs.id}").status_code == 404
+
+
+def test_backfill_receipt_owners(client, db_session):
+    from services.backfill import backfill_receipt_owners, rebuild_receipt_summaries
+    from database.session import engine
+
+    tagged = _add_receipt(db_session, owner_uid=None, extracted={"owner_uid": "from-extracted"})
+    legacy = _add_receipt(db_session, owner_uid=None, amount=42.5)
+    with engine.connect() as conn:
+        rebuild_receipt_summaries(conn, commit_each_chunk=True)  # rollups as they were: both under owner ""
+        assert backfill_receipt_owners(conn, chunk_size=1, commit_each_chunk=True, default_owner=DEV_UID) == 2
+    db_session.expire_all()
+    assert db_session.get(Receipt, tagged.id).owner_uid == "from-extracted"
+    assert db_session.get(Receipt, legacy.id).owner_uid == DEV_UID
+    # The new owner's summary includes the receipt it was handed
+    totals = client.get("/api/v1/receipts/summary").json()["totals"]
+    assert totals == {"count": 1, "total_amount": 42.5, "tax_amount": 0.0}
+
+
+def test_upload_creates_owned_receipt(client, png_bytes):
+    res = client.post("/api/v1/receipts/", files={"file": ("r.png", png_bytes, "image/png")})
+    assert res.status_code == 201
+    body = res.json()
+    assert body["filename"] == "r.png" and body["mime_type"] == "image/png"
+    assert len(body["extracted"]["sha256"]) == 64
+    assert client.get("/api/v1/receipts/").json()["total"] == 1
+    assert client.get("/api/v1/receipts/summary").json()["totals"]["count"] == 1
+
+    res = client.post("/api/v1/receipts/", files={"file": ("r.png", b"not really a png", "image/png")})
+    assert res.status_code == 415
+
+    # Scanner output
+    tiff = io.BytesIO()
+    Image.open(io.BytesIO(png_bytes)).save(tiff, format="TIFF")
+    res = client.post("/api/v1/receipts/", files={"file": ("scan.tif", tiff.getvalue(), "image/tiff")})
+    assert res.status_code == 201 and res.json()["mime_type"] == "image/tiff"
+
+
+def test_duplicate_uploads_share_blob_and_ocr_cache(client, db_session, png_bytes, monkeypatch):
+    from models.entities import Blob
+    from services.ocr import ocr_service
+
+    calls = []
+    monkeypatch.setattr(ocr_service, "extract_text_from_image",
+                        lambda img: calls.append(img) or "SuperMart\nDate: 31/08/2025\nTotal: 250.00")
+    first = client.post("/api/v1/receipts/", files={"file": ("a.png", png_bytes, "image/png")}).json()
+    second = client.post("/api/v1/receipts/", files={"file": ("b.png", png_bytes, "image/png")}).json()
+    assert len(calls) == 1
+    assert second["vendor"] == "SuperMart" and second["amount"] == 250.0
+    assert first["extracted"]["sha256"] == second["extracted"]["sha256"]
+
+    sha = first["extracted"]["sha256"]
+    assert db_session.get(Blob, sha).ref_count == 2
+    client.delete(f"/api/v1/receipts/{first['id']}")
+    db_session.expire_all()
+    assert db_session.get(Blob, sha).ref_count == 1
+
+
+def test_backfill_moves_legacy_files_into_blob_store(client, db_session, png_bytes, tmp_path):
+    from models.entities import Blob
+    from services.backfill import backfill_receipt_blobs
+    from services.blobstore import get_blob_backend
+    from database.session import engine
+
+    legacy = tmp_path / "0f255d6e_receipt.png"
+    legacy.write_bytes(png_bytes)
+    obj = _add_receipt(db_session, mime_type="image/png", extracted={"path": str(legacy)})
+    with engine.connect() as conn:
+        assert backfill_receipt_blobs(conn, commit_each_chunk=True) == 1
+    db_session.expire_all()
+    sha = db_session.get(Receipt, obj.id).blob_sha256
+    assert db_session.get(Blob, sha).ref_count == 1
+    assert get_blob_backend().read(sha) == png_bytes
+    assert not legacy.exists()
+
+
+def test_thumbnail_and_image_are_cacheable(client, png_bytes, monkeypatch):
+    from PIL import Image
+    import io
+    from services import derivatives
+
+    big = io.BytesIO()
+    Image.new("RGB", (1600, 1200), "white").save(big, format="PNG")
+    created = client.post("/api/v1/receipts/", files={"file": ("big.png", big.getvalue(), "image/png")}).json()
+    derivatives.shutdown(wait=True)  # let the background job finish
+
+    res = client.get(f"/api/v1/receipts/{created['id']}/thumbnail")
+    assert res.status_code == 200 and res.headers["content-type"] == "image/jpeg"
+    assert "immutable" in res.headers["cache-control"]
+    assert max(Image.open(io.BytesIO(res.content)).size) == derivatives.THUMB_MAX_SIDE
+    again = client.get(f"/api/v1/receipts/{created['id']}/thumbnail", headers={"If-None-Match": res.headers["etag"]})
+    assert again.status_code == 304
+
+    original = client.get(f"/api/v1/receipts/{created['id']}/image")
+    assert original.content == big.getvalue()
+
+
+def test_reprocess_uses_ocr_ready_derivative(client, png_bytes, monkeypatch):
+    from services.ocr import ocr_service
+
+    created = client.post("/api/v1/receipts/", files={"file": ("r.png", png_bytes, "image/png")}).json()
+    seen = []
+    monkeypatch.setattr(ocr_service, "extract_text_from_image", lambda img: seen.append(img) or "Cafe\nTotal: 90.00")
+    body = client.post(f"/api/v1/receipts/{created['id']}/reprocess").json()
+    assert seen[0].ndim == 2  # grayscale array, not the original bytes
+    assert body["extracted"]["parsed"]["total"] == "90.00"
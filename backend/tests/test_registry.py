@@ -0,0 +1,37 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from services.registry import ServiceRegistry
+
+
+def test_services_load_once_on_first_use():
+    calls = []
+    registry = ServiceRegistry()
+    registry.register("svc", lambda: calls.append(1) or {"value": 42})
+    proxy = registry.proxy("svc")
+
+    assert not registry.is_loaded("svc") and calls == []
+    assert registry.report() == {"svc": None}
+    assert proxy.get("value") == 42
+    assert registry.get("svc") is registry.get("svc")
+    assert calls == [1] and registry.report()["svc"] is not None
+
+
+def test_warm_up_survives_failing_services():
+    registry = ServiceRegistry()
+    registry.register("broken", lambda: 1 / 0)
+    registry.register("ok", lambda: "ready")
+    registry.warm_up_in_background().join(5)
+    report = registry.report()
+    assert report["broken"] is None and report["ok"] is not None
+
+
+def test_importing_the_app_skips_heavy_modules():
+    backend_dir = Path(__file__).resolve().parent.parent
+    check = (
+        "import sys, main; "
+        "print(','.join(m for m in ('cv2', 'pytesseract', 'pandas', 'firebase_admin') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", check], cwd=backend_dir, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.entities import Blob, Receipt
+
+DEV_UID = "dev-user-123"
+
+
+@pytest.fixture()
+def sweeper(client, tmp_path):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+    from database.session import ASYNC_DATABASE_URL
+    from services.blobstore import LocalBlobBackend
+    from services.retention import Sweeper
+
+    # Own engine so connections aren't shared with the TestClient's event loop
+    engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    backend = LocalBlobBackend(str(tmp_path / "blobs"))
+    yield Sweeper(
+        async_sessionmaker(engine, expire_on_commit=False), backend=backend, policies={"rejected": 30},
+        batch_size=2, batch_pause=0, export_dir=str(tmp_path / "exports"),
+    )
+    asyncio.run(engine.dispose())
+
+
+def _put_blob(db, backend, sha, refs, updated_at):
+    staged = backend.staging_path()
+    staged.write_bytes(sha.encode())
+    backend.commit(staged, sha)
+    backend.put_derivative(sha, "thumb.jpg", b"thumb")
+    db.add(Blob(sha256=sha, size=64, mime_type="image/png", ref_count=refs, created_at=updated_at, updated_at=updated_at))
+    db.commit()
+
+
+def test_sweep_removes_only_expired_unreferenced_blobs(sweeper, db_session):
+    backend = sweeper.backend
+    old = datetime.utcnow() - timedelta(days=3)
+    orphan, kept, fresh = "a" * 64, "b" * 64, "c" * 64
+    _put_blob(db_session, backend, orphan, 0, old)
+    _put_blob(db_session, backend, kept, 1, old)
+    _put_blob(db_session, backend, fresh, 0, datetime.utcnow())
+
+    # A file the DB never heard of, old enough to be past the grace period
+    untracked = "d" * 64
+    staged = backend.staging_path()
+    staged.write_bytes(b"x")
+    backend.commit(staged, untracked)
+    stale = time.time() - 3 * 86400
+    os.utime(backend.path_for(untracked), (stale, stale))
+
+    counts = asyncio.run(sweeper.sweep_once())
+    assert counts["blobs"] == 1 and counts["untracked_files"] == 1
+    assert sorted(backend.iter_keys()) == [kept, fresh]
+    assert backend.read_derivative(orphan, "thumb.jpg") is None
+    db_session.expire_all()
+    assert db_session.get(Blob, orphan) is None and db_session.get(Blob, kept) is not None
+
+
+def test_status_policy_expires_old_receipts(sweeper, db_session):
+    old = datetime.utcnow() - timedelta(days=45)
+    for i, (status, created) in enumerate([("rejected", old), ("rejected", old), ("rejected", old),
+                                           ("rejected", datetime.utcnow()), ("processed", old)]):
+        db_session.add(Receipt(id=f"r{i}", owner_uid=DEV_UID, vendor="v", date="01/08/2025", amount=1.0, status=status,
+                               created_at=created, updated_at=created))
+    db_session.commit()
+
+    assert asyncio.run(sweeper.sweep_once())["receipts"] == 3
+    db_session.expire_all()
+    assert sorted(r.id for r in db_session.query(Receipt).all()) == ["r3", "r4"]
+
+
+def test_sweep_removes_stale_temp_files(sweeper):
+    exports = sweeper.export_dir
+    exports.mkdir()
+    stale = time.time() - 2 * sweeper.temp_max_age
+    for path in (exports / "old.csv", sweeper.backend.staging_path()):
+        path.write_text("x")
+        os.utime(path, (stale, stale))
+    (exports / "new.csv").write_text("x")
+
+    assert asyncio.run(sweeper.sweep_once())["temp_files"] == 2
+    assert [p.name for p in exports.iterdir()] == ["new.csv"]
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+from services.scheduler import FAST, FULL, OCRScheduler, Priority
+
+
+class RecordingOCR:
+    """Records (image, mode) in run order; the first job blocks until `gate` is set."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.started = threading.Event()
+
+    def extract_text_from_image(self, img, mode=FULL):
+        if not self.calls:
+            self.started.set()
+            self.gate.wait(5)
+        self.calls.append((img, mode))
+        if img == "bad":
+            raise ValueError("unreadable")
+        return f"text:{img}"
+
+
+def _scheduler(ocr):
+    return OCRScheduler(workers=1, service=lambda: ocr)
+
+
+def _drain(futures):
+    return [f.result(5) for f in futures]
+
+
+def test_interactive_jobs_run_before_queued_bulk_work():
+    ocr = RecordingOCR()
+    scheduler = _scheduler(ocr)
+    futures = [scheduler.submit("first", Priority.BULK, "a")]
+    ocr.started.wait(5)
+    futures += [scheduler.submit(f"bulk-{i}", Priority.BULK, "a") for i in range(2)]
+    futures.append(scheduler.submit("overnight", Priority.BACKGROUND, "a"))
+    futures.append(scheduler.submit("upload", Priority.INTERACTIVE, "b"))
+    ocr.gate.set()
+    _drain(futures)
+    assert [img for img, _ in ocr.calls] == ["first", "upload", "bulk-0", "bulk-1", "overnight"]
+    scheduler.shutdown()
+
+
+def test_tenants_take_turns_within_a_class():
+    ocr = RecordingOCR()
+    scheduler = _scheduler(ocr)
+    futures = [scheduler.submit("first", Priority.BULK, "x")]
+    ocr.started.wait(5)
+    futures += [scheduler.submit(f"a{i}", Priority.BULK, "a") for i in range(3)]
+    futures += [scheduler.submit(f"b{i}", Priority.BULK, "b") for i in range(2)]
+    ocr.gate.set()
+    _drain(futures)
+    assert [img for img, _ in ocr.calls[1:]] == ["a0", "b0", "a1", "b1", "a2"]
+    scheduler.shutdown()
+
+
+def test_tight_deadlines_degrade_to_fast_mode_and_jump_the_queue():
+    ocr = RecordingOCR()
+    scheduler = _scheduler(ocr)
+    scheduler.estimates = {FULL: 3.0, FAST: 1.0}
+    futures = [scheduler.submit("first", Priority.INTERACTIVE, "x", deadline=0)]
+    ocr.started.wait(5)
+    futures.append(scheduler.submit("relaxed", Priority.INTERACTIVE, "a", deadline=0))
+    futures.append(scheduler.submit("urgent", Priority.INTERACTIVE, "b", deadline=1))
+    ocr.gate.set()
+    _drain(futures)
+    assert ocr.calls[1:] == [("urgent", FAST), ("relaxed", FULL)]
+    assert scheduler.stats()["degraded"] == 1
+    scheduler.shutdown()
+
+
+def test_run_many_keeps_order_and_blanks_failures():
+    ocr = RecordingOCR()
+    ocr.gate.set()
+    scheduler = _scheduler(ocr)
+    texts = asyncio.run(scheduler.run_many(["one", "bad", "two"], tenant="a"))
+    assert texts == ["text:one", "", "text:two"]
+    scheduler.shutdown()
+    # Shutting down only retires the threads; the next job starts new ones
+    assert asyncio.run(scheduler.run("again")) == "text:again"
+
+
+def test_upload_deadline_header_selects_fast_ocr(client, png_bytes, monkeypatch):
+    from services.ocr import ocr_service
+    from services.scheduler import ocr_scheduler
+
+    modes = []
+    monkeypatch.setattr(ocr_service, "extract_text_from_image", lambda img, mode=FULL: modes.append(mode) or "Total: 5.00")
+    # The shared scheduler learns from earlier tests' (instant) OCR runs; start from the default estimate
+    monkeypatch.setitem(ocr_scheduler.estimates, FULL, 3.0)
+    r = client.post(
+        "/api/v1/receipts/", files={"file": ("r.png", png_bytes, "image/png")}, headers={"X-OCR-Deadline": "0.5"},
+    )
+    assert r.status_code == 201 and modes == [FAST]
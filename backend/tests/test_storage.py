@@ -0,0 +1,82 @@
+import asyncio
+import hashlib
+import io
+import time
+
+import pytest
+from fastapi import UploadFile
+
+from services.blobstore import LocalBlobBackend
+from services.storage import UploadRejected, UploadStream, sniff_mime, stream_upload
+
+
+def test_sniff_mime():
+    assert sniff_mime(b"\x89PNG\r\n\x1a\n....") == "image/png"
+    assert sniff_mime(b"\xff\xd8\xff\xe0") == "image/jpeg"
+    assert sniff_mime(b"II*\x00\x08\x00") == sniff_mime(b"MM\x00*\x00\x00") == "image/tiff"
+    assert sniff_mime(b"GIF89a") is None
+
+
+def _store(backend, name, data, step=7):
+    stream = UploadStream(name, backend)
+    for i in range(0, len(data), step):
+        stream.write(data[i:i + step])
+    return stream.finish()
+
+
+def test_upload_stream_hashes_and_dedupes_by_content(tmp_path, png_bytes):
+    backend = LocalBlobBackend(str(tmp_path))
+    first = _store(backend, "../../evil.png", png_bytes)
+    sha = hashlib.sha256(png_bytes).hexdigest()
+    assert first.sha256 == sha and first.filename == "evil.png"
+    assert first.mime_type == "image/png" and first.content == png_bytes
+    assert first.path == str(tmp_path / sha[:2] / sha[2:4] / sha)
+    assert not first.deduplicated
+
+    second = _store(backend, "copy.png", png_bytes)
+    assert second.deduplicated and second.path == first.path
+    assert list(backend.iter_keys()) == [sha]
+    assert list(backend.tmp_dir.iterdir()) == []
+
+
+def test_upload_stream_rejects_early(tmp_path, png_bytes):
+    backend = LocalBlobBackend(str(tmp_path))
+    stream = UploadStream("a.png", backend, max_size=len(png_bytes) - 1)
+    with pytest.raises(UploadRejected) as exc:
+        stream.write(png_bytes)
+    assert exc.value.status_code == 413
+
+    stream = UploadStream("a.txt", backend, allowed={"image/png"})
+    with pytest.raises(UploadRejected) as exc:
+        stream.write(b"hello world, not an image")
+    assert exc.value.code == "UNSUPPORTED_TYPE"
+    assert list(backend.tmp_dir.iterdir()) == [] and list(backend.iter_keys()) == []
+
+
+class SlowBackend(LocalBlobBackend):
+    """Commits like a remote store: the call blocks for a while."""
+
+    def commit(self, staged, sha256):
+        time.sleep(0.5)
+        return super().commit(staged, sha256)
+
+
+def test_stream_upload_keeps_the_event_loop_free(tmp_path, png_bytes):
+    backend = SlowBackend(str(tmp_path))
+
+    async def run():
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        stored = await stream_upload(UploadFile(io.BytesIO(png_bytes), filename="r.png"), backend)
+        ticker.cancel()
+        return stored, max(b - a for a, b in zip(ticks, ticks[1:]))
+
+    stored, longest_gap = asyncio.run(run())
+    assert stored.sha256 == hashlib.sha256(png_bytes).hexdigest() and backend.exists(stored.sha256)
+    assert longest_gap < 0.25  # the loop kept running during the 0.5s commit
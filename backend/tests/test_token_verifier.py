@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from benchmarks.auth_bench import PROJECT_ID, make_signing_key, mint_token
+from services.token_verifier import CertificateStore, FirebaseTokenDecoder, TokenError, TokenVerifier, TTLCache
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return make_signing_key()
+
+
+@pytest.fixture()
+def store(signing_key):
+    store = CertificateStore(lambda: ({"k1": signing_key[1]}, 3600))
+    store.refresh()
+    return store
+
+
+def test_valid_token_is_verified_once_then_cached(signing_key, store):
+    decoder = FirebaseTokenDecoder(PROJECT_ID, store)
+    calls = []
+    verifier = TokenVerifier(lambda t: calls.append(t) or decoder(t))
+    token = mint_token(signing_key[0], "k1", "user-1", email="a@example.com")
+
+    claims = verifier.verify(token)
+    assert claims["uid"] == "user-1" and claims["email"] == "a@example.com"
+    assert verifier.verify(token) is claims and len(calls) == 1
+
+
+@pytest.mark.parametrize("overrides, kid", [
+    ({"ttl": -60}, "k1"),                   # expired
+    ({"project_id": "someone-else"}, "k1"),  # wrong audience/issuer
+    ({}, "rotated-away"),                    # unknown key id
+])
+def test_invalid_tokens_are_rejected(signing_key, store, overrides, kid):
+    decoder = FirebaseTokenDecoder(PROJECT_ID, store)
+    with pytest.raises(TokenError):
+        decoder(mint_token(signing_key[0], kid, "user-1", **overrides))
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    cache = TTLCache(maxsize=2)
+    now = time.time()
+    cache.set("a", 1, now + 100)
+    cache.set("b", 2, now + 1)
+    assert cache.get("b", now=now + 2) is None
+    cache.set("c", 3, now + 100)
+    cache.get("a")
+    cache.set("d", 4, now + 100)
+    assert cache.get("c") is None and cache.get("a") == 1 and len(cache) == 2
+
+
+def test_keys_are_prefetched_in_background(signing_key):
+    store = CertificateStore(lambda: ({"k1": signing_key[1]}, 3600))
+    store.start()
+    try:
+        deadline = time.time() + 5
+        while not store.loaded and time.time() < deadline:
+            time.sleep(0.01)
+        assert store.get("k1") is not None
+    finally:
+        store.stop()
+
+
+def test_dev_mode_returns_fresh_dev_user():
+    from services.firebase_admin import verify_firebase_token
+
+    user = verify_firebase_token("anything")
+    user["uid"] = "mutated"
+    assert verify_firebase_token("anything")["uid"] == "dev-user-123"
+
+
+def test_keys_are_fetched_on_demand_without_a_refresher(signing_key):
+    fetches = []
+    store = CertificateStore(lambda: fetches.append(1) or ({"k1": signing_key[1]}, 3600))
+    decoder = FirebaseTokenDecoder(PROJECT_ID, store)
+    # No start() and nothing fetched yet: the first request loads the keys itself
+    assert decoder(mint_token(signing_key[0], "k1", "user-1"))["uid"] == "user-1"
+    # Unknown key ids don't refetch on every request
+    for _ in range(3):
+        with pytest.raises(TokenError):
+            decoder(mint_token(signing_key[0], "made-up", "user-1"))
+    assert len(fetches) == 1
+
+
+def test_failed_on_demand_fetch_is_throttled(signing_key):
+    attempts = []
+
+    def fetch():
+        attempts.append(1)
+        raise ConnectionError("offline")
+
+    store = CertificateStore(fetch)
+    assert store.get("k1") is None and store.get("k1") is None
+    assert len(attempts) == 1